@@ -1,5 +1,5 @@
 #!/bin/bash
-# Automation script for HLS parser, CDFG generator, and Verilog simulation
+# Automation script for HLS (LLVM IR frontend, CDFG generator, scheduling, Verilog generation) and Verilog simulation
 # Usage: ./autorun.sh <input_file>
 
 # Exit on any error
@@ -18,7 +18,6 @@ INPUT_FILE="$1"
 BASENAME=$(basename "$INPUT_FILE" .ll)
 
 # Directory structure (all paths relative to ROOT_DIR)
-PARSER_DIR="parser"
 EXAMPLE_DIR="example"
 if [ $# -eq 2 ]; then
     OUTPUT_DIR="${2%/}"
@@ -27,55 +26,29 @@ else
     echo "Notice: No output directory specified. Using default: $OUTPUT_DIR"
     echo ""
 fi
-PARSE_RESULT_DIR="$OUTPUT_DIR/parseResult"
 VERILOG_DIR="$OUTPUT_DIR/verilog_code"
 WAVE_PATH="$OUTPUT_DIR/waveform"
 OUTPUTFLOW_DIR="$OUTPUT_DIR/outputFlow"
 TESTBENCH_DIR="$EXAMPLE_DIR/testbench"
 
 # File paths
-PARSE_RESULT="${BASENAME}_parseResult.txt"
-PARSE_RESULT_PATH="$PARSE_RESULT_DIR/$PARSE_RESULT"
 VERILOG_FILE="$VERILOG_DIR/$BASENAME.v"
 TESTBENCH_FILE="$TESTBENCH_DIR/${BASENAME}_tb.v"
 WAVE_OUTPUT="$WAVE_PATH/${BASENAME}_wave"
 WAVE_FILE="$WAVE_PATH/${BASENAME}_wave.vcd"
 
 # Create necessary directories if they don't exist
-mkdir -p "$PARSE_RESULT_DIR"
 mkdir -p "$VERILOG_DIR"
 mkdir -p "$WAVE_PATH"
 mkdir -p "$OUTPUTFLOW_DIR"
 
 echo "============================="
-echo "Step 1: Running parser..."
-echo "============================="
-cd "$ROOT_DIR/$PARSER_DIR"
-
-if ! ./hls "$ROOT_DIR/$INPUT_FILE" "$ROOT_DIR/$PARSE_RESULT_PATH"; then
-    echo "First attempt failed. Running make clean and rebuilding..."
-    make clean
-    make
-    if ! ./hls "$ROOT_DIR/$INPUT_FILE" "$ROOT_DIR/$PARSE_RESULT_PATH"; then
-        echo "Error: Parser execution failed after rebuild"
-        exit 1
-    fi
-fi
-rm -f *.o
-
-echo "✅ Parser completed successfully"
-echo "Parse result saved to: $PARSE_RESULT_PATH"
-
-echo ""
-echo "============================="
-echo "Step 2: Running high level synthesis..."
+echo "Step 1: Running high level synthesis..."
 echo "============================="
 cd "$ROOT_DIR"
-if ! python3 main.py "$PARSE_RESULT_PATH" "$OUTPUT_DIR"; then
-    echo "Error: CDFG generation failed"
-    rm -f "$PARSE_RESULT_PATH"
-    cd "$ROOT_DIR/$PARSER_DIR"
-    make clean
+# main.py reads the .ll file directly, the C++ parser in parser/ is not needed
+if ! python3 main.py "$INPUT_FILE" "$OUTPUT_DIR"; then
+    echo "Error: High level synthesis failed"
     exit 1
 fi
 
@@ -85,7 +58,7 @@ echo "Verilog file generated at: $VERILOG_FILE"
 
 echo ""
 echo "============================="
-echo "Step 3: Compiling Verilog code..."
+echo "Step 2: Compiling Verilog code..."
 echo "============================="
 if ! iverilog -o "$WAVE_OUTPUT" "$VERILOG_FILE" "$TESTBENCH_FILE"; then
     echo "Error: Verilog compilation failed"
@@ -95,7 +68,7 @@ echo "✅ Verilog compilation completed"
 
 echo ""
 echo "============================="
-echo "Step 4: Generating waveform file..."
+echo "Step 3: Generating waveform file..."
 echo "============================="
 cd "$ROOT_DIR/$WAVE_PATH"
 if ! vvp -n "$(basename "$WAVE_OUTPUT")"; then
@@ -119,9 +92,8 @@ echo "All processes completed successfully!"
 echo "============================="
 
 echo "Output files:"
-echo "1. Parse result: $PARSE_RESULT_PATH"
-echo "2. Output flow file: $OUTPUT_DIR/"$BASENAME"_outputFlow.txt"
-echo "3. Verilog file: $VERILOG_FILE"
-echo "4. Waveform file: $WAVE_FILE"
+echo "1. Output flow file: $OUTPUT_DIR/outputFlow/"$BASENAME"_outputFlow.txt"
+echo "2. Verilog file: $VERILOG_FILE"
+echo "3. Waveform file: $WAVE_FILE"
 echo "============================="
 echo ""
\ No newline at end of file
@@ -0,0 +1,21 @@
+import sys
+import os
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'hls'))
+from schedulerBenchmark import syntheticBasicBlock
+
+def benchmarkDFG(sizes, repeat=3):
+    """Time BasicBlock.generateDFG on synthetic blocks of increasing size and print a scaling table."""
+    print(f"{'ops':>8} {'edges':>8} {'best time (s)':>14} {'us/op':>8}")
+    for num_ops in sizes:
+        bb = syntheticBasicBlock(num_ops)
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            bb.generateDFG()
+            best = min(best, time.perf_counter() - start)
+        print(f"{num_ops:>8} {bb.dfg.number_of_edges():>8} {best:>14.4f} {best / num_ops * 1e6:>8.2f}")
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1000, 2000, 5000, 10000]
+    benchmarkDFG(sizes)
@@ -0,0 +1,38 @@
+import sys
+import os
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'hls'))
+from cdfgGenerator import HLS
+from scheduler import addScheduler
+from registerAllocator import get_local_variable_liveness, get_living_period, np
+from schedulerBenchmark import syntheticBasicBlock
+
+def benchmarkLiveness(sizes, repeat=3):
+    """Time the per-set and the vectorized block liveness (with live intervals) on scheduled synthetic blocks."""
+    addScheduler(HLS)
+    modes = (False, True) if np is not None else (False,)
+    if np is None:
+        print("NumPy is not installed, skipping the vectorized liveness")
+    print(f"{'ops':>8} {'cycles':>8} {'sets (s)':>10} {'vectorized (s)':>15}")
+    for num_ops in sizes:
+        hls = HLS()
+        bb = syntheticBasicBlock(num_ops)
+        hls.basicBlocks[bb.label] = bb
+        hls.scheduleASAP()
+        hls.output_variables = {bb.label: set()}
+        hls.global_variable = set()
+        times = []
+        for vectorized in modes:
+            best = float('inf')
+            for _ in range(repeat):
+                start = time.perf_counter()
+                get_local_variable_liveness(hls, vectorized=vectorized)
+                get_living_period(hls)
+                best = min(best, time.perf_counter() - start)
+            times.append(best)
+        vectorized_time = f"{times[1]:>15.4f}" if len(times) > 1 else f"{'-':>15}"
+        print(f"{num_ops:>8} {len(hls.schedule[bb.label]):>8} {times[0]:>10.4f} {vectorized_time}")
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1000, 2000, 5000, 10000]
+    benchmarkLiveness(sizes)
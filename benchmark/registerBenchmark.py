@@ -0,0 +1,58 @@
+import sys
+import os
+import time
+import random
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'hls'))
+from registerAllocator import left_edge_binding
+
+def syntheticLivePeriods(num_vars, num_cycles=None, max_length=32, seed=0):
+    """
+    Live intervals resembling a long scheduled block: each variable is defined at a random
+    cycle and lives for a short, random number of cycles.
+    """
+    rng = random.Random(seed)
+    num_cycles = num_cycles or num_vars
+    periods = {}
+    for i in range(num_vars):
+        start = rng.randrange(num_cycles)
+        periods[f"v{i}"] = [start, min(num_cycles, start + rng.randrange(max_length))]
+    return periods
+
+def sweepBinding(bb_live_period):
+    """The previous left-edge binder: one sweep of the uncolored variables per register"""
+    uncolored = sorted(bb_live_period, key=lambda x: (bb_live_period[x][0], bb_live_period[x][1] - bb_live_period[x][0], x))
+    bb_coloring_result = {}
+    color = 0
+    while uncolored:
+        colored_var_list = []
+        right_edge = -1
+        for v in uncolored:
+            if bb_live_period[v][0] > right_edge:
+                colored_var_list.append((v, bb_live_period[v]))
+                right_edge = bb_live_period[v][1]
+        bb_coloring_result[color] = colored_var_list
+        color += 1
+        for v, _ in colored_var_list:
+            uncolored.remove(v)
+    return bb_coloring_result
+
+def benchmarkRegisterBinding(sizes, repeat=3, sweep_limit=20000):
+    """Time the heap-based left-edge binder (and the per-register sweep up to sweep_limit variables)."""
+    print(f"{'variables':>10} {'registers':>10} {'heap (s)':>10} {'sweep (s)':>10}")
+    for num_vars in sizes:
+        periods = syntheticLivePeriods(num_vars)
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            coloring = left_edge_binding(periods)
+            best = min(best, time.perf_counter() - start)
+        sweep = '-'
+        if num_vars <= sweep_limit:
+            start = time.perf_counter()
+            assert sweepBinding(periods) == coloring
+            sweep = f"{time.perf_counter() - start:.4f}"
+        print(f"{num_vars:>10} {len(coloring):>10} {best:>10.4f} {sweep:>10}")
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000, 1000000]
+    benchmarkRegisterBinding(sizes)
@@ -0,0 +1,60 @@
+import sys
+import os
+import time
+import random
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'hls'))
+from cdfgGenerator import HLS, BasicBlock
+from scheduler import addScheduler
+from resourceData import *
+
+# Operation types used in the synthetic blocks, weighted towards cheap ALU operations
+SYNTHETIC_OP_TYPES = [OP_ADD, OP_ADD, OP_SUB, OP_MUL, OP_LOAD, OP_LT, OP_ASSIGN, OP_DIV]
+
+def syntheticBasicBlock(num_ops, fan_in=2, window=64, seed=0):
+    """
+    Build a large basic block resembling an unrolled loop body.
+
+    Args:
+        num_ops: number of operations in the block
+        fan_in: maximum number of operands read from earlier operations
+        window: operands are picked among the last `window` values, which keeps the DFG wide
+        seed: random seed, so every run schedules the same block
+    """
+    rng = random.Random(seed)
+    bb = BasicBlock(f"bench{num_ops}")
+    edges = []
+    for i in range(num_ops):
+        op_type = rng.choice(SYNTHETIC_OP_TYPES)
+        sources = sorted({rng.randrange(max(0, i - window), i) for _ in range(fan_in)}) if i else []
+        operands = [f"v{j}" for j in sources]
+        if op_type == OP_LOAD:
+            operands = ["a"] + (operands[:1] or ["0"])
+            sources = sources[:1]
+        while len(operands) < 2:
+            operands.append("1")
+        bb.addOP([f"v{i}", op_type] + operands)
+        edges.extend((j, i, {'value': f"v{j}"}) for j in sources)
+    # The DFG is built directly from the generator's dependencies so that only scheduling is timed
+    bb.dfg.add_nodes_from(range(num_ops))
+    bb.dfg.add_edges_from(edges)
+    return bb
+
+def benchmarkScheduler(sizes, repeat=3):
+    """Time scheduleASAP on synthetic blocks of increasing size and print a scaling table."""
+    addScheduler(HLS)
+    print(f"{'ops':>8} {'edges':>8} {'cycles':>8} {'best time (s)':>14} {'us/op':>8}")
+    for num_ops in sizes:
+        hls = HLS()
+        bb = syntheticBasicBlock(num_ops)
+        hls.basicBlocks[bb.label] = bb
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            hls.scheduleASAP()
+            best = min(best, time.perf_counter() - start)
+        cycles = len(hls.schedule[bb.label])
+        print(f"{num_ops:>8} {bb.dfg.number_of_edges():>8} {cycles:>8} {best:>14.4f} {best / num_ops * 1e6:>8.2f}")
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1000, 2000, 5000, 10000]
+    benchmarkScheduler(sizes)
@@ -0,0 +1,82 @@
+import sys
+import os
+import io
+import time
+import tempfile
+import tracemalloc
+import contextlib
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'hls'))
+from cdfgGenerator import HLS, BasicBlock
+from scheduler import addScheduler
+from registerAllocator import addRegisterAllocation
+from genFSM import VerilogSyntax, VerilogGenerator, verilogPrinter, verilogEmitter
+
+def syntheticProgram(num_blocks):
+    """
+    LLVM IR text of a function with a chain of num_blocks basic blocks: every block adds, multiplies
+    and compares, and branches either to the next block or, when its comparison fails, to the one after.
+    """
+    lines = ["define int chain(int a, int n)", "    x0 = a + 1;", "    br b1;", ""]
+    for i in range(1, num_blocks + 1):
+        lines.append(f"b{i}:")
+        lines.append(f"    x{i} = x{i-1} + a;")
+        lines.append(f"    t{i} = x{i} * 3;")
+        lines.append(f"    c{i} = t{i} < n;")
+        next_block = f"b{i+1}" if i < num_blocks else "ret"
+        skip_block = f"b{i+2}" if i + 1 < num_blocks else "ret"
+        lines.append(f"    br c{i} {next_block} {skip_block};" if next_block != skip_block else f"    br {next_block};")
+        lines.append("")
+    lines.append("ret:")
+    lines.append(f"    return x{num_blocks};")
+    return "\n".join(lines) + "\n"
+
+def synthesizedProgram(num_blocks):
+    """Parse, schedule and register-allocate the synthetic program"""
+    addScheduler(HLS)
+    addRegisterAllocation(HLS, BasicBlock)
+    with tempfile.NamedTemporaryFile('w', suffix='.ll', delete=False) as f:
+        f.write(syntheticProgram(num_blocks))
+    try:
+        hls = HLS()
+        with contextlib.redirect_stdout(io.StringIO()):
+            hls.llvmParser(f.name)
+            hls.generateCFG()
+            hls.generateDFGs()
+            hls.scheduleASAP()
+            hls.registerAllocation()
+    finally:
+        os.remove(f.name)
+    return hls
+
+def measure(generate):
+    """Time of one Verilog generation, and its peak traced memory (MB) in a second, traced run"""
+    start = time.perf_counter()
+    generate()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    generate()
+    peak = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    return elapsed, peak
+
+def benchmarkVerilog(sizes):
+    """Compare the buffered (gen_all_code + verilogPrinter) and the streamed (verilogEmitter) Verilog output."""
+    print(f"{'states':>8} {'buffered (s)':>13} {'peak (MB)':>10} {'streamed (s)':>13} {'peak (MB)':>10}")
+    for num_blocks in sizes:
+        hls = synthesizedProgram(num_blocks)
+        with open(os.devnull, 'w') as sink:
+            def buffered():
+                verilog_generator = VerilogGenerator(hls, VerilogSyntax())
+                verilog_generator.gen_all_code()
+                verilogPrinter(verilog_generator, sink)
+
+            def streamed():
+                verilogEmitter(VerilogGenerator(hls, VerilogSyntax()), sink)
+
+            buffered_time, buffered_peak = measure(buffered)
+            streamed_time, streamed_peak = measure(streamed)
+        print(f"{len(hls.basicBlocks):>8} {buffered_time:>13.4f} {buffered_peak:>10.2f} {streamed_time:>13.4f} {streamed_peak:>10.2f}")
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [250, 1000, 4000]
+    benchmarkVerilog(sizes)
@@ -0,0 +1,122 @@
+import sys
+import os
+import time
+import json
+import argparse
+sys.path.append(os.path.join(os.path.dirname(__file__), 'hls'))
+from hls.resourceData import OP_TYPE_MAP
+from hls.resourceLibrary import ResourceLibrary, opTypeFromName
+from hls.scheduler import SCHEDULING_MODES
+from hls.designSpaceExplorer import OBJECTIVES, usedOpTypes, designPoints, explore, exploreVerilog
+
+def parseUnitSweep(spec):
+    """Parse a unit count sweep such as 'mul=1,2,4' into ('OP_MUL', [1, 2, 4])"""
+    try:
+        name, counts = spec.split('=')
+        counts = [int(count) for count in counts.split(',')]
+        if min(counts) < 1:
+            raise ValueError("unit counts must be positive")
+        return OP_TYPE_MAP[opTypeFromName(name)], counts
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(f"invalid unit sweep '{spec}': {e}")
+
+def positiveInt(value):
+    """Parse a strictly positive integer argument"""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid integer '{value}'")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"'{value}' must be positive")
+    return number
+
+def parseArguments():
+    """
+    Parse command line arguments: the input file, an optional output path and the sweep axes.
+    """
+    parser = argparse.ArgumentParser(description="Design-space exploration over resource counts, scheduling modes and loop pipelining")
+    parser.add_argument("inputFile", help="LLVM IR file (.ll) or parse result file generated by parser/hls")
+    parser.add_argument("outputPath", nargs="?", help="output directory, defaults to output/ for a .ll file and to the parent directory of a parse result")
+    parser.add_argument("--units", nargs="+", type=parseUnitSweep, default=[], metavar="OP=N,N",
+                        help="unit counts to sweep per op type, e.g. mul=1,2 load=1,2; defaults to 1,2 for every op type the design uses")
+    parser.add_argument("--schedulers", nargs="+", choices=list(SCHEDULING_MODES), default=list(SCHEDULING_MODES),
+                        help="scheduling modes to sweep")
+    parser.add_argument("--pipeline", choices=["off", "on", "both"], default="both",
+                        help="whether to sweep loop pipelining")
+    parser.add_argument("--trip-count", type=positiveInt, default=10,
+                        help="assumed iterations of every loop when weighting block cycles")
+    parser.add_argument("--resources", metavar="FILE",
+                        help="base resource library (.json or .toml) the swept unit counts apply to")
+    parser.add_argument("--jobs", type=positiveInt, help="number of worker processes, defaults to the number of CPUs")
+    parser.add_argument("--no-verilog", action="store_true", help="do not generate Verilog for the Pareto-optimal points")
+    return parser.parse_args()
+
+def main():
+    """
+    Main function: sweep the design space in parallel, then write the Pareto front as JSON
+    and the Verilog code of the Pareto-optimal points.
+    """
+    start = time.time()
+    args = parseArguments()
+    inputFile = args.inputFile
+    if args.outputPath:
+        outputPath = args.outputPath
+    elif inputFile.endswith('.ll'):
+        outputPath = 'output'
+    else:
+        outputPath = os.path.dirname(os.path.dirname(os.path.abspath(inputFile)))
+    try:
+        if inputFile.endswith('.ll'):
+            name = os.path.basename(inputFile)[:-len('.ll')]
+        else:
+            name = inputFile[inputFile.rindex('/')+1:inputFile.rindex('_')]
+    except ValueError:
+        print("Input file must be an LLVM IR (.ll) file or a parse result file")
+        sys.exit(1)
+
+    os.makedirs(os.path.join(outputPath, 'dse'), exist_ok=True)
+    os.makedirs(os.path.join(outputPath, 'verilog_code'), exist_ok=True)
+    reportFile = os.path.join(outputPath, 'dse', name + '_pareto.json')
+
+    try:
+        base_config = ResourceLibrary.fromFile(args.resources).toDict() if args.resources else None
+    except (OSError, ValueError) as e:
+        print(f"Invalid resource library {args.resources}: {e}")
+        sys.exit(1)
+    try:
+        used_op_types = usedOpTypes(inputFile)
+    except (OSError, ValueError) as e:
+        print(f"Invalid input file {inputFile}: {e}")
+        sys.exit(1)
+    unit_counts = dict(args.units) or {OP_TYPE_MAP[op_type]: [1, 2] for op_type in used_op_types}
+    pipeline_options = {"off": [False], "on": [True], "both": [False, True]}[args.pipeline]
+    points = designPoints(unit_counts, args.schedulers, pipeline_options)
+    print(f"Exploring {len(points)} design points of {name}")
+
+    results, front = explore(inputFile, points, args.trip_count, base_config, args.jobs)
+    print(f"{'id':>5} {'scheduler':>14} {'pipeline':>9} {'cycles':>8} {'registers':>10} {'units':>6} {'area':>8}  unit counts")
+    for result in front:
+        counts = ' '.join(f"{op[3:].lower()}={count}" for op, count in result['units'].items())
+        print(f"{result['id']:>5} {result['scheduler']:>14} {str(result['pipeline']):>9} {result['cycles']:>8} "
+              f"{result['registers']:>10} {result['functional_units']:>6} {result['area']:>8}  {counts}")
+
+    if not args.no_verilog:
+        for result, code in zip(front, exploreVerilog(inputFile, front, base_config, args.jobs)):
+            result['verilog'] = os.path.join(outputPath, 'verilog_code', f"{name}_dse{result['id']}.v")
+            with open(result['verilog'], 'w') as vf:
+                vf.write(code)
+
+    with open(reportFile, 'w') as f:
+        json.dump({
+            'design': name,
+            'trip_count': args.trip_count,
+            'objectives': list(OBJECTIVES),
+            'pareto_front': front,
+            'points': results,
+        }, f, indent=2)
+    print(f"Pareto front written to {reportFile}")
+    end = time.time()
+    print(f"Total time taken: {end - start:.10f} seconds")
+
+if __name__ == "__main__":
+    main()
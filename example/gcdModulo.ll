@@ -0,0 +1,18 @@
+define int gcdModulo(int a, int b)
+    c = a;
+    d = b;
+
+start:
+    x = phi(c, 0, y, body);
+    y = phi(d, 0, r, body);
+    cond = y == 0;
+    br cond ret body;
+
+body:
+    q = x / y;
+    p = q * y;
+    r = x - p;
+    br start;
+
+ret:
+    return x;
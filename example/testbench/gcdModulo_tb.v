@@ -0,0 +1,27 @@
+module gcdModulo_tb;
+	reg sys_clk;
+	reg sys_rst_n;
+	reg [31:0] a;
+	reg [31:0] b;
+	wire [31:0] return_val;
+
+	initial begin
+		$dumpfile("gcdModulo_wave.vcd");
+		$dumpvars(0, gcdModulo_tb);
+
+		sys_clk <= 1'b0;
+		sys_rst_n <= 1'b1;
+		#10 begin
+			a <= 32'd42;
+			b <= 32'd56;
+		end
+		#5 sys_rst_n <= 1'b0;
+		#5 sys_rst_n <= 1'b1;
+		#2000 $finish;
+	end
+
+	always #1 sys_clk = ~sys_clk;
+
+	gcdModulo uut (.sys_clk(sys_clk), .sys_rst_n(sys_rst_n), .return_val(return_val), .a(a), .b(b));
+
+endmodule
\ No newline at end of file
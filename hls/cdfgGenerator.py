@@ -1,145 +1,255 @@
 import os
 import re
-import networkx as nx
 import sys
+from resourceData import OP_ASSIGN, OP_ADD, OP_SUB, OP_MUL, OP_DIV, OP_LOAD, OP_STORE, OP_BR, OP_LT, OP_GT, OP_LE, OP_GE, OP_EQ, OP_PHI, OP_RET
+from resourceLibrary import ResourceLibrary
+from compactGraph import CompactGraph
+from symbolTable import SymbolTable, Operation, KIND_CONSTANT
+
+# Tokens of the .ll subset are separated by whitespace, parentheses, commas and semicolons
+LL_TOKEN_SEPARATORS = re.compile(r'[\s(),;]+')
+
+# Binary operators of the .ll subset
+LL_BINARY_OPS = {'+': OP_ADD, '-': OP_SUB, '*': OP_MUL, '/': OP_DIV,
+                 '<': OP_LT, '>': OP_GT, '<=': OP_LE, '>=': OP_GE, '==': OP_EQ}
 
 class BasicBlock:
     """a basic block within the CFG"""
     
-    def __init__(self, label):
+    def __init__(self, label, symbols=None):
         """
         initialize basic block
         
         Args:
             label: the label of basic block
+            symbols: SymbolTable shared by the blocks of a function, a new one by default
         """
         self.label = label
+        self.symbols = symbols if symbols is not None else SymbolTable()
         self.ops = []  # Operation list
-        self.dfg = nx.DiGraph()  # Use NetworkX directed graph to represent data flow graph
+        self.dfg = CompactGraph()  # Data flow graph, nodes are operation indices
         self.next_bb = None  # Label of the next basic block
+        self.phis = []  # Phi operations lowered into copies on the incoming edges (HLS.eliminatePhis)
 
     def addOP(self, op):
-        """add operation to basic block"""
+        """add operation to basic block, given as an Operation or as a list [value, op type, operands...]"""
+        if not isinstance(op, Operation):
+            op = Operation(op[0], op[1], op[2:], self.symbols)
         self.ops.append(op)
 
     def generateDFG(self):
         """
         build DFG
-        Each node is operation index, edges represent data dependencies
+        Each node is operation index, edges represent data dependencies: def-use edges carry the
+        value, memory edges between accesses to the same array carry the array name
         """
         # Clear existing graph
         self.dfg.clear()
-        
-        # Add all operations as nodes
-        for i in range(len(self.ops)):
-            self.dfg.add_node(i, operation=self.ops[i])
-            
-        # Traverse each operation to establish data dependency edges
+
+        # Add all operations as nodes; the operations themselves stay in self.ops
+        self.dfg.add_nodes_from(range(len(self.ops)))
+
+        # Def-use index: value ID -> indices of the earlier operations producing it.
+        # The code is not strictly SSA, so a value may have several producers and each gets an edge
+        definitions = {}
+        edges = []
+        addresses = {}  # op index -> (base, offset) of the value it defines, see indexAddress
+        accesses = {}  # array -> ([(op index, address)] of the earlier loads, [...] of the earlier stores)
         for i, op in enumerate(self.ops):
-            # Value produced by the current operation
-            current_value = op[0]
-            
-            # Operands used by the current operation
-            operands = op[2:]
-            
-            # Find the source of operands (search forward)
-            for j in range(i):
-                prev_op = self.ops[j]
-                prev_value = prev_op[0]
-                
-                # If the previous operation produces a value used by the current operation, add an edge
-                if prev_value in operands:
-                    self.dfg.add_edge(j, i, value=prev_value)
+            # Producers of the operands of the current operation, in op order
+            sources = set()
+            for operand_id in op.operand_ids:
+                sources.update(definitions.get(operand_id, ()))
+            edges.extend((j, i, {'value': self.ops[j].value}) for j in sorted(sources))
+            edges.extend((j, i, {'memory': op.operands[0]}) for j in self.memoryDependences(i, definitions, addresses, accesses) if j not in sources)
+            definitions.setdefault(op.def_id, []).append(i)
+
+        self.dfg.add_edges_from(edges)
         
         return self.dfg
 
+    def indexAddress(self, value_id, definitions, addresses):
+        """
+        Symbolic address of a value, as (base, constant offset): the base is None for a constant,
+        otherwise the value ID together with the index of its latest producer, so a redefinition
+        (the code is not strictly SSA) starts a new base
+        """
+        if self.symbols.kinds[value_id] == KIND_CONSTANT:
+            return (None, int(self.symbols.names[value_id]))
+        producer = definitions[value_id][-1] if value_id in definitions else -1
+        return addresses.get(producer, ((value_id, producer), 0))
+
+    def memoryDependences(self, i, definitions, addresses, accesses):
+        """
+        Track the address arithmetic of operation i and return the earlier operations it must
+        follow: store -> load (RAW), load -> store (WAR) and store -> store (WAW) on the same
+        array, unless both indices have the same base and different constant offsets
+        """
+        op = self.ops[i]
+        if op.op_type == OP_ASSIGN:
+            addresses[i] = self.indexAddress(op.operand_ids[0], definitions, addresses)
+        elif op.op_type in (OP_ADD, OP_SUB):
+            a, b = (self.indexAddress(operand_id, definitions, addresses) for operand_id in op.operand_ids)
+            sign = 1 if op.op_type == OP_ADD else -1
+            if b[0] is None:
+                addresses[i] = (a[0], a[1] + sign * b[1])
+            elif a[0] is None and op.op_type == OP_ADD:
+                addresses[i] = (b[0], a[1] + b[1])
+        if op.op_type != OP_LOAD and op.op_type != OP_STORE:
+            return []
+        address = self.indexAddress(op.operand_ids[1], definitions, addresses)
+        loads, stores = accesses.setdefault(op.operands[0], ([], []))
+        # A load only follows the stores, a store follows both
+        earlier = stores + loads if op.op_type == OP_STORE else stores
+        dependences = sorted(j for j, other in earlier if other[0] != address[0] or other[1] == address[1])
+        (stores if op.op_type == OP_STORE else loads).append((i, address))
+        return dependences
+
 
 class HLS:
     """Control Data Flow Graph (HLS) representation"""
     
-    def __init__(self):
-        """Initialize HLS object"""
+    def __init__(self, resources=None):
+        """
+        Initialize HLS object
+
+        Args:
+            resources: ResourceLibrary used by scheduling, register allocation and Verilog
+                generation; defaults to the configuration in resourceData
+        """
         self.basicBlocks = {}  # Dictionary of basic blocks, key is the basic block label
         self.retType = None    # Function return type
         self.functionName = None  # Function name
         self.params = set()  # Function parameter list
-        self.cfg = nx.DiGraph()  # Use NetworkX directed graph to represent control flow graph
+        self.cfg = CompactGraph()  # Control flow graph, nodes are basic block labels
+        self.symbols = SymbolTable()  # Interned names and kinds of the values of the function
+        self.resources = resources if resources is not None else ResourceLibrary()  # Functional-unit library
     
     def llvmParser(self, file_path):
         """
         Parse LLVM format parse_result file to build HLS structure
         
         Args:
-            file_path: Path to the parse_result file
-        """
-        try:
-            with open(file_path, 'r') as f:
-                content = f.read()
-        except FileNotFoundError:
-            print(f"Error: File not found {file_path}")
-            return None
-        
-        # Parse return type
-        ret_type_match = re.search(r'ret type: (\w+)', content)
-        if ret_type_match:
-            self.retType = ret_type_match.group(1)
-        
-        # Parse function name
-        func_name_match = re.search(r'function name (\w+)', content)
-        if func_name_match:
-            self.functionName = func_name_match.group(1)
-        
-        # Parse parameters
-        # params = []
-        param_matches = re.finditer(r'(array|non-array)\s+(\w+)', content)
-        for match in param_matches:
-            param_type, param_name = match.groups()
-            self.params.add((param_name, param_type))
-        # self.params = params
-        
-        # Parse basic blocks
-        basic_block_pattern = r'Basic Block label: (\w+)(.*?)(?=Basic Block label:|$)'
-        basic_block_matches = re.finditer(basic_block_pattern, content, re.DOTALL)
-        
-        # Get all basic block labels
-        bb_labels = []
-        for match in basic_block_matches:
-            label = match.group(1)
-            bb_labels.append(label)
-        
-        # Restart matching basic blocks
-        basic_block_matches = re.finditer(basic_block_pattern, content, re.DOTALL)
-        
-        for i, match in enumerate(basic_block_matches):
-            label = match.group(1)
-            block_content = match.group(2).strip()
-            
-            # Create basic block object
-            bb = BasicBlock(label)
-            
-            # Set next_bb attribute
-            if i < len(bb_labels) - 1:
-                bb.next_bb = bb_labels[i + 1]
-            
-            # Parse operations
-            op_pattern = r'value (\w*)\s+OP TYPE:(\d+)(.*?)(?=value|$)'
-            op_matches = re.finditer(op_pattern, block_content, re.DOTALL)
-            
-            for op_match in op_matches:
-                value = op_match.group(1)
-                op_type = int(op_match.group(2))
-                operands_text = op_match.group(3).strip()
-                
-                # Parse operands
-                operands = []
-                if operands_text:
-                    operands = [op.strip() for op in operands_text.split() if op.strip()]
-                
-                # Add operation to basic block
-                bb.addOP([value, op_type] + operands)
-            
-            # Add basic block to HLS
-            self.addBasicBlock(bb)
+            file_path: Path to the parse_result file, or an open file handle
+
+        Raises:
+            OSError: the file cannot be read
+            ValueError: the file holds a statement the parser does not support
+        """
+        if hasattr(file_path, 'read'):
+            return self.parseLines(file_path)
+        with open(file_path, 'r') as f:
+            if file_path.endswith('.ll'):
+                return self.parseLL(f)
+            return self.parseLines(f)
+
+    def parseLines(self, lines):
+        """
+        Build the HLS structure from the lines of a parse result, in one pass.
+
+        The header holds `ret type: <type>`, `function name <name>` and one
+        `array`/`non-array` line followed by the parameter name per parameter.
+        Every basic block starts with `Basic Block label: <label>` and holds one
+        record per operation: `value <name>`, `OP TYPE:<type>` and the operand line.
+        Blocks are created as soon as their label is read, so any iterable of lines
+        (a file handle, a generator) is consumed lazily with one line of lookahead.
+
+        Args:
+            lines: iterable of lines of the parse result
+        """
+        bb = None             # Basic block being filled
+        value = None          # Left value of the operation whose type comes next
+        pending = None        # (left value, op type) of the operation whose operand line comes next
+        param_type = None     # Type of the parameter whose name comes next
+        for line in lines:
+            if pending is not None:
+                # The line after `OP TYPE:` holds the operands, whatever they are named
+                bb.addOP(Operation(pending[0], pending[1], line.split(), self.symbols))
+                pending = None
+            elif bb is not None and line.startswith('value'):
+                value = line[len('value'):].strip()
+            elif value is not None and line.startswith('OP TYPE:'):
+                pending = (value, int(line[len('OP TYPE:'):]))
+                value = None
+            elif line.startswith('Basic Block label:'):
+                label = line[len('Basic Block label:'):].strip()
+                if bb is not None:
+                    bb.next_bb = label
+                bb = BasicBlock(label, self.symbols)
+                self.addBasicBlock(bb)
+                value = None
+            elif bb is None:
+                # Function header
+                line = line.strip()
+                if line.startswith('ret type:'):
+                    self.retType = line[len('ret type:'):].strip()
+                elif line.startswith('function name'):
+                    self.functionName = line[len('function name'):].strip()
+                elif line in ('array', 'non-array'):
+                    param_type = line
+                elif line and param_type is not None:
+                    self.params.add((line, param_type))
+                    param_type = None
+        if pending is not None:
+            bb.addOP(Operation(pending[0], pending[1], [], self.symbols))
+        self.symbols.declareParams(self.params)
+        return self.basicBlocks
+
+    def parseLL(self, lines):
+        """
+        Build the HLS structure directly from LLVM IR source (.ll), without the
+        parser/hls round-trip through a parse result file.
+
+        Accepts the subset handled by parser/parser.cpp and produces the same
+        operations: `define <type> <name>(<params>)`, `label:` lines starting blocks,
+        `x = y`, `x = y <op> z`, `x = phi(...)`, `x = load(...)`, `store(...)`,
+        `br ...` and `return ...`. Statements before the first label form block "0".
+
+        Args:
+            lines: iterable of lines of the .ll file
+        """
+        bb = BasicBlock("0", self.symbols)
+        self.addBasicBlock(bb)
+        for line_number, line in enumerate(lines, 1):
+            tokens = [token for token in LL_TOKEN_SEPARATORS.split(line) if token]
+            if not tokens:
+                continue
+            key = tokens[0]
+            if key == 'define':
+                # define <ret type> <name> then (<type> <param>)*, array parameters end with []
+                self.retType = 'int' if tokens[1:2] == ['int'] else 'void'
+                self.functionName = tokens[2] if len(tokens) > 2 else None
+                for param in tokens[4::2]:
+                    if '[' in param:
+                        self.params.add((param[:param.index('[')], 'array'))
+                    else:
+                        self.params.add((param, 'non-array'))
+            elif ':' in key:
+                label = key[:-1]
+                bb.next_bb = label
+                bb = BasicBlock(label, self.symbols)
+                self.addBasicBlock(bb)
+            elif key == 'store':
+                bb.addOP(['', OP_STORE] + tokens[1:4])
+            elif key == 'br':
+                bb.addOP(['', OP_BR] + tokens[1:])
+            elif key == 'return':
+                bb.addOP(['', OP_RET] + tokens[1:])
+            elif len(tokens) >= 3 and tokens[1] == '=':
+                if tokens[2] == 'phi':
+                    bb.addOP([key, OP_PHI] + tokens[3:])
+                elif tokens[2] == 'load':
+                    bb.addOP([key, OP_LOAD] + tokens[3:])
+                elif len(tokens) == 3:
+                    bb.addOP([key, OP_ASSIGN, tokens[2]])
+                elif len(tokens) == 5 and tokens[3] in LL_BINARY_OPS:
+                    bb.addOP([key, LL_BINARY_OPS[tokens[3]], tokens[2], tokens[4]])
+                else:
+                    raise ValueError(f"line {line_number}: unsupported expression: {line.strip()}")
+            else:
+                raise ValueError(f"line {line_number}: unsupported statement: {line.strip()}")
+        self.symbols.declareParams(self.params)
+        return self.basicBlocks
 
     def addBasicBlock(self, basic_block):
         """
@@ -149,12 +259,12 @@ class HLS:
             basic_block: BasicBlock object
         """
         self.basicBlocks[basic_block.label] = basic_block
-        self.cfg.add_node(basic_block.label, block=basic_block)
+        self.cfg.add_node(basic_block.label)
 
     def generateCFG(self):
         """
         Build Control Flow Graph (CFG)
-        Use NetworkX directed graph, nodes are basic block labels, edges represent control flow transfers
+        Nodes are basic block labels, edges represent control flow transfers
         """
         # Clear existing edges (keep nodes)
         self.cfg.clear_edges()
@@ -195,6 +305,25 @@ class HLS:
             bb.generateDFG()
         return self.basicBlocks
 
+    def eliminatePhis(self):
+        """
+        Lower the phi operations into copies on the incoming CFG edges.
+
+        The phis leave the operation list, so they are no longer scheduled and the operations
+        reading a phi destination start in the first cycle of the block. They are kept in
+        BasicBlock.phis: the FSM copies the value of each predecessor into the destination register
+        on the transition, liveness reads the values at the exit of the predecessors, and the
+        register allocator coalesces a source with its destination when their lifetimes allow.
+        Must run before scheduling; loop pipelining reads the lowered phis of the loop header.
+        """
+        for bb in self.basicBlocks.values():
+            phis = [op for op in bb.ops if op.op_type == OP_PHI]
+            if phis:
+                bb.phis.extend(phis)
+                bb.ops = [op for op in bb.ops if op.op_type != OP_PHI]
+                bb.generateDFG()
+        return self.basicBlocks
+
 
 def printCDFG(hls, file=None):
     """Print basic information of HLS"""
@@ -215,6 +344,10 @@ def printBasicBlocks(hls, file=None):
         print("\tOperation list:", file=file)
         for i, op in enumerate(bb.ops):
             print(f"\t\t[{i}] {op}", file=file)
+        if bb.phis:
+            print("\tPhis copied on the incoming edges:", file=file)
+            for op in bb.phis:
+                print(f"\t\t{op}", file=file)
     print("===================\n", file=file)
 
 
@@ -233,8 +366,11 @@ def printDFG(hls, file=None):
         if len(bb.dfg.edges()) > 0:
             print(f"\tDFG of basic block {label}:", file=file)
             for u, v, data in bb.dfg.edges(data=True):
-                value = data.get('value', '')
-                print(f"\t\tOperation {u} -> {v} [Value: {value}]", file=file)
+                if 'memory' in data:
+                    print(f"\t\tOperation {u} -> {v} [Memory: {data['memory']}]", file=file)
+                else:
+                    value = data.get('value', '')
+                    print(f"\t\tOperation {u} -> {v} [Value: {value}]", file=file)
     print("=======================\n", file=file)
 
 def cdfgPrinter(hls, file=None):
@@ -0,0 +1,289 @@
+from array import array
+
+# Placeholder of an edge attribute that was not set on that edge
+_MISSING = object()
+
+class CompactGraph:
+    """
+    Directed graph stored as compressed sparse row (CSR) arrays.
+
+    Nodes are kept in insertion order and mapped to dense indices. Edges are appended to
+    flat source/target arrays and their attributes to one column per attribute name, so
+    no dictionary is allocated per node or per edge. The successor and predecessor
+    offsets are rebuilt lazily after a change: a graph that is built once and then only
+    queried pays for its index once.
+
+    The methods follow the networkx.DiGraph API used by the passes, with the same
+    iteration orders: nodes in insertion order, edges grouped by source node, successors
+    and predecessors in edge insertion order. Adding an existing edge updates its
+    attributes. Attribute dictionaries returned by the queries are copies.
+    """
+
+    def __init__(self, edges=None):
+        self._nodes = []            # node index -> node
+        self._index = {}            # node -> node index
+        self._node_attrs = {}       # attribute name -> {node index: value}
+        self._src = array('l')      # edge -> source node index
+        self._dst = array('l')      # edge -> target node index
+        self._edge_attrs = {}       # attribute name -> [value of every edge]
+        self._csr = None            # (out offsets, out edges, in offsets, in edges), built on demand
+        if edges is not None:
+            self.add_edges_from(edges)
+
+    # ---------- construction ----------
+
+    def _nodeIndex(self, node):
+        idx = self._index.get(node)
+        if idx is None:
+            idx = len(self._nodes)
+            self._index[node] = idx
+            self._nodes.append(node)
+            self._csr = None
+        return idx
+
+    def add_node(self, node, **attr):
+        idx = self._nodeIndex(node)
+        for name, value in attr.items():
+            self._node_attrs.setdefault(name, {})[idx] = value
+
+    def add_nodes_from(self, nodes):
+        """Add nodes given as `node` or `(node, attribute dict)`"""
+        for item in nodes:
+            if isinstance(item, tuple) and len(item) == 2 and isinstance(item[1], dict):
+                self.add_node(item[0], **item[1])
+            else:
+                self._nodeIndex(item)
+
+    def add_edge(self, u, v, **attr):
+        self._appendEdge(self._nodeIndex(u), self._nodeIndex(v), attr)
+
+    def add_edges_from(self, edges):
+        """Add edges given as `(u, v)` or `(u, v, attribute dict)`"""
+        for edge in edges:
+            self._appendEdge(self._nodeIndex(edge[0]), self._nodeIndex(edge[1]), edge[2] if len(edge) > 2 else None)
+
+    def _appendEdge(self, src, dst, attr):
+        edge = len(self._src)
+        self._src.append(src)
+        self._dst.append(dst)
+        for name, column in self._edge_attrs.items():
+            column.append(attr.get(name, _MISSING) if attr else _MISSING)
+        if attr:
+            for name, value in attr.items():
+                if name not in self._edge_attrs:
+                    self._edge_attrs[name] = [_MISSING] * edge + [value]
+        self._csr = None
+
+    def clear(self):
+        self.__init__()
+
+    def clear_edges(self):
+        self._src = array('l')
+        self._dst = array('l')
+        self._edge_attrs = {}
+        self._csr = None
+
+    # ---------- index ----------
+
+    def _build(self):
+        """Merge duplicate edges and build the successor and predecessor offsets"""
+        num_nodes = len(self._nodes)
+        src, dst = self._src, self._dst
+        first = {}
+        duplicates = []
+        for edge in range(len(src)):
+            key = src[edge] * num_nodes + dst[edge]
+            if key in first:
+                duplicates.append((first[key], edge))
+            else:
+                first[key] = edge
+        if duplicates:
+            # A repeated edge keeps its first position and takes the attributes set later
+            for kept, edge in duplicates:
+                for column in self._edge_attrs.values():
+                    if column[edge] is not _MISSING:
+                        column[kept] = column[edge]
+            keep = sorted(first.values())
+            self._src = src = array('l', (src[edge] for edge in keep))
+            self._dst = dst = array('l', (dst[edge] for edge in keep))
+            for name, column in self._edge_attrs.items():
+                self._edge_attrs[name] = [column[edge] for edge in keep]
+        self._csr = self._countingSort(src, num_nodes) + self._countingSort(dst, num_nodes)
+        return self._csr
+
+    @staticmethod
+    def _countingSort(keys, num_nodes):
+        """Stable grouping of the edges by node: returns (offsets, edges)"""
+        offsets = array('l', [0]) * (num_nodes + 1)
+        for key in keys:
+            offsets[key + 1] += 1
+        for idx in range(num_nodes):
+            offsets[idx + 1] += offsets[idx]
+        position = offsets[:-1]
+        edges = array('l', [0]) * len(keys)
+        for edge, key in enumerate(keys):
+            edges[position[key]] = edge
+            position[key] += 1
+        return offsets, edges
+
+    def _outEdges(self, idx):
+        out_offsets, out_edges, _, _ = self._csr or self._build()
+        return out_edges[out_offsets[idx]:out_offsets[idx + 1]]
+
+    def _inEdges(self, idx):
+        _, _, in_offsets, in_edges = self._csr or self._build()
+        return in_edges[in_offsets[idx]:in_offsets[idx + 1]]
+
+    def _edgeData(self, edge, data):
+        if data is True:
+            return {name: column[edge] for name, column in self._edge_attrs.items() if column[edge] is not _MISSING}
+        value = self._edge_attrs[data][edge] if data in self._edge_attrs else _MISSING
+        return None if value is _MISSING else value
+
+    def _edgeTuple(self, edge, data):
+        u, v = self._nodes[self._src[edge]], self._nodes[self._dst[edge]]
+        if data is False:
+            return (u, v)
+        return (u, v, self._edgeData(edge, data))
+
+    # ---------- queries ----------
+
+    def __iter__(self):
+        return iter(self._nodes)
+
+    def __contains__(self, node):
+        return node in self._index
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def nodes(self, data=False):
+        if not data:
+            return list(self._nodes)
+        return [(node, {name: values[idx] for name, values in self._node_attrs.items() if idx in values})
+                for idx, node in enumerate(self._nodes)]
+
+    def number_of_nodes(self):
+        return len(self._nodes)
+
+    def number_of_edges(self):
+        if self._csr is None:
+            self._build()
+        return len(self._src)
+
+    def successors(self, node):
+        dst, nodes = self._dst, self._nodes
+        return iter([nodes[dst[edge]] for edge in self._outEdges(self._index[node])])
+
+    def predecessors(self, node):
+        src, nodes = self._src, self._nodes
+        return iter([nodes[src[edge]] for edge in self._inEdges(self._index[node])])
+
+    neighbors = successors
+
+    def in_degree(self, node=None):
+        """In-degree of a node, or (node, in-degree) pairs of all nodes"""
+        _, _, in_offsets, _ = self._csr or self._build()
+        if node is not None:
+            idx = self._index[node]
+            return in_offsets[idx + 1] - in_offsets[idx]
+        return [(n, in_offsets[idx + 1] - in_offsets[idx]) for idx, n in enumerate(self._nodes)]
+
+    def out_degree(self, node=None):
+        """Out-degree of a node, or (node, out-degree) pairs of all nodes"""
+        out_offsets, _, _, _ = self._csr or self._build()
+        if node is not None:
+            idx = self._index[node]
+            return out_offsets[idx + 1] - out_offsets[idx]
+        return [(n, out_offsets[idx + 1] - out_offsets[idx]) for idx, n in enumerate(self._nodes)]
+
+    def out_edges(self, node=None, data=False):
+        """Outgoing edges of a node, or all edges grouped by source; data is False, True or an attribute name"""
+        if node is None:
+            return self.edges(data)
+        return [self._edgeTuple(edge, data) for edge in self._outEdges(self._index[node])]
+
+    def in_edges(self, node=None, data=False):
+        """Incoming edges of a node, or all edges grouped by target"""
+        if node is None:
+            _, _, _, in_edges = self._csr or self._build()
+            return [self._edgeTuple(edge, data) for edge in in_edges]
+        return [self._edgeTuple(edge, data) for edge in self._inEdges(self._index[node])]
+
+    def edges(self, data=False):
+        """All edges grouped by source node; data is False, True or an attribute name"""
+        _, out_edges, _, _ = self._csr or self._build()
+        return [self._edgeTuple(edge, data) for edge in out_edges]
+
+    def has_edge(self, u, v):
+        if u not in self._index or v not in self._index:
+            return False
+        dst, target = self._dst, self._index[v]
+        return any(dst[edge] == target for edge in self._outEdges(self._index[u]))
+
+    def get_edge_data(self, u, v, default=None):
+        if u in self._index and v in self._index:
+            dst, target = self._dst, self._index[v]
+            for edge in self._outEdges(self._index[u]):
+                if dst[edge] == target:
+                    return self._edgeData(edge, True)
+        return default
+
+    def to_networkx(self):
+        """Export as a networkx.DiGraph with the same nodes, edges and attributes"""
+        import networkx as nx
+        graph = nx.DiGraph()
+        graph.add_nodes_from(self.nodes(data=True))
+        graph.add_edges_from(self.edges(data=True))
+        return graph
+
+def reversePostorder(graph, entry):
+    """Nodes reachable from entry in reverse postorder of a depth-first search"""
+    order = []
+    visited = {entry}
+    stack = [(entry, graph.successors(entry))]
+    while stack:
+        node, successors = stack[-1]
+        for succ in successors:
+            if succ not in visited:
+                visited.add(succ)
+                stack.append((succ, graph.successors(succ)))
+                break
+        else:
+            stack.pop()
+            order.append(node)
+    order.reverse()
+    return order
+
+def immediateDominators(graph, entry):
+    """
+    Immediate dominator of every node reachable from entry (Cooper, Harvey and Kennedy),
+    with the entry mapped to itself.
+    """
+    order = reversePostorder(graph, entry)
+    rank = {node: idx for idx, node in enumerate(order)}
+
+    idom = {entry: entry}
+    changed = True
+    while changed:
+        changed = False
+        for node in order[1:]:
+            new_idom = None
+            for pred in graph.predecessors(node):
+                if pred not in idom:
+                    continue
+                if new_idom is None:
+                    new_idom = pred
+                    continue
+                # Walk both candidates up the dominator tree until they meet
+                a, b = pred, new_idom
+                while a != b:
+                    while rank[a] > rank[b]:
+                        a = idom[a]
+                    while rank[b] > rank[a]:
+                        b = idom[b]
+                new_idom = a
+            if idom.get(node) != new_idom:
+                idom[node] = new_idom
+                changed = True
+    return idom
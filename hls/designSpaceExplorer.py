@@ -0,0 +1,207 @@
+import io
+import itertools
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+from resourceData import *
+from resourceLibrary import ResourceLibrary, opTypeFromName
+from cdfgGenerator import HLS, BasicBlock
+from scheduler import addScheduler, SCHEDULING_MODES
+from moduloScheduler import addModuloScheduler, findNaturalLoops
+from registerAllocator import addRegisterAllocation
+from genFSM import VerilogSyntax, VerilogGenerator, verilogEmitter, branch_cycles
+
+# Op types implemented by functional units; assignments, phis, branches and returns need none
+FUNCTIONAL_UNIT_OPS = [OP_ADD, OP_SUB, OP_MUL, OP_DIV, OP_LOAD, OP_STORE, OP_LT, OP_GT, OP_LE, OP_GE, OP_EQ]
+
+# Objectives of a design point, all minimized
+OBJECTIVES = ('cycles', 'registers', 'functional_units')
+
+def synthesize(parse_result, point, base_config=None):
+    """
+    Run the CDFG -> schedule -> register allocation flow for one design point.
+
+    Args:
+        parse_result: path of the parse result file
+        point: {'units': {op name: count}, 'scheduler': mode, 'pipeline': bool}
+        base_config: resource library dictionary (see ResourceLibrary.fromDict) the unit counts apply to
+    """
+    addScheduler(HLS)
+    addModuloScheduler(HLS)
+    addRegisterAllocation(HLS, BasicBlock)
+    resources = ResourceLibrary.fromDict(base_config) if base_config else ResourceLibrary()
+    for op_name, count in point['units'].items():
+        resources.setUnit(op_name, count=count)
+    hls = HLS(resources)
+    # The passes report their progress on stdout, which would interleave across the workers
+    with contextlib.redirect_stdout(io.StringIO()):
+        hls.llvmParser(parse_result)
+        hls.generateCFG()
+        hls.generateDFGs()
+        SCHEDULING_MODES[point['scheduler']](hls)
+        if point['pipeline']:
+            hls.pipelineLoops()
+        hls.registerAllocation()
+    return hls
+
+def usedOpTypes(parse_result):
+    """Functional-unit op types occurring in a design, in op type order"""
+    hls = HLS()
+    with contextlib.redirect_stdout(io.StringIO()):
+        hls.llvmParser(parse_result)
+    used = {op[1] for bb in hls.basicBlocks.values() for op in bb.ops}
+    return [op_type for op_type in FUNCTIONAL_UNIT_OPS if op_type in used]
+
+def pipelinedBlocks(hls):
+    """Labels of the blocks replaced by a pipelined loop"""
+    return {label for loop in getattr(hls, 'pipelines', {}).values() for label in (loop.header, loop.body)}
+
+def boundUnits(hls):
+    """
+    Functional-unit instances the schedule binds operations to, as (op type, device index);
+    the device of a load or store is (array, port)
+    """
+    skipped = pipelinedBlocks(hls)
+    units = set()
+
+    def addUnit(op, device_idx):
+        units.add((op[1], (op[2], device_idx) if op[1] in MEMORY_OPS else device_idx))
+
+    for label, bb_schedule in hls.schedule.items():
+        if label in skipped:
+            continue
+        for ops in bb_schedule:
+            for op_idx, device_idx in ops:
+                addUnit(hls.basicBlocks[label].ops[op_idx], device_idx)
+    for loop in getattr(hls, 'pipelines', {}).values():
+        for node, device_idx in loop.device.items():
+            addUnit(loop.op(hls, node), device_idx)
+    return {(op_type, device_idx) for op_type, device_idx in units if op_type in FUNCTIONAL_UNIT_OPS}
+
+def blockFrequencies(hls, trip_count):
+    """
+    Executions of every block per call, assuming each loop runs trip_count iterations
+    and every block of a loop executes once per iteration (the header once more, to exit).
+    """
+    loops = {}
+    for header, loop_blocks, _ in findNaturalLoops(hls):
+        loops.setdefault(header, set()).update(loop_blocks)
+    frequency = {label: 1 for label in hls.basicBlocks}
+    for header, loop_blocks in loops.items():
+        for label in loop_blocks:
+            frequency[label] *= trip_count + (1 if label == header else 0)
+    return frequency
+
+def estimateCycles(hls, trip_count):
+    """
+    Total cycles of one call weighted by the loop trip counts.
+    A block state lasts up to its branch cycle, where the FSM takes the transition along with the last operations;
+    a pipelined loop issues one iteration every II cycles and drains its stages before leaving.
+    """
+    frequency = blockFrequencies(hls, trip_count)
+    skipped = pipelinedBlocks(hls)
+    cycles = 0
+    for label, branch_cycle in branch_cycles(hls).items():
+        if label not in skipped:
+            cycles += frequency[label] * (branch_cycle + 1)
+    for header, loop in getattr(hls, 'pipelines', {}).items():
+        entries = max(1, frequency[header] // (trip_count + 1))
+        drain = max((trip_count - 1 + loop.stages) * loop.ii, trip_count * loop.ii + loop.exit_cycle + 1)
+        cycles += entries * drain
+    return cycles
+
+def registerCount(hls):
+    """Registers of the generated design: merged local registers plus global registers"""
+    local_registers = max((len(registers) for registers in hls.merged_coloring_result.values()), default=0)
+    return local_registers + len(hls.global_variable)
+
+def muxInputs(hls):
+    """Operand multiplexer inputs of the shared functional units the Verilog generator binds"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        verilog_generator = VerilogGenerator(hls, VerilogSyntax())
+        verilog_generator.prepare()
+    return sum(unit.mux_inputs() for unit in verilog_generator.functional_units.values())
+
+def evaluatePoint(task):
+    """Synthesize one design point and score it; runs in a worker process"""
+    parse_result, point, base_config, trip_count = task
+    hls = synthesize(parse_result, point, base_config)
+    units = boundUnits(hls)
+    result = dict(point)
+    result['cycles'] = estimateCycles(hls, trip_count)
+    result['registers'] = registerCount(hls)
+    result['functional_units'] = len(units)
+    result['mux_inputs'] = muxInputs(hls)
+    result['area'] = sum(hls.resources.area[op_type] for op_type, _ in units) + result['mux_inputs'] * MUX_INPUT_AREA
+    result['pipelined_loops'] = {header: loop.ii for header, loop in getattr(hls, 'pipelines', {}).items()}
+    return result
+
+def generateVerilog(task):
+    """Synthesize one design point and return its Verilog code; runs in a worker process"""
+    parse_result, point, base_config = task
+    hls = synthesize(parse_result, point, base_config)
+    code = io.StringIO()
+    with contextlib.redirect_stdout(io.StringIO()):
+        verilogEmitter(VerilogGenerator(hls, VerilogSyntax()), code)
+    return code.getvalue()
+
+def designPoints(unit_counts, schedulers, pipeline_options):
+    """
+    Cartesian product of the sweep axes.
+
+    Args:
+        unit_counts: {op type or name: [unit counts to try]}
+        schedulers: scheduling modes, keys of SCHEDULING_MODES
+        pipeline_options: pipelining switches to try, e.g. [False, True]
+    """
+    names = [OP_TYPE_MAP[opTypeFromName(op_type)] for op_type in unit_counts]
+    points = []
+    for counts in itertools.product(*unit_counts.values()):
+        for scheduler in schedulers:
+            for pipeline in pipeline_options:
+                points.append({'units': dict(zip(names, counts)), 'scheduler': scheduler, 'pipeline': pipeline})
+    for idx, point in enumerate(points):
+        point['id'] = idx
+    return points
+
+def dominates(a, b, objectives=OBJECTIVES):
+    """Whether point a is no worse than b in every objective and better in one"""
+    return all(a[key] <= b[key] for key in objectives) and any(a[key] < b[key] for key in objectives)
+
+def paretoFront(results, objectives=OBJECTIVES):
+    """
+    Non-dominated points, sorted by the objectives.
+    Of several points with identical objectives only the one with the lowest id is kept.
+    """
+    front = []
+    seen = set()
+    for result in sorted(results, key=lambda r: (tuple(r[key] for key in objectives), r['id'])):
+        score = tuple(result[key] for key in objectives)
+        if score in seen or any(dominates(other, result, objectives) for other in front):
+            continue
+        seen.add(score)
+        front.append(result)
+    return front
+
+def explore(parse_result, points, trip_count, base_config=None, jobs=None):
+    """
+    Evaluate every design point in a process pool.
+
+    Args:
+        parse_result: path of the parse result file
+        points: design points from designPoints
+        trip_count: assumed iterations of every loop
+        base_config: resource library dictionary the unit counts apply to
+        jobs: number of worker processes, defaults to the number of CPUs
+    Returns:
+        (results of all points in input order, Pareto front)
+    """
+    tasks = [(parse_result, point, base_config, trip_count) for point in points]
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        results = list(executor.map(evaluatePoint, tasks, chunksize=max(1, len(tasks) // (4 * (jobs or 4)))))
+    return results, paretoFront(results)
+
+def exploreVerilog(parse_result, points, base_config=None, jobs=None):
+    """Generate the Verilog code of the given design points in a process pool"""
+    tasks = [(parse_result, point, base_config) for point in points]
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(generateVerilog, tasks))
@@ -1,4 +1,31 @@
+import sys
+import itertools
 import resourceData
+from registerAllocator import get_op_operands
+
+# 二元操作对应的 Verilog 运算符
+BINARY_OPERATORS = {
+    resourceData.OP_ADD: "+",
+    resourceData.OP_SUB: "-",
+    resourceData.OP_MUL: "*",
+    resourceData.OP_DIV: "/",
+    resourceData.OP_LT: "<",
+    resourceData.OP_GT: ">",
+    resourceData.OP_LE: "<=",
+    resourceData.OP_GE: ">=",
+    resourceData.OP_EQ: "==",
+}
+
+# 比较操作的 1 位结果零扩展为 32 位
+COMPARE_OPS = {resourceData.OP_LT, resourceData.OP_GT, resourceData.OP_LE, resourceData.OP_GE, resourceData.OP_EQ}
+
+def binary_expression(op_type, in_1, in_2):
+    """
+    二元操作的右值表达式，例如 a + b、{31'b0, (a < b)}
+    """
+    if op_type in COMPARE_OPS:
+        return f"{{31'b0, ({in_1} {BINARY_OPERATORS[op_type]} {in_2})}}"
+    return f"{in_1} {BINARY_OPERATORS[op_type]} {in_2}"
 
 class VerilogSyntax:
     def __init__(self):
@@ -86,21 +113,276 @@ class VerilogSyntax:
         """
         return "endmodule\n"
 
+# 状态机的状态编码方式
+FSM_ENCODINGS = ('auto', 'binary', 'gray', 'one-hot')
+# auto 编码在状态数不超过该值时使用独热码，否则使用二进制码
+ONE_HOT_MAX_STATES = 16
+
+# 状态机结构：wide 每个基本块一个状态，块内由 32 位计数器 counter 计周期；
+# narrow 同样按计数器计周期，计数器位宽按最长的基本块调度确定；flat 每个调度周期一个状态，没有计数器
+FSM_STYLES = ('wide', 'narrow', 'flat')
+
+class StateEncoding:
+    """
+    状态机的状态编码：binary 和 gray 使用 ceil(log2 n) 位，按基本块顺序编号，gray 码相邻编号只差一位；
+    one-hot 每个状态一位，状态比较只检查该状态对应的一位，case 语句写成 case (1'b1)。
+    所有 cur_state / last_state 的声明、参数、比较和 case 分支都经由这里生成
+    """
+    def __init__(self, states, encoding='auto'):
+        self.index = {state: i for i, state in enumerate(states)}
+        num_states = len(self.index)
+        if encoding == 'auto':
+            encoding = 'one-hot' if num_states <= ONE_HOT_MAX_STATES else 'binary'
+        if encoding not in FSM_ENCODINGS:
+            raise ValueError(f"unknown FSM encoding '{encoding}', expected one of {', '.join(FSM_ENCODINGS)}")
+        self.encoding = encoding
+        self.one_hot = encoding == 'one-hot'
+        self.width = num_states if self.one_hot else max(1, (num_states - 1).bit_length())
+
+    def code(self, state):
+        """
+        状态参数的值；独热码写成移位表达式，每个参数的长度与状态数无关
+        """
+        i = self.index[state]
+        if self.one_hot:
+            return f"{self.width}'b1 << {i}"
+        if self.encoding == 'gray':
+            i ^= i >> 1
+        return f"{self.width}'b{i:0{self.width}b}"
+
+    def match(self, reg, state):
+        """
+        reg（cur_state 或 last_state）等于状态 state 的条件
+        """
+        if self.one_hot:
+            return f"{reg}[{self.index[state]}]"
+        return f"{reg} == state_{state}"
+
+    def case_expression(self, reg):
+        return "1'b1" if self.one_hot else reg
+
+    def case_label(self, reg, state):
+        return f"{reg}[{self.index[state]}]" if self.one_hot else f"state_{state}"
+
+def branch_cycles(hls, resources=None):
+    """
+    每个基本块进行状态转移的周期 {基本块: 周期}：块内最后一个操作（跳转操作本身除外）写回结果、
+    并且分支条件可用的周期，状态转移与该周期的操作同时进行，不再多等一个周期。
+    单周期比较的结果在发射周期即可作为条件使用，其他条件、进入流水化循环时复制的初值以及消除 phi 后在状态转移时复制的值
+    在写入寄存器后的下一个周期可用；
+    没有后继的基本块停留在调度结束后的第 L 个周期
+    """
+    if resources is None:
+        resources = hls.resources
+    pipelines = getattr(hls, 'pipelines', {})
+    cycles = {}
+    for label, bb_schedule in hls.schedule.items():
+        if label not in hls.cfg or hls.cfg.out_degree(label) == 0:
+            cycles[label] = len(bb_schedule)
+            continue
+        conditions = {data['condition'].split()[-1] for _, _, data in hls.cfg.out_edges(label, data=True)}
+        entry_values = {init_var for succ in hls.cfg.successors(label) if succ in pipelines
+                        for var in pipelines[succ].shadow_live_outs
+                        for init_var, init_pred in pipelines[succ].phis[var][0] if init_pred == label}
+        entry_values |= {value for succ in hls.cfg.successors(label) if succ not in pipelines
+                         for phi in hls.basicBlocks[succ].phis
+                         for value, pred in zip(phi.operands[0::2], phi.operands[1::2]) if pred == label and value != phi.value}
+        ops = hls.basicBlocks[label].ops
+        branch_cycle = 0
+        for cycle_idx, cycle_ops in enumerate(bb_schedule):
+            for op_idx, _ in cycle_ops:
+                op = ops[op_idx]
+                if op[1] == resourceData.OP_BR:
+                    continue
+                delay = resources.resultDelay(op[1])
+                ready = cycle_idx + delay
+                if op[0] in entry_values or (op[0] in conditions and (delay or op[1] not in COMPARE_OPS)):
+                    ready += 1
+                branch_cycle = max(branch_cycle, ready)
+        cycles[label] = branch_cycle
+    return cycles
+
+def fu_name(op_type, device_idx):
+    """
+    功能单元实例的名字，例如 fu_mul_0
+    """
+    return f"fu_{resourceData.OP_TYPE_MAP[op_type][len('OP_'):].lower()}_{device_idx}"
+
+class FunctionalUnit:
+    """
+    共享的功能单元实例：两个操作数端口前各有一个多路选择器。
+    ports[k] 是端口 k 的输入信号列表，selects[(状态, 周期)] 是绑定到该周期的操作在各端口上的选择值。
+
+    延迟为 1 的单元是组合逻辑（comb）；乘法和除法按延迟分为（延迟 - 1）步实现：
+    流水单元每一步是一级寄存器（staged），非流水单元在发射时由 start 装入操作数后逐周期迭代（iterative）；
+    其他延迟大于 1 的流水单元在发射周期计算并经过各级寄存器延迟（delayed），
+    非流水单元在发射时锁存操作数，组合逻辑按多周期路径约束（multicycle）
+    """
+    def __init__(self, op_type, device_idx, resources):
+        self.op_type = op_type
+        self.device_idx = device_idx
+        self.name = fu_name(op_type, device_idx)
+        self.ports = ([], [])
+        # 各端口输入信号到选择值的索引，与 ports 同步
+        self.port_index = ({}, {})
+        self.selects = {}
+        self.ops = []
+        self.latency = resources.latency[op_type]
+        if self.latency == 1:
+            self.style = 'comb'
+        elif op_type in resourceData.STEPPED_OPS:
+            self.style = 'staged' if resources.isPipelined(op_type) else 'iterative'
+        elif resources.isPipelined(op_type):
+            self.style = 'delayed'
+        else:
+            self.style = 'multicycle'
+        # 分步实现时每一步处理的位数，以及除法被除数高位补零的位数
+        self.steps = self.latency - 1
+        self.step_bits = -(-32 // self.steps) if self.steps else 32
+        self.pad_bits = self.step_bits * self.steps - 32
+
+    def input(self, port):
+        return f"{self.name}_in{port}"
+
+    def select(self, port):
+        return f"{self.name}_sel{port}"
+
+    @property
+    def output(self):
+        return f"{self.name}_out"
+
+    @property
+    def start(self):
+        return f"{self.name}_start"
+
+    @property
+    def has_start(self):
+        """
+        是否需要在发射周期给出 start：迭代单元装入操作数，多周期单元锁存操作数
+        """
+        return self.style in ('iterative', 'multicycle')
+
+    @property
+    def writeback_delay(self):
+        """
+        发射后第几个周期从 result 取得结果；组合单元与 delayed 单元在发射周期给出 output
+        """
+        return self.latency - 1 if self.style in ('staged', 'iterative', 'multicycle') else 0
+
+    @property
+    def result(self):
+        """
+        发射后第（延迟 - 1）个周期可以写回目标寄存器的结果信号
+        """
+        last = self.latency - 2
+        is_div = self.op_type == resourceData.OP_DIV
+        match self.style:
+            case 'delayed':
+                return f"{self.name}_s{last}"
+            case 'staged':
+                return f"{self.name}_quo_s{last}[31:0]" if is_div else f"{self.name}_acc_s{last}"
+            case 'iterative':
+                return f"{self.name}_quo[31:0]" if is_div else f"{self.name}_acc"
+        return self.output
+
+    def select_width(self, port):
+        return max(1, (len(self.ports[port]) - 1).bit_length())
+
+    def cost(self, signals):
+        """
+        绑定读取 signals 的操作后新增的多路选择器输入数
+        """
+        return sum(signal not in index for signal, index in zip(signals, self.port_index))
+
+    def bind(self, op_key, state_cycle, signals):
+        selects = []
+        for signal, inputs, index in zip(signals, self.ports, self.port_index):
+            if signal not in index:
+                index[signal] = len(inputs)
+                inputs.append(signal)
+            selects.append(index[signal])
+        self.selects[state_cycle] = tuple(selects)
+        self.ops.append(op_key)
+
+    def mux_inputs(self):
+        """
+        各端口多路选择器的输入数之和，只有一个输入的端口直接连线，不需要多路选择器
+        """
+        return sum(len(inputs) for inputs in self.ports if len(inputs) > 1)
+
 class VerilogGenerator:
-    def __init__(self, hls, verilog_syntax):
+    # verilogPrinter / verilogEmitter 依次输出的代码段，可选的段为空时不输出分隔行
+    SECTIONS = (
+        ("content_IO", False),
+        ("content_registers", False),
+        ("content_parameters", False),
+        ("content_wire", False),
+        ("content_timing_logic", False),
+        ("content_mux_logic", True),
+        ("content_assign_logic", False),
+        ("content_end", False),
+    )
+
+    def __init__(self, hls, verilog_syntax, resources=None, fsm_encoding='auto', fsm_style='wide'):
         """
         初始化 Verilog 生成器
+        resources: 资源库，默认使用 hls.resources
+        fsm_encoding: 状态编码，FSM_ENCODINGS 之一
+        fsm_style: 状态机结构，FSM_STYLES 之一
         """
         self.hls = hls
         self.verilog_syntax = verilog_syntax
+        self.resources = resources if resources is not None else hls.resources
+        if fsm_style not in FSM_STYLES:
+            raise ValueError(f"unknown FSM style '{fsm_style}', expected one of {', '.join(FSM_STYLES)}")
+        self.fsm_style = fsm_style
+        self.flat = fsm_style == 'flat'
         
         self.global_reg_num = 0
         self.local_reg_num = 0
-        self.global_reg = []
+        self.global_reg = set()
         # self.return_reg = []
         self.cond_all = []
         self.cond_block = []
         self.reg_counter = []
+        # 非数组参数（直接作为输入端口读取）
+        self.non_array_params = set()
+        # 寄存器索引 {(基本块, 变量): 寄存器编号}，由 prepare 根据寄存器合并结果建立
+        self.register_index = {}
+        self.prepared = False
+
+        # 每种操作生成状态机语句的函数：(bb_label, op_type, in_var, out_var, in_map, out_map) -> [语句]
+        self.op_emitters = {
+            resourceData.OP_ASSIGN: self.emit_assign,
+            resourceData.OP_LOAD: self.emit_load,
+            resourceData.OP_STORE: self.emit_store,
+            resourceData.OP_BR: self.emit_branch,
+            resourceData.OP_PHI: self.emit_phi,
+            resourceData.OP_RET: self.emit_ret,
+        }
+        for op_type in BINARY_OPERATORS:
+            self.op_emitters[op_type] = self.emit_binary
+
+        # 流水化的循环：{循环头: PipelinedLoop}，循环体状态不再单独执行
+        self.pipelines = getattr(hls, 'pipelines', {})
+        self.pipelined_bodies = {loop.body: loop for loop in self.pipelines.values()}
+
+        # 各基本块进行状态转移的周期；块内计数器的位宽需要表示其中的最大值（没有后继的基本块为 L）
+        self.branch_cycle = branch_cycles(hls, self.resources)
+        cycles = [cycle for label, cycle in self.branch_cycle.items() if label not in self.pipelines and label not in self.pipelined_bodies]
+        self.counter_width = 32 if fsm_style == 'wide' else max(1, max(cycles, default=0).bit_length())
+        self.states = StateEncoding(self.state_names(), fsm_encoding)
+
+        # 功能单元绑定结果：{单元名: FunctionalUnit}，{(基本块, op_idx): FunctionalUnit}
+        self.functional_units = {}
+        self.fu_binding = {}
+        # 单元之间经由链接形成的组合连接 {单元名: {后继单元名}}
+        self.fu_edges = {}
+        # 为避免单元之间的组合环而保留独立组合逻辑的操作 [(基本块, op_idx)]
+        self.unbound_ops = []
+        # 有链接的周期的操作数映射 {(基本块, 周期): (in_maps, chained, chained_uses)}，
+        # in_maps 只包含读取本周期链接值的操作，其余操作使用默认的变量到寄存器映射
+        self.cycle_operands = {}
 
         self.content_IO = []
         self.content_registers = []
@@ -108,101 +390,180 @@ class VerilogGenerator:
         self.content_parameters = []
         self.content_timing_logic = []
         self.content_br_counter = []
-        self.content_control_logic = []
+        self.content_mux_logic = []
         self.content_assign_logic = []
         self.content_end = []
+        self.content_constraints = []
+
+    def state_names(self):
+        """
+        状态机的全部状态：wide/narrow 每个基本块一个状态；flat 每个基本块从第 0 个周期到状态转移周期
+        每个周期一个状态，流水化循环仍是一个状态，循环体不单独成为状态
+        """
+        if not self.flat:
+            return list(self.hls.basicBlocks)
+        names = []
+        for label in self.hls.basicBlocks:
+            if label in self.pipelines:
+                names.append(label)
+            elif label not in self.pipelined_bodies:
+                names.extend(self.cycle_state(label, cycle) for cycle in range(self.branch_cycle[label] + 1))
+        return names
+
+    def cycle_state(self, label, cycle):
+        """
+        flat 结构中基本块 label 第 cycle 个周期的状态名，其他结构中就是基本块的状态
+        """
+        if self.flat and label not in self.pipelines:
+            return f"{label}__{cycle}"
+        return label
+
+    def entry_state(self, label):
+        """
+        进入基本块时的状态
+        """
+        return self.cycle_state(label, 0)
+
+    def branch_state(self, label):
+        """
+        基本块根据分支条件进行状态转移的状态（flat 结构中为转移周期的状态）；phi 通过 last_state 等于前驱的这个状态选择输入
+        """
+        return self.cycle_state(label, self.branch_cycle[label])
+
+    def counter_value(self, cycle):
+        return f"{self.counter_width}'d{cycle}"
+
+    def prepare(self):
+        """
+        生成代码之前的分析，只执行一次：全局与局部寄存器、(基本块, 变量) -> 寄存器索引、
+        功能单元绑定、分支条件线网以及多周期路径约束。之后各段代码都可以由生成器逐行产生
+        """
+        if self.prepared:
+            return
+        self.prepared = True
+        self.global_reg = set(self.hls.global_variable)
+        self.global_reg_num = len(self.global_reg)
+        self.local_reg_num = len(self.hls.merged_coloring_result['0'])
+        self.non_array_params = {name for name, kind in self.hls.params if kind == 'non-array'}
+        self.index_registers()
+        self.bind_functional_units()
+        self.collect_branch_conditions()
+        self.gen_constraints()
+
+    def index_registers(self):
+        """
+        建立 (基本块, 变量) -> 寄存器编号 的索引；变量出现在多个寄存器中时取第一个
+        """
+        for block_name, block_registers in self.hls.merged_coloring_result.items():
+            for reg, variables in block_registers.items():
+                for var in variables:
+                    self.register_index.setdefault((block_name, var[0]), reg)
+
+    def collect_branch_conditions(self):
+        """
+        收集状态转移用到的条件线网及其所在的基本块（流水化循环由自己的退出逻辑离开）
+        """
+        seen = set()
+        for u, v, data in self.hls.cfg.edges(data=True):
+            if u in self.pipelined_bodies or u in self.pipelines:
+                continue
+            condition = data['condition']
+            cond_wire = condition.split()[1] if len(condition.split()) >= 2 else condition
+            if cond_wire != 'true' and cond_wire not in seen:
+                seen.add(cond_wire)
+                self.cond_all.append(cond_wire)
+                self.cond_block.append(u)
+
+    def gen_sections(self):
+        """
+        按输出顺序给出各段代码的生成器 [(content 列表名, 可选, 生成器)]
+        """
+        sections = (
+            self.gen_module_IO(),
+            itertools.chain(self.gen_array_register(), self.gen_global_register(), self.gen_local_register(),
+                            self.gen_state_register(), self.gen_other_register(), self.gen_pipeline_register(),
+                            self.gen_fu_register(), self.gen_fu_section('reg')),
+            self.gen_bb_parameter(),
+            itertools.chain(self.gen_wire(), self.gen_fu_section('wire')),
+            self.gen_timing_logic(),
+            self.gen_mux_select_logic(),
+            itertools.chain(self.gen_assign_logic(), self.gen_fu_section('assign')),
+            self.gen_endmodule(),
+        )
+        return [(name, optional, lines) for (name, optional), lines in zip(self.SECTIONS, sections)]
 
     def gen_module_IO(self):
         """
         生成模块的输入输出端口
         """
-        # content = "module " + self.hls.functionName + "("
-        # self.content_IO.append(content)
-        # self.content_IO.append(f"`timescale 1ns / 1ps")
-        self.content_IO.append(f"module {self.hls.functionName} (")
+        # yield f"`timescale 1ns / 1ps"
+        yield f"module {self.hls.functionName} ("
 
         for variables in self.hls.params:
             variable_name, variable_type = variables
-            if variable_type == 'array':
-                self.content_registers.append(f"\treg [31:0] {variable_name}_mem [0:255];")
-                # self.content_IO.append(f"\tinput\t[31:0] {variable_name}_q0,")
-                # self.content_IO.append(f"\toutput\treg [31:0] {variable_name}_address0,")
-                # self.content_IO.append(f"\toutput\treg [31:0] {variable_name}_ad0,")
-                # self.content_IO.append(f"\toutput\treg {variable_name}_ce0,")
-                # self.content_IO.append(f"\toutput\treg {variable_name}_we0,")
-            elif variable_type == 'non-array':
-                self.content_IO.append(f"\tinput\t[31:0] {variable_name},")
+            if variable_type == 'non-array':
+                yield f"\tinput\t[31:0] {variable_name},"
                 
             
         if self.hls.retType == 'int':
-            self.content_IO.append(f"\toutput\t[31:0] return_val,")
+            yield f"\toutput\t[31:0] return_val,"
+
+        yield f"\tinput\tsys_clk,"
+        yield f"\tinput\tsys_rst_n"
+        # yield f"\tinput\tstart,"
+        # yield f"\toutput\treg idle,"
+        # yield f"\toutput\treg done"
+        yield f");"
 
-        self.content_IO.append(f"\tinput\tsys_clk,")
-        self.content_IO.append(f"\tinput\tsys_rst_n")
-        # self.content_IO.append(f"\tinput\tstart,")
-        # self.content_IO.append(f"\toutput\treg idle,")
-        # self.content_IO.append(f"\toutput\treg done")
-        self.content_IO.append(f");")
+    def gen_array_register(self):
+        """
+        生成数组参数对应的存储器
+        """
+        for variable_name, variable_type in self.hls.params:
+            if variable_type == 'array':
+                yield f"\treg [31:0] {variable_name}_mem [0:255];"
+                # yield f"\tinput\t[31:0] {variable_name}_q0,"
+                # yield f"\toutput\treg [31:0] {variable_name}_address0,"
+                # yield f"\toutput\treg {variable_name}_ce0,"
+                # yield f"\toutput\treg {variable_name}_we0,"
 
     def gen_global_register(self):
         """
         生成全局寄存器变量
         """
-        self.global_reg_num = len(self.hls.global_variable)
         for item in self.hls.global_variable:
-            self.content_registers.append(f"\treg [31:0] reg_{item};")
-            self.global_reg.append(f"{item}")
-        # self.content_registers.append(f"\t")
+            yield f"\treg [31:0] reg_{item};"
 
     def gen_local_register(self):
         """
         生成局部寄存器变量
         """
-        # calculating the number of local register
-        key_to_count = '0'
-        num_local_reg = len(self.hls.merged_coloring_result[key_to_count])
-        self.local_reg_num = num_local_reg
-        # print(type(num_local_reg))
-        for i in range(num_local_reg):
-            self.content_registers.append(f"\treg [31:0] reg_{i};")
-        # self.content_registers.append(f"\t")
+        for i in range(self.local_reg_num):
+            yield f"\treg [31:0] reg_{i};"
 
     def gen_state_register(self):
-        num_state = len(self.hls.basicBlocks.keys())
-        # print(self.hls.basicBlocks.keys())
-        self.content_registers.append(f"\treg [{num_state-1}:0] cur_state;")
-        self.content_registers.append(f"\treg [{num_state-1}:0] last_state;")
-        # self.content_registers.append(f"\t")
+        yield f"\treg [{self.states.width-1}:0] cur_state;"
+        yield f"\treg [{self.states.width-1}:0] last_state;"
 
     def gen_bb_parameter(self):
         """
-        生成 Verilog 参数定义，使用独热码表示状态
+        生成 Verilog 参数定义，按 fsm_encoding 给出每个状态的编码
         """
-        # 获取基本块的键列表
-        bb_keys = list(self.hls.basicBlocks.keys())
-        # print(bb_keys)
-        num_states = len(bb_keys)  # 独热码的位数
-
-        for i, state in enumerate(bb_keys):
-            # 生成独热码，右移 i 位
-            one_hot_code = f"{num_states}'b" + ''.join(['1' if j == i else '0' for j in range(num_states)])
-            # 添加 Verilog 参数定义
-            self.content_parameters.append(f"\tparameter state_{state} = {one_hot_code};")
-        # self.content_parameters.append(f"\t")
+        yield f"\t// state encoding: {self.states.encoding}"
+        for state in self.states.index:
+            yield f"\tparameter state_{state} = {self.states.code(state)};"
 
     def gen_other_register(self):
-        self.content_registers.append(f"\treg branch_ready;")
-        self.content_registers.append(f"\treg [31:0] counter;")
-        self.content_registers.append(f"\treg [31:0] ret;")
-        # self.content_parameters.append(f"\t")
+        if not self.flat:
+            yield f"\treg [{self.counter_width-1}:0] counter;"
+        yield f"\treg [31:0] ret;"
 
     def gen_wire(self):
-        # self.content_wire.append(f"\twire cond;")
-        # self.content_wire.append(f"\t")
-        pass
-
-    def gen_comb_logic(self):
-        pass
+        """
+        生成状态转移条件线网
+        """
+        for cond_wire in self.cond_all:
+            yield f"\twire {cond_wire};"
 
     def gen_timing_logic(self):
         """
@@ -231,66 +592,85 @@ class VerilogGenerator:
         reg_init.append(f"\t\tret <= 32'bz;")
 
         # reg counter 初始化
-        reg_init.append(f"\t\tcounter <= 32'b0;")
-
-        self.content_timing_logic.append(self.verilog_syntax.always_ff(clk_signal="sys_clk", rst_signal="sys_rst_n", negedge_rst=True))
-        self.content_timing_logic.append(f"\tif (!sys_rst_n) begin")
-        for reg_init_item in reg_init:
-            self.content_timing_logic.append(reg_init_item)
-        self.content_timing_logic.append(f"\t\tlast_state <= state_0;")
-        self.content_timing_logic.append(f"\t\tcur_state <= state_0;")
-        # self.content_timing_logic.append(f"\t\tdone <= 1'b0;")
-        self.content_timing_logic.append(f"\tend")
-        self.content_timing_logic.append(f"\telse begin")
+        if not self.flat:
+            reg_init.append(f"\t\tcounter <= {self.counter_width}'b0;")
+
+        # 流水化循环控制寄存器的初始化
+        for header, loop in self.pipelines.items():
+            reg_init.append(f"\t\tpipe_{header}_cycle <= 0;")
+            reg_init.append(f"\t\tpipe_{header}_valid <= 0;")
+            reg_init.append(f"\t\tpipe_{header}_first <= 0;")
+            reg_init.append(f"\t\tpipe_{header}_exit <= 1'b0;")
+
+        yield self.verilog_syntax.always_ff(clk_signal="sys_clk", rst_signal="sys_rst_n", negedge_rst=True)
+        yield f"\tif (!sys_rst_n) begin"
+        yield from reg_init
+        yield f"\t\tlast_state <= state_{self.entry_state('0')};"
+        yield f"\t\tcur_state <= state_{self.entry_state('0')};"
+        # yield f"\t\tdone <= 1'b0;"
+        yield f"\tend"
+        yield f"\telse begin"
         
+        # 流水单元内部的各级寄存器每个周期前移一级
+        for op_type, device_idx in self.pipelined_units():
+            for stage in range(self.resources.latency[op_type] - 2, 0, -1):
+                yield f"\t\t{self.fu_stage_register(op_type, device_idx, stage)} <= {self.fu_stage_register(op_type, device_idx, stage-1)};"
+        # 分步单元逐级（逐周期）推进，多周期单元在发射时锁存操作数
+        yield from (f"\t\t{line}" for line in self.fu_register_updates())
 
-        # self.content_timing_logic.append(f"// xxxxxxxxx")
-        self.content_timing_logic.append(self.content_control_logic[0])
+        yield from self.gen_control_logic()
 
         first_condition = True  # 标记是否是第一个条件
-        # cond_all = [] # 所有的条件变量
         for u, v, data in self.hls.cfg.edges(data=True):
-            condition = data['condition']
-            # print(f"condition before:{condition}")
-            cond_wire = condition.split()[1] if len(condition.split()) >= 2 else condition
-            if cond_wire != 'true' and cond_wire not in self.cond_all:
-                self.content_wire.append(f"\twire {cond_wire};")
-                self.cond_all.append(cond_wire)
-                self.cond_block.append(u)
-            # print(f"condition after:{condition}")
-            if first_condition:
+            if u in self.pipelined_bodies:
+                # 流水化循环的循环体不会成为当前状态
+                continue
+            if u in self.pipelines:
+                # 流水化循环在所有迭代排空后离开循环
+                if v != self.pipelines[u].exit:
+                    continue
+                guard = f"{self.states.match('cur_state', u)} && pipe_{u}_exit == 1'b1 && pipe_{u}_valid == 0"
+            else:
+                condition = data['condition']
+                # 条件线网由 collect_branch_conditions 预先收集；状态转移发生在基本块的转移周期，与该周期的操作同时进行
+                ready = self.states.match('cur_state', self.branch_state(u))
+                if not self.flat:
+                    ready += f" && counter == {self.counter_value(self.branch_cycle[u])}"
                 if condition == "true":
-                    self.content_timing_logic.append(f"\t\tif (cur_state == state_{u} && branch_ready == 1'b1) begin")
+                    guard = ready
+                elif len(condition.split()) >= 2:
+                    guard = f"{ready} && {condition.split()[1]} == 1'b0"
                 else:
-                    if len(condition.split()) >= 2:
-                        condition = condition.split()[1]
-                        self.content_timing_logic.append(f"\t\tif (cur_state == state_{u} && branch_ready == 1'b1 && {condition} == 1'b0) begin")
-                    else:
-                        self.content_timing_logic.append(f"\t\tif (cur_state == state_{u} && branch_ready == 1'b1 && {condition} == 1'b1) begin")
-                first_condition = False
+                    guard = f"{ready} && {condition} == 1'b1"
 
+            if first_condition:
+                yield f"\t\tif ({guard}) begin"
+                first_condition = False
             else:
-                if condition == "true":
-                    self.content_timing_logic.append(f"\t\telse if (cur_state == state_{u} && branch_ready == 1'b1) begin")
-                else:
-                    if len(condition.split()) >= 2:
-                        condition = condition.split()[1]
-                        self.content_timing_logic.append(f"\t\telse if (cur_state == state_{u} && branch_ready == 1'b1 && {condition} == 1'b0) begin")
-                    else:
-                        self.content_timing_logic.append(f"\t\telse if (cur_state == state_{u} && branch_ready == 1'b1 && {condition} == 1'b1) begin")
+                yield f"\t\telse if ({guard}) begin"
             
-            self.content_timing_logic.append(f"\t\t\tlast_state <= cur_state;")
-            self.content_timing_logic.append(f"\t\t\tcur_state <= state_{v};")
-            self.content_timing_logic.append(f"\t\t\tbranch_ready <= 1'b0;")
-            self.content_timing_logic.append(f"\t\t\tcounter <= 32'b0;")
-            self.content_timing_logic.append(f"\t\tend")
+            yield f"\t\t\tlast_state <= cur_state;"
+            yield f"\t\t\tcur_state <= state_{self.entry_state(v)};"
+            if not self.flat:
+                yield f"\t\t\tcounter <= {self.counter_width}'b0;"
+            if v in self.pipelines:
+                yield from (f"\t\t\t{line}" for line in self.gen_pipeline_entry(self.pipelines[v], u))
+            if u in self.pipelines:
+                yield from (f"\t\t\t{line}" for line in self.gen_pipeline_exit(self.pipelines[u]))
+            yield from (f"\t\t\t{line}" for line in self.gen_phi_copies(u, v))
+            yield f"\t\tend"
         
-        self.content_timing_logic.append(f"\t\telse begin")
-        self.content_timing_logic.append(f"\t\t\tcounter <= counter + 1'b1;")
-        self.content_timing_logic.append(f"\t\tend")
-        self.content_timing_logic.append(f"\tend")
-        self.content_timing_logic.append(f"end")
-        # self.content_timing_logic.append(f"\t")
+        if self.fsm_style == 'wide':
+            yield f"\t\telse begin"
+            yield f"\t\t\tcounter <= counter + 1'b1;"
+            yield f"\t\tend"
+        elif self.fsm_style == 'narrow':
+            # 窄计数器在最大值处饱和：没有后继的基本块停留在跳转周期之后，计数器不能回绕而重新执行本块的操作
+            yield f"\t\telse if (counter != {self.counter_value(2 ** self.counter_width - 1)}) begin"
+            yield f"\t\t\tcounter <= counter + 1'b1;"
+            yield f"\t\tend"
+        yield f"\tend"
+        yield f"end"
 
     # def gen_br_counter(self):
     #     """
@@ -322,55 +702,666 @@ class VerilogGenerator:
     #     self.content_br_counter.append("end")
 
     def gen_control_logic(self):
-        # self.content_control_logic.append(self.verilog_syntax.always_comb(sensitive_list="counter"))
-        
-        outer_case_items = {}
+        """
+        逐行生成状态机的控制逻辑：外层按 cur_state、内层按 counter 的 case 语句，
+        每次只生成一个状态的语句，不把整个 case 拼接成字符串。
+        flat 结构没有内层 case：每个周期是一个状态，执行本周期的操作并进入下一个周期的状态，
+        转移周期的状态由状态转移逻辑离开
+        """
+        yield f"case ({self.states.case_expression('cur_state')})"
+        for bb_label, schedule_results in self.hls.schedule.items():
+            if bb_label in self.pipelined_bodies:
+                continue
+            if bb_label in self.pipelines:
+                yield f"\t{self.states.case_label('cur_state', bb_label)}: begin"
+                yield from (f"\t\t{line}" for line in self.gen_pipeline_logic(self.pipelines[bb_label]))
+                yield "\tend"
+            elif self.flat:
+                for cycle_idx, cycle_logic in self.gen_cycle_logic(bb_label, schedule_results):
+                    yield f"\t{self.states.case_label('cur_state', self.cycle_state(bb_label, cycle_idx))}: begin"
+                    yield from (f"\t\t{line.strip()}" for line in cycle_logic if line.strip())
+                    if cycle_idx < self.branch_cycle[bb_label]:
+                        yield f"\t\tcur_state <= state_{self.cycle_state(bb_label, cycle_idx + 1)};"
+                    yield "\tend"
+            else:
+                yield f"\t{self.states.case_label('cur_state', bb_label)}: begin"
+                yield from self.gen_state_logic(bb_label, schedule_results)
+                yield "\tend"
+        yield "endcase"
+
+    def gen_state_logic(self, bb_label, schedule_results):
+        """
+        一个基本块状态内按 counter 的 case 语句
+        """
+        yield "\t\tcase (counter)"
+        for cycle_idx, cycle_logic in self.gen_cycle_logic(bb_label, schedule_results):
+            # 处理 cycle_logic 的缩进：第一行保持原缩进，第二行及之后添加额外的缩进
+            if len(cycle_logic) > 1:
+                formatted_logic = [line if idx == 0 else f"\t\t\t\t{line}" for idx, line in enumerate(cycle_logic) if line.strip()]
+            else:
+                formatted_logic = [line for line in cycle_logic if line.strip()]
+
+            yield f"\t\t\t{self.counter_value(cycle_idx)}: begin"
+            yield f"\t\t\t\t{formatted_logic[0] if formatted_logic else ''}"
+            yield from formatted_logic[1:]
+            yield "\t\t\tend"
+        yield "\t\tendcase"
+
+    def gen_cycle_logic(self, bb_label, schedule_results):
+        """
+        逐周期给出基本块的语句 (周期, [语句])，到状态转移周期为止：之后的周期只剩跳转操作，不会执行
+        """
+        # 流水单元和多周期单元在发射后第（延迟 - 1）个周期把结果写回目标寄存器
+        writebacks = [[] for _ in schedule_results]
+        for cycle_idx, ops in enumerate(schedule_results):
+            for op_idx, device_idx in ops:
+                op = self.hls.basicBlocks[bb_label].ops[op_idx]
+                delay = self.resources.resultDelay(op[1])
+                if op[0] and delay and self.has_register(bb_label, op[0]):
+                    unit = self.fu_binding.get((bb_label, op_idx))
+                    result = unit.result if unit is not None else self.fu_stage_register(op[1], self.unit_device(op, device_idx), delay - 1)
+                    writebacks[cycle_idx + delay].append(f"\t{self.out_var_to_register_mapping(bb_label, op[0])} <= {result};")
+
+        for cycle_idx, ops in enumerate(schedule_results[:self.branch_cycle[bb_label] + 1]):
+            in_maps = self.cycle_operands.get((bb_label, cycle_idx), ({}, {}, set()))[0]
+
+            cycle_logic = []
+            for op_idx, device_idx in ops:
+                op = self.hls.basicBlocks[bb_label].ops[op_idx]
+                out_var = op[0]
+                if out_var and not self.has_register(bb_label, out_var):
+                    # 只在本周期内被链接使用的值和定义后从未被读取的值都没有寄存器，不需要写回
+                    continue
+                
+                # 调用op_translation 并获取返回的操作逻辑
+                op_trans_output = self.op_translation(bb_label, op[1], op.operands, out_var, in_maps.get(op_idx), device_idx=self.unit_device(op, device_idx),
+                                                      unit=self.fu_binding.get((bb_label, op_idx)))
+                cycle_logic.extend(op_trans_output)
+            cycle_logic.extend(writebacks[cycle_idx])
+            yield cycle_idx, cycle_logic
+
+    def gen_mux_select_logic(self):
+        """
+        生成功能单元的控制信号：组合逻辑，按当前状态和周期（流水化循环按迭代内周期）给出各端口多路选择器的选择值，
+        以及迭代单元和多周期单元在发射周期的 start；未使用单元的周期选择第 0 个输入
+        """
+        units = self.sorted_units()
+        defaults = []
+        state_items = {}
+        for unit in units:
+            signals = []
+            for port in range(2):
+                if len(unit.ports[port]) > 1:
+                    signals.append((unit.select(port), lambda selects, port=port: selects[port]))
+            if unit.has_start:
+                signals.append((unit.start, lambda selects: 1))
+            for signal, value in signals:
+                defaults.append(f"\t{signal} = 0;")
+                for (state, cycle), selects in unit.selects.items():
+                    state_items.setdefault(state, {}).setdefault(cycle, []).append(f"{signal} = {value(selects)};")
+        if not defaults:
+            return
+
+        yield "always @(*) begin"
+        yield from defaults
+        yield f"\tcase ({self.states.case_expression('cur_state')})"
+        for state in self.hls.schedule:
+            if state not in state_items:
+                continue
+            if self.flat and state not in self.pipelines:
+                # flat 结构中每个周期本身就是一个状态
+                for cycle, assignments in sorted(state_items[state].items()):
+                    yield f"\t\t{self.states.case_label('cur_state', self.cycle_state(state, cycle))}: begin"
+                    yield from (f"\t\t\t{assignment}" for assignment in assignments)
+                    yield f"\t\tend"
+                continue
+            if state in self.pipelines:
+                case_variable, cycle_label = f"pipe_{state}_cycle", lambda cycle: f"{cycle}"
+            else:
+                case_variable, cycle_label = "counter", self.counter_value
+            yield f"\t\t{self.states.case_label('cur_state', state)}: begin"
+            yield f"\t\t\tcase ({case_variable})"
+            for cycle, assignments in sorted(state_items[state].items()):
+                yield f"\t\t\t\t{cycle_label(cycle)}: begin"
+                yield from (f"\t\t\t\t\t{assignment}" for assignment in assignments)
+                yield f"\t\t\t\tend"
+            yield f"\t\t\tendcase"
+            yield f"\t\tend"
+        yield "\tendcase"
+        yield "end"
+
+    def sorted_units(self):
+        return sorted(self.functional_units.values(), key=lambda unit: (unit.op_type, unit.device_idx))
+
+    def functional_unit(self, op_type, device_idx):
+        name = fu_name(op_type, device_idx)
+        if name not in self.functional_units:
+            self.functional_units[name] = FunctionalUnit(op_type, device_idx, self.resources)
+        return self.functional_units[name]
+
+    def unit_reaches(self, source, target):
+        """
+        单元 source 的输出是否经由链接（组合地）到达单元 target
+        """
+        stack, seen = [source], {source}
+        while stack:
+            name = stack.pop()
+            if name == target:
+                return True
+            for succ in self.fu_edges.get(name, ()):
+                if succ not in seen:
+                    seen.add(succ)
+                    stack.append(succ)
+        return False
+
+    def bind_op(self, state_cycle, op_key, op, device_idx, free_devices, in_map, feeding):
+        """
+        把一个操作绑定到本周期同类型操作可用的设备之一：选择新增多路选择器输入最少的设备，
+        可交换操作同时尝试交换两个操作数；相同代价时保留调度器给出的设备。
+        feeding 是经由链接驱动该操作操作数的单元，会形成组合环的设备不参与选择；没有可用设备时返回 None，
+        该操作保留独立的组合逻辑
+        """
+        signals = [str(in_map(var)) for var in op.operands]
+        orders = [signals]
+        if op[1] in resourceData.COMMUTATIVE_OPS and signals[0] != signals[1]:
+            orders.append(signals[::-1])
+        best = None
+        for candidate in free_devices:
+            unit = self.functional_unit(op[1], candidate)
+            if any(self.unit_reaches(unit.name, source) for source in feeding):
+                continue
+            for swapped, order in enumerate(orders):
+                score = (unit.cost(order), candidate != device_idx, swapped)
+                if best is None or score < best[0]:
+                    best = (score, unit, order)
+        if best is None:
+            self.unbound_ops.append(op_key)
+            return None
+        _, unit, order = best
+        free_devices.remove(unit.device_idx)
+        unit.bind(op_key, state_cycle, order)
+        for source in feeding:
+            self.fu_edges.setdefault(source, set()).add(unit.name)
+        self.fu_binding[op_key] = unit
+        return unit
+
+    def cycle_devices(self, typed_devices):
+        """
+        [(操作类型, 设备序号)] -> {操作类型: [设备序号]}，只保留需要绑定的操作类型
+        """
+        devices = {}
+        for op_type, device_idx in typed_devices:
+            if op_type in resourceData.SHAREABLE_OPS:
+                devices.setdefault(op_type, []).append(device_idx)
+        return devices
+
+    def bind_functional_units(self):
+        """
+        功能单元绑定：把调度结果中的 (op_idx, device_idx) 变为共享的功能单元实例，操作数经由多路选择器接入。
+        同一周期发射的同类型操作占用设备的时间完全相同，可以在调度器分给它们的设备之间任意交换，
+        按操作顺序贪心地选择新增多路选择器输入最少的设备。
+        同一周期内链接的操作：后继直接使用本周期内序号更小的前驱的单元输出或组合表达式，而不是前驱的寄存器。
+        """
         for bb_label, schedule_results in self.hls.schedule.items():
-            inner_case_items = {}
+            if bb_label in self.pipelined_bodies or bb_label in self.pipelines:
+                continue
+            ops_list = self.hls.basicBlocks[bb_label].ops
             for cycle_idx, ops in enumerate(schedule_results):
-                check_last_cycle = (cycle_idx == len(schedule_results) - 1)
-                # print(f"len_schedule_results of {bb_label}: {len(schedule_results)}")
-                # print(f"cycle_idx {cycle_idx}")
-                # print(check_last_cycle)
+                free_devices = self.cycle_devices((ops_list[op_idx][1], device_idx) for op_idx, device_idx in ops)
+                chained = {}
+                chained_units = {}
+                in_maps = {}
+                chained_uses = set()
+                for op_idx, device_idx in sorted(ops):
+                    op = ops_list[op_idx]
+                    visible = dict(chained)
+                    in_map = lambda var, visible=visible, bb_label=bb_label: visible[var] if var in visible else self.in_var_to_register_mapping(bb_label, var)
+                    if visible:
+                        in_maps[op_idx] = in_map
+                    used = get_op_operands(op) & visible.keys()
+                    chained_uses |= used
+                    feeding = set().union(*(chained_units[var] for var in used))
+                    unit = None
+                    if op[1] in free_devices:
+                        unit = self.bind_op((bb_label, cycle_idx), (bb_label, op_idx), op, device_idx, free_devices[op[1]], in_map, feeding)
+                    if op[0] and self.resources.isChainable(op[1]):
+                        if unit is not None:
+                            chained[op[0]] = unit.output
+                            chained_units[op[0]] = {unit.name}
+                        else:
+                            chained[op[0]] = self.chained_expression(bb_label, op, in_map)
+                            chained_units[op[0]] = feeding
+                    elif op[0]:
+                        chained.pop(op[0], None)
+                        chained_units.pop(op[0], None)
+                if in_maps:
+                    self.cycle_operands[(bb_label, cycle_idx)] = (in_maps, chained, chained_uses)
+
+        # 流水化循环：按迭代内周期（模 II）绑定，同一偏移上的操作在模调度预约表中占用相同
+        for header, loop in self.pipelines.items():
+            for offset in range(loop.ii):
+                nodes = sorted((start, node) for node, start in loop.start.items() if start % loop.ii == offset)
+                free_devices = self.cycle_devices((loop.op(self.hls, node)[1], loop.device[node]) for _, node in nodes)
+                for start, node in nodes:
+                    label, op_idx = loop.nodes[node]
+                    op = loop.op(self.hls, node)
+                    if op[1] in free_devices:
+                        in_map = lambda var, label=label, start=start: self.pipeline_operand(loop, label, var, start)
+                        self.bind_op((header, offset), (label, op_idx), op, loop.device[node], free_devices[op[1]], in_map, set())
+
+    def gen_fu_section(self, section):
+        """
+        共享功能单元在某一段中的代码：section 为 'reg'、'wire' 或 'assign'
+        """
+        return (line for kind, line in self.gen_fu_logic() if kind == section)
+
+    def gen_fu_logic(self):
+        """
+        生成共享功能单元：操作数端口、多路选择器的选择信号以及单元本身的逻辑，
+        逐行给出 (段, 代码)，段为 'reg'、'wire' 或 'assign'
+        """
+        for unit in self.sorted_units():
+            for port in range(2):
+                yield 'wire', f"\twire [31:0] {unit.input(port)};"
+                if len(unit.ports[port]) > 1:
+                    yield 'reg', f"\treg [{unit.select_width(port)-1}:0] {unit.select(port)};"
+            if unit.has_start:
+                yield 'reg', f"\treg {unit.start};"
+
+            for port, inputs in enumerate(unit.ports):
+                # (sel == n-1) ? in_n-1 : ... (sel == 1) ? in_1 : in_0
+                expression = ''.join(f"({unit.select(port)} == {idx}) ? {inputs[idx]} : " for idx in range(len(inputs) - 1, 0, -1)) + str(inputs[0])
+                yield 'assign', f"assign {unit.input(port)} = {expression};"
+
+            if unit.style in ('staged', 'iterative'):
+                yield from self.gen_stepped_unit(unit)
+                continue
+            if unit.style == 'multicycle':
+                # 多周期单元在发射时锁存操作数，组合逻辑的输入在（延迟 - 1）个周期内保持不变
+                in_1, in_2 = f"{unit.name}_a", f"{unit.name}_b"
+                yield 'reg', f"\treg [31:0] {in_1};"
+                yield 'reg', f"\treg [31:0] {in_2};"
+            else:
+                in_1, in_2 = unit.input(0), unit.input(1)
+            yield 'wire', f"\twire [31:0] {unit.output};"
+            yield 'assign', f"assign {unit.output} = {binary_expression(unit.op_type, in_1, in_2)};"
+
+    def gen_stepped_unit(self, unit):
+        """
+        生成分步实现的乘法/除法单元的寄存器与组合逻辑，共（延迟 - 1）步，每步处理 step_bits 位：
+        乘法每步累加被乘数与乘数低 step_bits 位的乘积，然后被乘数左移、乘数右移 step_bits 位；
+        除法每步做 step_bits 次基 2 恢复余数除法，被除数高位补 pad_bits 个零，使总步数恰好覆盖。
+        staged 单元每一步是一级寄存器，iterative 单元只有一组寄存器，由 start 选择装入操作数还是继续迭代
+        """
+        name = unit.name
+        width = 32 + unit.pad_bits
+        if unit.style == 'staged':
+            stages = [(f"{name}_step{step}", f"_s{step}", step == unit.steps - 1) for step in range(unit.steps)]
+        else:
+            stages = [(f"{name}_step", "", False)]
+        for step, (prefix, suffix, last) in enumerate(stages):
+            if unit.op_type == resourceData.OP_MUL:
+                yield 'reg', f"\treg [31:0] {name}_acc{suffix};"
+                if not last:
+                    yield 'reg', f"\treg [31:0] {name}_a{suffix};"
+                    yield 'reg', f"\treg [31:0] {name}_b{suffix};"
+                if unit.style == 'iterative':
+                    for var, initial in (("acc", "32'd0"), ("a", unit.input(0)), ("b", unit.input(1))):
+                        yield 'wire', f"\twire [31:0] {prefix}_{var};"
+                        yield 'assign', f"assign {prefix}_{var} = {unit.start} ? {initial} : {name}_{var};"
+                continue
+
+            if not last:
+                yield 'reg', f"\treg [31:0] {name}_rem{suffix};"
+                yield 'reg', f"\treg [31:0] {name}_den{suffix};"
+            yield 'reg', f"\treg [{width-1}:0] {name}_quo{suffix};"
+            dividend = f"{{{unit.pad_bits}'b0, {unit.input(0)}}}" if unit.pad_bits else unit.input(0)
+            if unit.style == 'iterative':
+                initial = [("rem0", 32, f"{unit.start} ? 32'd0 : {name}_rem"),
+                           ("quo0", width, f"{unit.start} ? {dividend} : {name}_quo"),
+                           ("den", 32, f"{unit.start} ? {unit.input(1)} : {name}_den")]
+            elif step == 0:
+                initial = [("rem0", 32, "32'd0"), ("quo0", width, dividend), ("den", 32, unit.input(1))]
+            else:
+                initial = [("rem0", 32, f"{name}_rem_s{step-1}"), ("quo0", width, f"{name}_quo_s{step-1}"), ("den", 32, f"{name}_den_s{step-1}")]
+            for var, var_width, expression in initial:
+                yield 'wire', f"\twire [{var_width-1}:0] {prefix}_{var};"
+                yield 'assign', f"assign {prefix}_{var} = {expression};"
+            for bit in range(1, unit.step_bits + 1):
+                rem, quo = f"{prefix}_rem{bit-1}", f"{prefix}_quo{bit-1}"
+                trial = f"{{{rem}, {quo}[{width-1}]}}"
+                divisor = f"{{1'b0, {prefix}_den}}"
+                yield 'wire', f"\twire [31:0] {prefix}_rem{bit};"
+                yield 'wire', f"\twire [{width-1}:0] {prefix}_quo{bit};"
+                yield 'assign', f"assign {prefix}_rem{bit} = ({trial} >= {divisor}) ? ({trial} - {divisor}) : {trial};"
+                yield 'assign', f"assign {prefix}_quo{bit} = {{{quo}[{width-2}:0], ({trial} >= {divisor})}};"
+
+    def fu_register_updates(self):
+        """
+        分步单元与多周期单元每个周期的寄存器更新，放在时序逻辑中、状态机控制逻辑之前
+        """
+        lines = []
+        for unit in self.sorted_units():
+            name = unit.name
+            bits = unit.step_bits
+            if unit.style == 'multicycle':
+                lines.append(f"{name}_a <= {unit.start} ? {unit.input(0)} : {name}_a;")
+                lines.append(f"{name}_b <= {unit.start} ? {unit.input(1)} : {name}_b;")
+            elif unit.style == 'iterative' and unit.op_type == resourceData.OP_MUL:
+                step = f"{name}_step"
+                lines.append(f"{name}_acc <= {step}_acc + {step}_a * {step}_b[{bits-1}:0];")
+                lines.append(f"{name}_a <= {step}_a << {bits};")
+                lines.append(f"{name}_b <= {step}_b >> {bits};")
+            elif unit.style == 'iterative':
+                step = f"{name}_step"
+                lines.append(f"{name}_rem <= {step}_rem{bits};")
+                lines.append(f"{name}_quo <= {step}_quo{bits};")
+                lines.append(f"{name}_den <= {step}_den;")
+            elif unit.style == 'staged':
+                for step in range(unit.steps):
+                    last = step == unit.steps - 1
+                    if unit.op_type == resourceData.OP_MUL:
+                        if step == 0:
+                            acc, a, b = "", unit.input(0), unit.input(1)
+                        else:
+                            acc, a, b = f"{name}_acc_s{step-1} + ", f"{name}_a_s{step-1}", f"{name}_b_s{step-1}"
+                        lines.append(f"{name}_acc_s{step} <= {acc}{a} * {b}[{bits-1}:0];")
+                        if not last:
+                            lines.append(f"{name}_a_s{step} <= {a} << {bits};")
+                            lines.append(f"{name}_b_s{step} <= {b} >> {bits};")
+                    else:
+                        prefix = f"{name}_step{step}"
+                        lines.append(f"{name}_quo_s{step} <= {prefix}_quo{bits};")
+                        if not last:
+                            lines.append(f"{name}_rem_s{step} <= {prefix}_rem{bits};")
+                            lines.append(f"{name}_den_s{step} <= {prefix}_den;")
+        return lines
+
+    def gen_constraints(self):
+        """
+        生成多周期路径约束：多周期单元锁存的操作数在发射后保持（延迟 - 1）个周期，
+        其组合逻辑到目标寄存器的路径可以用（延迟 - 1）个时钟周期完成
+        """
+        for unit in self.sorted_units():
+            cycles = unit.latency - 1
+            if unit.style != 'multicycle' or cycles < 2:
+                continue
+            cells = f"[get_cells {{{unit.name}_a_reg* {unit.name}_b_reg*}}]"
+            self.content_constraints.append(f"# {unit.name}: {resourceData.OP_TYPE_MAP[unit.op_type]}, latency {unit.latency}")
+            self.content_constraints.append(f"set_multicycle_path {cycles} -setup -from {cells}")
+            self.content_constraints.append(f"set_multicycle_path {cycles - 1} -hold -from {cells}")
+
+    def pipeline_copy_ranges(self, loop):
+        """
+        计算流水化循环中每个值需要的流水寄存器级数范围 {变量: (首级, 末级)}。
+        值在第 stage(t+1) 级可见，之后每个迭代间隔整体后移一级，读取者在自己所在的级读取。
+        """
+        stage = loop.stage
+        ranges = {}
+
+        def need(var, last):
+            first, current = ranges[var]
+            ranges[var] = (first, max(current, last))
+
+        for node, start in loop.start.items():
+            out_var = loop.op(self.hls, node)[0]
+            if out_var:
+                visible = stage(start + self.loop_result_delay(loop, node) + 1)
+                ranges[out_var] = (visible, visible)
+        for node, start in loop.start.items():
+            for var in get_op_operands(loop.op(self.hls, node)):
+                if var in loop.defs:
+                    need(var, stage(start))
+                elif var in loop.phis and loop.phis[var][1] in loop.defs:
+                    need(loop.phis[var][1], stage(start) + 1)
+        exit_stage = stage(loop.exit_cycle)
+        for var in [loop.exit_condition[0]] + loop.live_outs:
+            if var in loop.defs:
+                need(var, exit_stage)
+            elif var in loop.phis and var not in loop.shadow_live_outs and loop.phis[var][1] in loop.defs:
+                need(loop.phis[var][1], exit_stage + 1)
+        return ranges
+
+    def loop_result_delay(self, loop, node):
+        """
+        流水化循环中操作的结果在发射后第几个周期写入流水寄存器：多周期单元为（延迟 - 1），其余为 0
+        """
+        unit = self.fu_binding.get(loop.nodes[node])
+        return unit.writeback_delay if unit is not None else 0
+
+    def pipeline_initial_value(self, loop, inits):
+        """
+        phi 在第一次迭代中的取值：根据进入循环前的状态选择初值
+        """
+        init_var, pred = inits[-1]
+        value = self.in_var_to_register_mapping(pred, init_var)
+        for init_var, pred in reversed(inits[:-1]):
+            value = f"(({self.states.match('last_state', self.branch_state(pred))}) ? {self.in_var_to_register_mapping(pred, init_var)} : {value})"
+        return value
+
+    def pipeline_operand(self, loop, bb_label, var, cycle):
+        """
+        流水化循环中，迭代内第 cycle 周期读取变量 var 时对应的信号
+        """
+        prefix = f"pipe_{loop.header}"
+        cur_stage = loop.stage(cycle)
+        if var in loop.defs:
+            return f"{prefix}_{var}_s{cur_stage}"
+        if var in loop.phis:
+            inits, carried = loop.phis[var]
+            if carried in loop.defs:
+                carried_signal = f"{prefix}_{carried}_s{cur_stage + 1}"
+            else:
+                carried_signal = self.in_var_to_register_mapping(loop.body, carried)
+            return f"({prefix}_first[{cur_stage}] ? {self.pipeline_initial_value(loop, inits)} : {carried_signal})"
+        return self.in_var_to_register_mapping(bb_label, var)
+
+    def gen_pipeline_register(self):
+        """
+        生成流水化循环的控制寄存器、各级流水寄存器以及循环出口值寄存器
+        """
+        for header, loop in self.pipelines.items():
+            prefix = f"pipe_{header}"
+            cycle_width = max(1, (loop.ii - 1).bit_length())
+            yield f"\treg [{cycle_width-1}:0] {prefix}_cycle;"
+            yield f"\treg [{loop.stages-1}:0] {prefix}_valid;"
+            yield f"\treg [{loop.stages-1}:0] {prefix}_first;"
+            yield f"\treg {prefix}_exit;"
+            for var, (first, last) in self.pipeline_copy_ranges(loop).items():
+                for cur_stage in range(first, last + 1):
+                    yield f"\treg [31:0] {prefix}_{var}_s{cur_stage};"
+            for var in loop.live_outs:
+                yield f"\treg [31:0] {prefix}_{var}_out;"
+
+    def gen_pipeline_entry(self, loop, pred):
+        """
+        从 pred 进入流水化循环：第一次迭代进入第 0 级
+        """
+        prefix = f"pipe_{loop.header}"
+        lines = [
+            f"{prefix}_cycle <= 0;",
+            f"{prefix}_valid <= {loop.stages}'b1;",
+            f"{prefix}_first <= {loop.stages}'b1;",
+            f"{prefix}_exit <= 1'b0;",
+        ]
+        for var in loop.shadow_live_outs:
+            for init_var, init_pred in loop.phis[var][0]:
+                if init_pred == pred:
+                    lines.append(f"{prefix}_{var}_out <= {self.in_var_to_register_mapping(pred, init_var)};")
+        return lines
+
+    def gen_pipeline_exit(self, loop):
+        """
+        离开流水化循环：把退出迭代的出口值写回循环头中这些变量的寄存器
+        """
+        prefix = f"pipe_{loop.header}"
+        return [f"{self.out_var_to_register_mapping(loop.header, var)} <= {prefix}_{var}_out;" for var in loop.live_outs]
 
-                cycle_logic = []
+    def gen_phi_copies(self, pred, bb_label):
+        """
+        消除的 phi 在状态转移 pred -> bb_label 时的复制：把 pred 给出的值写入 phi 结果的寄存器，
+        寄存器分配已合并的复制（源与目标是同一个寄存器）不生成。离开流水化循环时循环的出口值取自 pipe_{循环头}_{变量}_out；
+        进入流水化循环时 phi 的初值由 gen_pipeline_entry 处理
+        """
+        if bb_label in self.pipelines:
+            return []
+        loop = self.pipelines.get(pred)
+        lines = []
+        for phi in self.hls.basicBlocks[bb_label].phis:
+            if not self.has_register(bb_label, phi.value):
+                continue
+            out_signal = self.out_var_to_register_mapping(bb_label, phi.value)
+            for value, source in zip(phi.operands[0::2], phi.operands[1::2]):
+                if source != pred:
+                    continue
+                if loop is not None and value in loop.live_outs:
+                    in_signal = f"pipe_{pred}_{value}_out"
+                else:
+                    in_signal = self.in_var_to_register_mapping(pred, value)
+                if str(in_signal) != out_signal:
+                    lines.append(f"{out_signal} <= {in_signal};")
+        return lines
+
+    def gen_pipeline_logic(self, loop):
+        """
+        生成流水化循环的重叠迭代状态逻辑。
+        每个迭代间隔 II 个周期发射一个新迭代，第 s 级的操作只在 valid[s] 有效时执行：
+        valid 逐级填充即为序言（prologue），全部有效时为内核（kernel），
+        检测到退出条件后不再发射新迭代，并作废退出迭代之后的推测迭代，剩余迭代排空即为尾声（epilogue）。
+        """
+        prefix = f"pipe_{loop.header}"
+        ii = loop.ii
+        num_stages = loop.stages
+        lines = [f"case ({prefix}_cycle)"]
+        # 多周期单元的操作在发射后第（延迟 - 1）个周期写回，其余操作在发射周期写入
+        writes = [(start + self.loop_result_delay(loop, node), start, node) for node, start in loop.start.items()]
+        for offset in range(ii):
+            lines.append(f"\t{offset}: begin")
+            nodes = sorted(write for write in writes if write[0] % ii == offset)
+            for write, start, node in nodes:
+                label, op_idx = loop.nodes[node]
+                op = loop.op(self.hls, node)
+                in_map = lambda var, label=label, start=start: self.pipeline_operand(loop, label, var, start)
+                out_map = lambda var, write=write: f"{prefix}_{var}_s{loop.stage(write + 1)}"
+                unit = self.fu_binding.get((label, op_idx))
+                if write > start:
+                    translate = lambda out_map: [f"{out_map(op[0])} <= {unit.result};"]
+                else:
+                    translate = lambda out_map: self.op_translation(label, op[1], op.operands, op[0], in_map, out_map, unit=unit)
+                op_lines = translate(out_map)
+                for var in loop.shadow_live_outs:
+                    if loop.phis[var][1] == op[0]:
+                        op_lines += translate(lambda _, var=var: f"{prefix}_{var}_out")
+                lines.append(f"\t\tif ({prefix}_valid[{loop.stage(write)}]) begin")
+                lines.extend(f"\t\t\t{line.strip()}" for line in op_lines)
+                lines.append(f"\t\tend")
+            lines.append(f"\tend")
+        lines.append("endcase")
+
+        # 每个迭代间隔结束时：所有迭代前进一级，发射新迭代
+        lines.append(f"if ({prefix}_cycle == {ii-1}) begin")
+        lines.append(f"\t{prefix}_cycle <= 0;")
+        if num_stages > 1:
+            lines.append(f"\t{prefix}_valid <= {{{prefix}_valid[{num_stages-2}:0], ~{prefix}_exit}};")
+            lines.append(f"\t{prefix}_first <= {{{prefix}_first[{num_stages-2}:0], 1'b0}};")
+        else:
+            lines.append(f"\t{prefix}_valid <= ~{prefix}_exit;")
+            lines.append(f"\t{prefix}_first <= 1'b0;")
+        for var, (first, last) in self.pipeline_copy_ranges(loop).items():
+            for cur_stage in range(last, first, -1):
+                lines.append(f"\t{prefix}_{var}_s{cur_stage} <= {prefix}_{var}_s{cur_stage-1};")
+        lines.append("end")
+        lines.append("else begin")
+        lines.append(f"\t{prefix}_cycle <= {prefix}_cycle + 1'b1;")
+        lines.append("end")
+
+        # 退出条件：停止发射，作废退出迭代及其之后的迭代，记录出口值
+        cond_var, leave_value = loop.exit_condition
+        exit_offset = loop.exit_cycle % ii
+        exit_stage = loop.stage(loop.exit_cycle)
+        cond_signal = self.pipeline_operand(loop, loop.header, cond_var, loop.exit_cycle)
+        cond_bit = f"{cond_signal}[0]" if isinstance(cond_signal, str) else f"1'b{cond_signal & 1}"
+        if exit_offset == ii - 1:
+            # 与级间移动发生在同一时钟沿，退出迭代此时已移到下一级
+            kept = ''.join('1' if i > exit_stage + 1 else '0' for i in reversed(range(num_stages)))
+            killed = f"({prefix}_valid << 1) & {num_stages}'b{kept}"
+        else:
+            kept = ''.join('1' if i > exit_stage else '0' for i in reversed(range(num_stages)))
+            killed = f"{prefix}_valid & {num_stages}'b{kept}"
+        lines.append(f"if ({prefix}_cycle == {exit_offset} && {prefix}_valid[{exit_stage}] && {cond_bit} == 1'b{leave_value}) begin")
+        lines.append(f"\t{prefix}_exit <= 1'b1;")
+        lines.append(f"\t{prefix}_valid <= {killed};")
+        for var in loop.live_outs:
+            if var not in loop.shadow_live_outs:
+                lines.append(f"\t{prefix}_{var}_out <= {self.pipeline_operand(loop, loop.header, var, loop.exit_cycle)};")
+        lines.append("end")
+        return lines
+
+    def has_register(self, bb_label, var):
+        """
+        变量在该基本块中是否分配了寄存器
+        """
+        return var in self.global_reg or self.get_register_for_variable(bb_label, var) is not None
+
+    def chained_expression(self, bb_label, op, in_map):
+        """
+        返回单周期组合操作的右值表达式，供同一周期内链接的后继操作直接使用
+        """
+        op_type = op[1]
+        if op_type == resourceData.OP_PHI:
+            # phi 链接时按照上一个状态选择输入
+            values, bb_labels = op.operands[0::2], op.operands[1::2]
+            expression = self.in_var_to_register_mapping(bb_labels[-1], values[-1])
+            for value, pred in reversed(list(zip(values[:-1], bb_labels[:-1]))):
+                expression = f"(({self.states.match('last_state', self.branch_state(pred))}) ? {self.in_var_to_register_mapping(pred, value)} : {expression})"
+            return expression
+        in_signal = [in_map(var) for var in op.operands]
+        if op_type == resourceData.OP_ASSIGN:
+            return f"{in_signal[0]}"
+        if op_type in COMPARE_OPS:
+            return binary_expression(op_type, in_signal[0], in_signal[1])
+        if op_type in BINARY_OPERATORS:
+            return f"({binary_expression(op_type, in_signal[0], in_signal[1])})"
+        return None
+
+    def pipelined_units(self):
+        """
+        返回状态机中用到的、在发射周期计算结果再经过各级寄存器延迟的流水单元 [(操作类型, 设备序号)]，
+        分步实现的乘法/除法单元有自己的各级寄存器，流水化循环内的操作不经过这些单元
+        """
+        units = set()
+        for bb_label, schedule_results in self.hls.schedule.items():
+            if bb_label in self.pipelines or bb_label in self.pipelined_bodies:
+                continue
+            for ops in schedule_results:
                 for op_idx, device_idx in ops:
                     op = self.hls.basicBlocks[bb_label].ops[op_idx]
-                    out_var = op[0]
-                    op_type = op[1]
-                    op_type_name = resourceData.OP_TYPE_MAP.get(op_type, "UNKNOWN_OP")
-                    in_var = op[2:]
-                    # in_var = in_var[0] if len(in_var) == 1 else in_var
-                    # print(f"basic block {bb_label}:\t{out_var}\t{op_type_name}\t{in_var}")
-                    
-                    # 调用op_translation 并获取返回的操作逻辑
-                    op_trans_output = self.op_translation(bb_label, cycle_idx, op_type_name, in_var, out_var)
-                    cycle_logic.extend(op_trans_output)
-                
-                if (check_last_cycle):
-                    cycle_logic.append("\tbranch_ready <= 1'b1;")
-                
-                # 处理 cycle_logic 的缩进
-                if len(cycle_logic) > 1:
-                    # 第一行保持原缩进，第二行及之后添加额外的缩进
-                    formatted_logic = "\n".join(
-                        f"{line}" if idx == 0 else f"\t\t\t\t{line}"
-                        for idx, line in enumerate(cycle_logic)
-                        if line.strip()
-                    )
-                else:
-                    # 如果只有一行，保持原缩进
-                    formatted_logic = "\n".join(f"{line}" for line in cycle_logic if line.strip())
+                    if self.resources.isPipelined(op[1]) and op[1] not in resourceData.STEPPED_OPS:
+                        units.add((op[1], self.unit_device(op, device_idx)))
+        return sorted(units)
 
-                inner_case_items[f"32'd{cycle_idx}"] = formatted_logic
-            
-            inner_case_code = self.verilog_syntax.inner_case(case_variable="counter", case_items=inner_case_items)
-            outer_case_items[f"state_{bb_label}"] = inner_case_code
+    def unit_device(self, op, device_idx):
+        """
+        调度结果中的设备序号对应的单元：取数和存数的序号是所访问数组的端口号，单元以数组和端口命名，
+        例如 a 的第 0 个读端口为 fu_load_a_0，访问不同数组的操作不共用单元
+        """
+        if op[1] in resourceData.MEMORY_OPS:
+            return f"{op[2]}_{device_idx}"
+        return device_idx
 
-        # 生成外层case语句
-        outer_case_code = self.verilog_syntax.outer_case(case_variable="cur_state", case_items=outer_case_items)
-        self.content_control_logic.append(outer_case_code)
-        # self.content_control_logic.append("end")
+    def fu_stage_register(self, op_type, device_idx, stage):
+        """
+        流水单元第 stage 级寄存器的名字，例如 fu_mul_0_s0
+        """
+        return f"{fu_name(op_type, device_idx)}_s{stage}"
+
+    def gen_fu_register(self):
+        """
+        生成流水单元的各级寄存器：发射时写入第 0 级，之后每个周期前移一级，共（延迟 - 1）级
+        """
+        for op_type, device_idx in self.pipelined_units():
+            for stage in range(self.resources.latency[op_type] - 1):
+                yield f"\treg [31:0] {self.fu_stage_register(op_type, device_idx, stage)};"
 
     def in_var_to_register_mapping(self, bb_label, input_variable):
         if input_variable in self.global_reg:
@@ -396,24 +1387,14 @@ class VerilogGenerator:
         :param variable_name: 变量名称（如 'i_inc'）
         :return: 寄存器编号（如 2），如果未找到则返回 None
         """
-        # 获取指定基本块的寄存器分配结果
-        block_registers = self.hls.merged_coloring_result.get(block_name, {})
-        
-        # 遍历寄存器分配结果，查找变量所在的寄存器
-        for reg, variables in block_registers.items():
-            for var in variables:
-                if var[0] == variable_name:
-                    # print(f"reg matched, {variable_name} to {reg}")
-                    return reg  # 返回寄存器编号
-        
-        # 如果未找到变量，返回 None
-        return None
+        # 直接查 prepare 建立的 (基本块, 变量) -> 寄存器索引
+        return self.register_index.get((block_name, variable_name))
 
     def check_int(self, value):
         try:
             if isinstance(value, int):
                 return True
-            elif isinstance(value, str) and value.isdigit():
+            elif isinstance(value, str) and self.hls.symbols.isConstant(value):
                 return True
             else:
                 return False
@@ -421,176 +1402,131 @@ class VerilogGenerator:
             return False
         
     def check_non_array_input(self, value):
-        non_array_list = []
-        for input_param in self.hls.params:
-            if input_param[1] == 'non-array':
-                non_array_list.append(input_param[0])
-        
-        if value in non_array_list:
-            return True
-        else:
-            return False
+        return value in self.non_array_params
 
-    def op_translation(self, bb_label, cycle_idx, cur_op_type, in_var, out_var):
-        # 需要把 in_var 和 out_var 转换成对应的 in_signal 和 out_signal
-        # print(f"out var: {out_var}; in var: {in_var}.")
-        in_signal = []
-
-        op_trans_output = []
-        # op_trans_output.append(f"32'd{cur_cycle} begin:\n")
-        match cur_op_type:
-            case "OP_ASSIGN":
-                for var in in_var:
-                    in_signal.append(self.in_var_to_register_mapping(bb_label, var))
-                out_signal = self.out_var_to_register_mapping(bb_label, out_var)
-                op_trans_output.append(f"\t{out_signal} <= {in_signal[0]};")
-
-            case "OP_ADD":
-                for var in in_var:
-                    in_signal.append(self.in_var_to_register_mapping(bb_label, var))
-                out_signal = self.out_var_to_register_mapping(bb_label, out_var)
-                in1, in2 = in_signal
-                op_trans_output.append(f"\t{out_signal} <= {in1} + {in2};")
-
-            case "OP_SUB":
-                for var in in_var:
-                    in_signal.append(self.in_var_to_register_mapping(bb_label, var))
-                out_signal = self.out_var_to_register_mapping(bb_label, out_var)
-                in1, in2 = in_signal
-                op_trans_output.append(f"\t{out_signal} <= {in1} - {in2};")
-
-            case "OP_MUL":
-                for var in in_var:
-                    in_signal.append(self.in_var_to_register_mapping(bb_label, var))
-                out_signal = self.out_var_to_register_mapping(bb_label, out_var)
-                in1, in2 = in_signal
-                op_trans_output.append(f"\t{out_signal} <= {in1} * {in2};")
-
-            case "OP_DIV":
-                for var in in_var:
-                    in_signal.append(self.in_var_to_register_mapping(bb_label, var))
-                out_signal = self.out_var_to_register_mapping(bb_label, out_var)
-                in1, in2 = in_signal
-                op_trans_output.append(f"\t{out_signal} <= {in1} / {in2};")
-
-            case "OP_LOAD":
-                # print(f"out var: {out_var}; in var: {in_var}.")
-                # op_trans_output.append(f"\t{out_signal} <= a_q0;")
-                out_signal = self.out_var_to_register_mapping(bb_label, out_var)
-                idx = self.in_var_to_register_mapping(bb_label, in_var[1])
-                op_trans_output.append(f"\t{out_signal} <= {in_var[0]}_mem[{idx}];")
-                
-            case "OP_STORE":
-                # print(f"out var: {out_var}; in var: {in_var}.")
-                # out_signal = self.out_var_to_register_mapping(bb_label, out_var)
-                idx = self.in_var_to_register_mapping(bb_label, in_var[1])
-                temp_reg = self.in_var_to_register_mapping(bb_label, in_var[2])
-                op_trans_output.append(f"\t{in_var[0]}_mem[{idx}] <= {temp_reg};")
-
-            case "OP_BR":
-                # print(f"out var: {out_var}; in var: {in_var}.")
-                # 分支操作不直接生成代码，通常由状态机控制
-                pass
-
-            case "OP_LT":
-                for var in in_var:
-                    in_signal.append(self.in_var_to_register_mapping(bb_label, var))
-                out_signal = self.out_var_to_register_mapping(bb_label, out_var)
-                in_1, in_2 = in_signal
-                op_trans_output.append(f"\t{out_signal} <= {{31'b0, ({in_1} < {in_2})}};")
-
-            case "OP_GT":
-                for var in in_var:
-                    in_signal.append(self.in_var_to_register_mapping(bb_label, var))
-                out_signal = self.out_var_to_register_mapping(bb_label, out_var)
-                in_1, in_2 = in_signal
-                op_trans_output.append(f"\t{out_signal} <= {{31'b0, ({in_1} > {in_2})}};")
-
-            case "OP_LE":
-                for var in in_var:
-                    in_signal.append(self.in_var_to_register_mapping(bb_label, var))
-                out_signal = self.out_var_to_register_mapping(bb_label, out_var)
-                in_1, in_2 = in_signal
-                op_trans_output.append(f"\t{out_signal} <= {{31'b0, ({in_1} <= {in_2})}};")
-
-            case "OP_GE":
-                # print(f"out var: {out_var}; in var: {in_var}.")
-                # print(self.hls.params)
-                for var in in_var:
-                    in_signal.append(self.in_var_to_register_mapping(bb_label, var))
-                out_signal = self.out_var_to_register_mapping(bb_label, out_var)
-                
-                in_1, in_2 = in_signal
-                op_trans_output.append(f"\t{out_signal} <= {{31'b0, ({in_1} >= {in_2})}};")
-
-            case "OP_EQ":
-                for var in in_var:
-                    in_signal.append(self.in_var_to_register_mapping(bb_label, var))
-                out_signal = self.out_var_to_register_mapping(bb_label, out_var)
-                in_1, in_2 = in_signal
-                op_trans_output.append(f"\t{out_signal} <= {{31'b0, ({in_1} == {in_2})}};")
-
-            case "OP_PHI":
-                # print(f"out var: {out_var}; in var: {in_var}.")
-                out_signal = self.out_var_to_register_mapping(bb_label, out_var)
-
-                phi_results = []
-                # phi 的输入应该是2n个，奇数项为basic_block_label，偶数项为value
-                bb_labels = [x for i, x in enumerate(in_var) if i % 2 != 0]
-                values = [x for i, x in enumerate(in_var) if i % 2 == 0]
-
-                for idx, var in enumerate(values):
-                    in_signal.append(self.in_var_to_register_mapping(bb_label=bb_labels[idx], input_variable=var))
-                
-                for i in range(len(values)):
-                    if i == 0:
-                        phi_results.append(f"\tif (last_state == state_{bb_labels[i]}) {out_signal} <= {in_signal[i]};")
-                    else:
-                        phi_results.append(f"\telse if (last_state == state_{bb_labels[i]}) {out_signal} <= {in_signal[i]};")
-                op_trans_output.extend(phi_results)
-                
-            case "OP_RET":
-                # print(f"out var: {out_var}; in var: {in_var}.")
-                # for var in in_var:
-                #     self.return_reg = self.in_var_to_register_mapping(bb_label, var)
-                # print(self.return_reg)
-                # return_val 是线网类型，所以在最后用assign赋值。
-                in_signal.append(self.in_var_to_register_mapping(bb_label, in_var[0]))
-                op_trans_output.append(f"\tret <= {in_signal[0]};")
-        
-        # if(check_last_cycle):
-        #     op_trans_output.append("\tbranch_ready <= 1'b1;")
-        # op_trans_output.append("end")
-    
-        return op_trans_output
+    def op_translation(self, bb_label, op_type, in_var, out_var, in_map=None, out_map=None, device_idx=None, unit=None):
+        # 需要把 in_var 和 out_var 转换成对应的 in_signal 和 out_signal，按操作类型查 op_emitters 生成语句
+        # in_map / out_map 可替换默认的变量到寄存器映射（流水化循环使用各级流水寄存器）
+        # 给出 device_idx 且该类型为流水单元时，结果先写入单元的第一级寄存器，（延迟 - 1）个周期后再写回
+        # 给出绑定的功能单元 unit 时，操作数由单元的多路选择器接入，这里只写入单元的输出；
+        # 多周期单元在发射周期由 start 或逐级推进的寄存器接收操作数，结果在写回周期取得，发射时不生成语句
+        if in_map is None:
+            in_map = lambda var: self.in_var_to_register_mapping(bb_label, var)
+        if out_map is None:
+            out_map = lambda var: self.out_var_to_register_mapping(bb_label, var)
+        if unit is not None:
+            if unit.writeback_delay:
+                return []
+            device_idx = unit.device_idx if device_idx is not None else None
+        if device_idx is not None and out_var and self.resources.isPipelined(op_type):
+            out_map = lambda var: self.fu_stage_register(op_type, device_idx, 0)
+        if unit is not None:
+            return [f"\t{out_map(out_var)} <= {unit.output};"]
+        emitter = self.op_emitters.get(op_type)
+        if emitter is None:
+            return []
+        return emitter(bb_label, op_type, in_var, out_var, in_map, out_map)
+
+    def emit_assign(self, bb_label, op_type, in_var, out_var, in_map, out_map):
+        return [f"\t{out_map(out_var)} <= {in_map(in_var[0])};"]
+
+    def emit_binary(self, bb_label, op_type, in_var, out_var, in_map, out_map):
+        in_1, in_2 = (in_map(var) for var in in_var)
+        return [f"\t{out_map(out_var)} <= {binary_expression(op_type, in_1, in_2)};"]
+
+    def emit_load(self, bb_label, op_type, in_var, out_var, in_map, out_map):
+        # op_trans_output.append(f"\t{out_signal} <= a_q0;")
+        return [f"\t{out_map(out_var)} <= {in_var[0]}_mem[{in_map(in_var[1])}];"]
+
+    def emit_store(self, bb_label, op_type, in_var, out_var, in_map, out_map):
+        return [f"\t{in_var[0]}_mem[{in_map(in_var[1])}] <= {in_map(in_var[2])};"]
+
+    def emit_branch(self, bb_label, op_type, in_var, out_var, in_map, out_map):
+        # 分支操作不直接生成代码，通常由状态机控制
+        return []
+
+    def emit_phi(self, bb_label, op_type, in_var, out_var, in_map, out_map):
+        out_signal = out_map(out_var)
+        # phi 的输入应该是2n个，奇数项为basic_block_label，偶数项为value
+        bb_labels = in_var[1::2]
+        values = in_var[0::2]
+        phi_results = []
+        for i, (var, pred) in enumerate(zip(values, bb_labels)):
+            in_signal = self.in_var_to_register_mapping(bb_label=pred, input_variable=var)
+            keyword = "if" if i == 0 else "else if"
+            phi_results.append(f"\t{keyword} ({self.states.match('last_state', self.branch_state(pred))}) {out_signal} <= {in_signal};")
+        return phi_results
+
+    def emit_ret(self, bb_label, op_type, in_var, out_var, in_map, out_map):
+        # return_val 是线网类型，所以在最后用assign赋值。
+        return [f"\tret <= {in_map(in_var[0])};"]
         
     def gen_assign_logic(self):
         if self.hls.retType == 'int':
-            self.content_assign_logic.append(f"assign return_val = ret;")
+            yield f"assign return_val = ret;"
 
         for idx, cond_var in enumerate(self.cond_all):
             # print(self.cond_block)
             bb_label = self.cond_block[idx]
-            cond_reg = self.in_var_to_register_mapping(bb_label, cond_var)
-            self.content_assign_logic.append(f"assign {cond_var} = ((cur_state == state_{bb_label}) & {cond_reg}[0]);")
+            yield f"assign {cond_var} = (({self.states.match('cur_state', self.branch_state(bb_label))}) & {self.branch_condition(bb_label, cond_var)});"
             # assign cond = ((CurrentState == state_start) & reg_3);
 
+    def branch_condition(self, bb_label, cond_var):
+        """
+        分支条件在状态转移周期的取值：在该周期发射的单周期比较直接取比较结果，否则读取条件寄存器
+        """
+        cycle_idx = self.branch_cycle[bb_label]
+        schedule_results = self.hls.schedule[bb_label]
+        for op_idx, device_idx in (schedule_results[cycle_idx] if cycle_idx < len(schedule_results) else []):
+            op = self.hls.basicBlocks[bb_label].ops[op_idx]
+            if op[0] != cond_var or op[1] not in COMPARE_OPS:
+                continue
+            unit = self.fu_binding.get((bb_label, op_idx))
+            if unit is not None:
+                return f"{unit.output}[0]"
+            in_map = self.cycle_operands.get((bb_label, cycle_idx), ({}, {}, set()))[0].get(op_idx)
+            if in_map is None:
+                in_map = lambda var: self.in_var_to_register_mapping(bb_label, var)
+            in_1, in_2 = (in_map(var) for var in op.operands)
+            return f"({in_1} {BINARY_OPERATORS[op[1]]} {in_2})"
+        return f"{self.in_var_to_register_mapping(bb_label, cond_var)}[0]"
+
     def gen_endmodule(self):
-        self.content_end.append("endmodule")
+        yield "endmodule"
 
     def gen_all_code(self):
-        self.gen_module_IO()
-        self.gen_global_register()
-        self.gen_local_register()
-        self.gen_state_register()
-        self.gen_bb_parameter()
-        self.gen_other_register()
-        self.gen_wire()
-        self.gen_control_logic()
-        self.gen_timing_logic()
-        # self.gen_br_counter()
-        self.gen_assign_logic()
-        self.gen_endmodule()
+        """
+        生成全部代码并保存在各 content_* 列表中，由 verilogPrinter 输出；
+        只需要写入文件时用 verilogEmitter 逐行输出，不保存中间结果
+        """
+        self.prepare()
+        for name, _, lines in self.gen_sections():
+            getattr(self, name).extend(lines)
+
+def functionalUnitPrinter(verilog_generator, file=None):
+    """
+    输出功能单元绑定结果：每个单元绑定的操作数以及各操作数端口多路选择器的输入
+    """
+    print("===== Functional Unit Binding =====", file=file)
+    units = verilog_generator.sorted_units()
+    for unit in units:
+        print(f"{unit.name}: {len(unit.ops)} operations, mux inputs {unit.mux_inputs()}", file=file)
+        for port, inputs in enumerate(unit.ports):
+            print(f"  in{port} ({len(inputs)}): {', '.join(inputs)}", file=file)
+    if verilog_generator.unbound_ops:
+        print("Operations kept as dedicated logic to avoid a combinational loop between units: "
+              + ', '.join(f"(block {label}, operation {op_idx})" for label, op_idx in verilog_generator.unbound_ops), file=file)
+    print(f"\nFunctional units: {len(units)}", file=file)
+    print(f"Total mux inputs: {sum(unit.mux_inputs() for unit in units)}", file=file)
+    print("=====================================\n", file=file)
+
+def constraintPrinter(verilog_generator, file=None):
+    """
+    输出多周期路径约束文件（SDC）
+    """
+    print(f"# Multicycle path constraints of module {verilog_generator.hls.functionName}", file=file)
+    for line in verilog_generator.content_constraints:
+        print(line, file=file)
 
 def format_line(line, indent_level):
     return "\t" * indent_level + line.strip()
@@ -612,6 +1548,10 @@ def verilogPrinter(verilog_generator, file=None):
     for line in verilog_generator.content_timing_logic:
         print(line, file=file)
     print(f"\t", file=file)
+    if verilog_generator.content_mux_logic:
+        for line in verilog_generator.content_mux_logic:
+            print(line, file=file)
+        print(f"\t", file=file)
     # for line in verilog_generator.content_br_counter:
     #     print(line, file=file)
     # print(f"\t", file=file)
@@ -633,4 +1573,19 @@ def verilogPrinter(verilog_generator, file=None):
     print(f"\t", file=file)
     for line in verilog_generator.content_end:
         print(line, file=file)
-    print(f"\t", file=file)
\ No newline at end of file
+    print(f"\t", file=file)
+def verilogEmitter(verilog_generator, file=None):
+    """
+    流式输出 Verilog 代码：各段由生成器逐行产生并直接写入 file，不经过 content_* 列表，
+    生成时间和内存不随状态数累积；输出与 gen_all_code + verilogPrinter 相同
+    """
+    file = file if file is not None else sys.stdout
+    verilog_generator.prepare()
+    for _, optional, lines in verilog_generator.gen_sections():
+        first = next(lines, None)
+        if first is None and optional:
+            continue
+        if first is not None:
+            file.write(f"{first}\n")
+            file.writelines(f"{line}\n" for line in lines)
+        file.write("\t\n")
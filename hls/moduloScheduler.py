@@ -0,0 +1,381 @@
+from resourceData import *
+from registerAllocator import get_op_operands
+from compactGraph import immediateDominators
+
+class PipelinedLoop:
+    """
+    A loop made of a header block and a single body block (header -> body -> header),
+    together with its modulo schedule.
+
+    One iteration executes the header operations (without phi and branch) followed by the body
+    operations (without branch). Phi destinations are not computed: their consumers read the
+    initial value in the first iteration and the loop-carried value of the previous iteration after.
+    """
+
+    def __init__(self, header, body, exit_label, preheaders):
+        self.header = header            # label of the loop header
+        self.body = body                # label of the loop body
+        self.exit = exit_label          # label of the block executed after the loop
+        self.preheaders = preheaders    # labels of the predecessors of the header outside the loop
+        self.nodes = []                 # operations of one iteration, as (block label, op index)
+        self.defs = {}                  # value defined inside the iteration -> node index
+        self.phis = {}                  # phi destination -> ([(initial value, preheader), ...], loop-carried value)
+        self.preds = {}                 # node index -> [(predecessor node, latency)]
+        self.phi_uses = {}              # phi destination -> node indices reading it
+        self.exit_condition = None      # (condition variable, value of the condition that leaves the loop)
+        self.live_outs = []             # values defined by the header and used after the loop
+        self.res_mii = 0
+        self.rec_mii = 0
+        self.ii = 0
+        self.start = {}                 # node index -> issue cycle within the iteration
+        self.device = {}                # node index -> device index
+        self.exit_cycle = 0             # cycle of the iteration at which the exit condition is checked
+        self.stages = 0
+        self.shadow_live_outs = set()   # phi live-outs captured by their loop-carried producer
+        self.sequential_latency = 0     # cycles per iteration without pipelining
+
+    def op(self, hls, node):
+        label, op_idx = self.nodes[node]
+        return hls.basicBlocks[label].ops[op_idx]
+
+    def stage(self, cycle):
+        return cycle // self.ii
+
+def findNaturalLoops(self):
+    """
+    Find the natural loop of every back edge of the CFG.
+
+    Returns:
+        list of (header, set of block labels in the loop, latch), one entry per back edge latch -> header
+    """
+    entry = next(iter(self.basicBlocks))
+    dominators = immediateDominators(self.cfg, entry)
+
+    def dominates(a, b):
+        while True:
+            if a == b:
+                return True
+            if dominators.get(b, b) == b:
+                return False
+            b = dominators[b]
+
+    loops = []
+    for latch, header in self.cfg.edges():
+        if latch not in dominators or not dominates(header, latch):
+            continue
+        # The natural loop of the back edge is the header plus every block reaching the latch without the header
+        loop_blocks = {header, latch}
+        worklist = [latch] if latch != header else []
+        while worklist:
+            block = worklist.pop()
+            for pred in self.cfg.predecessors(block):
+                if pred not in loop_blocks:
+                    loop_blocks.add(pred)
+                    worklist.append(pred)
+        loops.append((header, loop_blocks, latch))
+    return loops
+
+def findSingleBlockLoops(self):
+    """
+    Find natural loops made of a header and a single body block.
+
+    Returns:
+        list of (header, body) labels, where body -> header is a back edge and
+        the loop contains no other block
+    """
+    return [(header, latch) for header, loop_blocks, latch in findNaturalLoops(self)
+            if latch != header and loop_blocks == {header, latch}]
+
+def buildIteration(self, header, body):
+    """
+    Build the operations and dependencies of one iteration of a header/body loop.
+
+    Returns:
+        (PipelinedLoop, None) when the loop can be pipelined, otherwise (None, reason)
+    """
+    header_bb = self.basicBlocks[header]
+    body_bb = self.basicBlocks[body]
+    if not header_bb.ops or header_bb.ops[-1][1] != OP_BR or len(header_bb.ops[-1]) != 5:
+        return None, "the header does not end with a conditional branch"
+    if not body_bb.ops or body_bb.ops[-1][1] != OP_BR or body_bb.ops[-1].operands != (header,):
+        return None, "the body does not branch back to the header"
+    if list(self.cfg.predecessors(body)) != [header]:
+        return None, "the body has predecessors other than the header"
+    cond_var, true_target, false_target = header_bb.ops[-1].operands
+    if body not in (true_target, false_target) or true_target == false_target:
+        return None, "the header branch does not choose between the body and an exit"
+    exit_label = false_target if true_target == body else true_target
+    preheaders = [pred for pred in self.cfg.predecessors(header) if pred != body]
+    if not preheaders:
+        return None, "the loop has no entry"
+
+    loop = PipelinedLoop(header, body, exit_label, preheaders)
+    loop.exit_condition = (cond_var, 1 if true_target == exit_label else 0)
+
+    outside_defs = {op[0] for label, bb in self.basicBlocks.items() if label not in (header, body) for op in bb.phis + bb.ops if op[0]}
+    loop_defs = {op[0] for label in (header, body) for op in self.basicBlocks[label].phis + self.basicBlocks[label].ops if op[0]}
+    stored_arrays = set()
+    loaded_arrays = set()
+    array_stores = {}
+    for label in (header, body):
+        bb = self.basicBlocks[label]
+        # Phis lowered by eliminatePhis are kept apart from the scheduled operations
+        for op_idx, op in [(None, phi) for phi in bb.phis] + list(enumerate(bb.ops)):
+            op_type = op[1]
+            if op_type == OP_BR:
+                continue
+            if op_type == OP_RET:
+                return None, "the loop contains a return"
+            if op_type == OP_PHI:
+                if label != header:
+                    return None, "the body contains a phi"
+                values, sources = op.operands[0::2], op.operands[1::2]
+                inits = [(value, source) for value, source in zip(values, sources) if source != body]
+                carried = [value for value, source in zip(values, sources) if source == body]
+                if len(carried) != 1 or not inits or any(source not in preheaders for _, source in inits):
+                    return None, f"phi {op[0]} does not merge the entry values with one value from the body"
+                loop.phis[op[0]] = (inits, carried[0])
+                continue
+            if op_type == OP_STORE and label == header:
+                # Stores wait for the exit condition, which is computed in the header itself
+                return None, "the header stores to memory"
+            if op[0] and (op[0] in loop.defs or op[0] in loop.phis or op[0] in outside_defs):
+                return None, f"value {op[0]} is assigned more than once"
+            node = len(loop.nodes)
+            loop.nodes.append((label, op_idx))
+            loop.preds[node] = []
+            if op_type == OP_LOAD:
+                loaded_arrays.add(op[2])
+            elif op_type == OP_STORE:
+                stored_arrays.add(op[2])
+                # Stores to the same array keep their order within the iteration when the body's DFG
+                # has a memory edge between them
+                for other in array_stores.get(op[2], []):
+                    if bb.dfg.has_edge(loop.nodes[other][1], op_idx):
+                        loop.preds[node].append((other, self.resources.latency[OP_STORE]))
+                array_stores.setdefault(op[2], []).append(node)
+            for operand in get_op_operands(op):
+                if operand in loop.defs:
+                    src = loop.defs[operand]
+                    loop.preds[node].append((src, self.resources.latency[loop.op(self, src)[1]]))
+                elif operand in loop.phis:
+                    loop.phi_uses.setdefault(operand, []).append(node)
+                elif operand in loop_defs:
+                    return None, f"value {operand} is used before it is defined in the iteration"
+            if op[0]:
+                loop.defs[op[0]] = node
+    if stored_arrays & loaded_arrays:
+        return None, "the loop loads and stores the same array"
+    for phi, (_, carried) in loop.phis.items():
+        if carried in loop.phis:
+            return None, f"phi {phi} is carried by another phi"
+
+    # Values of the loop used by other blocks: only values of the header can leave the loop
+    for label, bb in self.basicBlocks.items():
+        if label in (header, body):
+            continue
+        for op in bb.phis + bb.ops:
+            for operand in get_op_operands(op):
+                if operand in loop.phis or (operand in loop.defs and loop.nodes[loop.defs[operand]][0] == header):
+                    if operand not in loop.live_outs:
+                        loop.live_outs.append(operand)
+                elif operand in loop.defs:
+                    return None, f"value {operand} of the body is used after the loop"
+    if cond_var in loop.phis:
+        return None, "the exit condition is a phi"
+
+    loop.sequential_latency = len(self.schedule[header]) + len(self.schedule[body]) + 2 if hasattr(self, 'schedule') else 0
+    return loop, None
+
+def computeResMII(hls, loop):
+    """
+    Resource-constrained MII: operations of each resource class divided by its units, where loads
+    and stores only count against the ports of their array
+    """
+    count = {}
+    for node in range(len(loop.nodes)):
+        resource = hls.resources.resourceKey(loop.op(hls, node))
+        count[resource] = count.get(resource, 0) + 1
+    res_mii = 1
+    for resource, num in count.items():
+        # A unit is busy for its initiation interval per operation and the same unit serves every
+        # iteration, so the II can never be shorter than that interval either
+        interval = hls.resources.initiation_interval[resource[0] if isinstance(resource, tuple) else resource]
+        res_mii = max(res_mii, -(-num * interval // hls.resources.unitCount(resource)), interval)
+    return res_mii
+
+def computeRecMII(hls, loop):
+    """
+    Recurrence-constrained MII: for every phi, the longest latency from a reader of the phi
+    to the loop-carried value, plus the latency of that value, must fit in one II.
+    """
+    rec_mii = 1
+    num_nodes = len(loop.nodes)
+    succs = [[] for _ in range(num_nodes)]
+    for node, preds in loop.preds.items():
+        for pred, latency in preds:
+            succs[pred].append((node, latency))
+    for phi, (_, carried) in loop.phis.items():
+        if carried not in loop.defs:
+            continue
+        target = loop.defs[carried]
+        # Longest latency from every node to the producer of the loop-carried value (node order is topological)
+        distance = [None] * num_nodes
+        distance[target] = 0
+        for node in range(target - 1, -1, -1):
+            for succ, latency in succs[node]:
+                if succ <= target and distance[succ] is not None:
+                    distance[node] = max(distance[node] or 0, latency + distance[succ])
+        target_latency = hls.resources.latency[loop.op(hls, target)[1]]
+        for reader in loop.phi_uses.get(phi, []):
+            if distance[reader] is not None:
+                rec_mii = max(rec_mii, distance[reader] + target_latency)
+    return rec_mii
+
+def moduloSchedule(hls, loop, ii):
+    """
+    Greedy modulo scheduling of one iteration with initiation interval ii.
+    Operations are placed in iteration order at the earliest cycle allowed by their
+    dependencies, on a device that is free in the modulo reservation table.
+
+    Returns:
+        True when every operation, recurrence and exit constraint fits
+    """
+    reservation = set()  # (resource class, device, cycle modulo ii)
+    start = {}
+    device = {}
+    header_finish = 0
+    exit_cycle = None
+    for node, (label, _) in enumerate(loop.nodes):
+        op = loop.op(hls, node)
+        op_type = op[1]
+        if label != loop.header and exit_cycle is None:
+            exit_cycle = header_finish
+        earliest = max((start[pred] + latency for pred, latency in loop.preds[node]), default=0)
+        if op_type == OP_STORE:
+            # Stores wait until the exit condition is known, so a leaving iteration never writes memory
+            earliest = max(earliest, exit_cycle + 1)
+        placed = False
+        resource = hls.resources.resourceKey(op)
+        for cycle in range(earliest, earliest + ii):
+            for pos in range(hls.resources.unitCount(resource)):
+                slots = [(resource, pos, (cycle + k) % ii) for k in range(hls.resources.initiation_interval[op_type])]
+                if not any(slot in reservation for slot in slots):
+                    reservation.update(slots)
+                    start[node] = cycle
+                    device[node] = pos
+                    placed = True
+                    break
+            if placed:
+                break
+        if not placed:
+            return False
+        if label == loop.header:
+            header_finish = max(header_finish, cycle + hls.resources.latency[op_type])
+    if exit_cycle is None:
+        exit_cycle = header_finish
+
+    # Loop-carried dependencies: the value of iteration k must be ready when iteration k+1 reads the phi
+    for phi, (_, carried) in loop.phis.items():
+        if carried not in loop.defs:
+            continue
+        producer = loop.defs[carried]
+        ready = start[producer] + hls.resources.latency[loop.op(hls, producer)[1]]
+        for reader in loop.phi_uses.get(phi, []):
+            if ready > start[reader] + ii:
+                return False
+
+    # Phi values leaving the loop are read at the exit check, or captured by their producer
+    # when the producer only runs after the exit check
+    shadow = set()
+    for value in loop.live_outs:
+        if value not in loop.phis:
+            continue
+        carried = loop.phis[value][1]
+        if carried not in loop.defs:
+            continue
+        producer = loop.defs[carried]
+        if start[producer] > exit_cycle:
+            shadow.add(value)
+        elif start[producer] + hls.resources.latency[loop.op(hls, producer)[1]] > exit_cycle + ii:
+            return False
+
+    loop.ii = ii
+    loop.start = start
+    loop.device = device
+    loop.exit_cycle = exit_cycle
+    loop.shadow_live_outs = shadow
+    # Results of multi-cycle units are written back latency - 1 cycles after issue, within the iteration
+    last_write = max((cycle + (hls.resources.latency[loop.op(hls, node)[1]] - 1 if hls.resources.isMultiCycleUnit(loop.op(hls, node)[1]) else 0)
+                      for node, cycle in start.items()), default=0)
+    loop.stages = max(last_write, exit_cycle) // ii + 1
+    return True
+
+def pipelineLoops(self):
+    """
+    Modulo-schedule every loop made of a header and a single body block.
+
+    Sets:
+        self.pipelines: {header label: PipelinedLoop} for the loops that are pipelined
+        self.pipeline_report: {header label: None if pipelined, otherwise the reason}
+    """
+    self.pipelines = {}
+    self.pipeline_report = {}
+    for header, body in findSingleBlockLoops(self):
+        loop, reason = buildIteration(self, header, body)
+        if loop is None:
+            self.pipeline_report[header] = reason
+            continue
+        loop.res_mii = computeResMII(self, loop)
+        loop.rec_mii = computeRecMII(self, loop)
+        mii = max(loop.res_mii, loop.rec_mii)
+        max_ii = mii + sum(self.resources.latency[loop.op(self, node)[1]] for node in range(len(loop.nodes))) + 1
+        for ii in range(mii, max_ii + 1):
+            if moduloSchedule(self, loop, ii):
+                break
+        else:
+            self.pipeline_report[header] = "no modulo schedule found"
+            continue
+        if loop.sequential_latency and loop.ii >= loop.sequential_latency:
+            self.pipeline_report[header] = f"II {loop.ii} is not shorter than the sequential iteration ({loop.sequential_latency} cycles)"
+            continue
+        self.pipelines[header] = loop
+        self.pipeline_report[header] = None
+
+def moduloSchedulePrinter(hls, file=None):
+    """
+    Print modulo scheduling results: MII bounds, the kernel, and the prologue/epilogue stages.
+    """
+    print("===== Loop Pipelining =====", file=file)
+    report = getattr(hls, 'pipeline_report', {})
+    if not report:
+        print("No single-block loop found.", file=file)
+    for header, reason in report.items():
+        if reason is not None:
+            print(f"Loop at {header} is not pipelined: {reason}", file=file)
+            continue
+        loop = hls.pipelines[header]
+        print(f"Loop {loop.header} -> {loop.body} (exit to {loop.exit}):", file=file)
+        print(f"  ResMII = {loop.res_mii}, RecMII = {loop.rec_mii}, II = {loop.ii}, stages = {loop.stages}", file=file)
+        print(f"  sequential iteration: {loop.sequential_latency} cycles, pipelined: {loop.ii} cycles", file=file)
+        print(f"  exit condition checked at cycle {loop.exit_cycle} (stage {loop.stage(loop.exit_cycle)})", file=file)
+        print("  Iteration schedule:", file=file)
+        for node in sorted(range(len(loop.nodes)), key=lambda node: (loop.start[node], node)):
+            label, op_idx = loop.nodes[node]
+            cycle = loop.start[node]
+            print(f"    cycle {cycle}: (block {label}, operation {op_idx}, resource {loop.device[node]}) stage {loop.stage(cycle)}", file=file)
+        print("  Kernel:", file=file)
+        for offset in range(loop.ii):
+            print(f"    cycle {offset}: ", end="", file=file)
+            for node, (label, op_idx) in enumerate(loop.nodes):
+                if loop.start[node] % loop.ii == offset:
+                    print(f"({label}:{op_idx}, stage {loop.stage(loop.start[node])}) ", end="", file=file)
+            print(file=file)
+        print(f"  Prologue: stages 0..s active in beat s, for s < {loop.stages - 1}", file=file)
+        print(f"  Epilogue: stages s..{loop.stages - 1} drain after the exit condition", file=file)
+    print(35 * "=" + "\n", file=file)
+
+def addModuloScheduler(classObj):
+    """Attach loop pipelining to the HLS class"""
+    setattr(classObj, 'pipelines', {})
+    setattr(classObj, 'pipelineLoops', pipelineLoops)
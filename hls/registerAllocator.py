@@ -1,159 +1,424 @@
 import sys
+import heapq
+from resourceData import OP_PHI, OP_BR
+from symbolTable import KIND_CONSTANT, KIND_LOCAL, KIND_PARAM, KIND_GLOBAL, Operation, readOperands
+from compactGraph import reversePostorder
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 def get_op_operands(op):
-    op_type = op[1]
-    if op_type == 13: # phi操作
-        operands = set(op[2::2])
-    elif op_type == 5 or op_type == 6: # 存取操作
-        operands = set(op[3:])
-    elif op_type == 7: # 跳转操作
-        if len(op) > 3: # 有条件跳转
-            operands = {op[2]}
-        else:
-            operands = set()
-    else:
-        operands = set(op[2:])
-    return operands
+    # 操作读取的变量在创建 Operation 时已拆分好（phi 的值、存取的下标与数据、有条件跳转的条件）
+    return set(op.uses)
+
+def get_op_variables(op, symbols):
+    # 操作读取的变量，不含常数
+    kinds = symbols.kinds
+    return {v for v, sid in zip(op.uses, op.use_ids) if kinds[sid] != KIND_CONSTANT}
 
 def get_op_left_values(op):
-    return op[0]
+    return op.value
 
 def get_bb_operands(self):
     operands = set()
     for op in self.ops:
-        if op[1] == 13:
-            operands = operands | set(op[2::2])
-        elif op[1] == 5 or op[1] == 6:
-            operands = operands | set(op[3:])
-        elif op[1] == 7:
-            if len(op) > 3:
-               operands.add(op[2])
-        else:
-            operands = operands | set(op[2:])
+        operands.update(op.uses)
     return operands
 
 def get_bb_left_values(self):
-    left_values = set()
-    for op in self.ops:
-        if op[0]:
-            left_values.add(op[0])
+    return {op.value for op in self.ops if op.value}
 
-    return left_values
+def get_bb_use_def(bb):
+    """
+    基本块的 use / def 位集（按 SymbolTable 的变量编号置位）：
+    use 为在块内定义之前就被读取的变量，def 为块内定义的变量；
+    phi 在块入口取值，其读取的变量记在对应前驱基本块的出口上，返回 {前驱基本块: 位集}；
+    消除后在边上复制的 phi（bb.phis）同样在入口定义结果、在前驱出口读取
+    """
+    use_bits = 0
+    def_bits = 0
+    phi_uses = {}
+    for op in bb.phis + bb.ops:
+        if op.op_type == OP_PHI:
+            for sid, pred in zip(op.use_ids, op.operands[1::2]):
+                phi_uses[pred] = phi_uses.get(pred, 0) | (1 << sid)
+        else:
+            for sid in op.use_ids:
+                if not (def_bits >> sid) & 1:
+                    use_bits |= 1 << sid
+        if op.value:
+            def_bits |= 1 << op.def_id
+    return use_bits, def_bits, phi_uses
+
+def bits_to_names(bits, names):
+    # bin() 的低位在字符串末尾，反转后第 i 位对应编号 i；用 find 跳过 0，只处理置位的编号
+    digits = bin(bits)[:1:-1]
+    variables = set()
+    sid = digits.find('1')
+    while sid >= 0:
+        variables.add(names[sid])
+        sid = digits.find('1', sid + 1)
+    return variables
 
 def get_input_output_variables(self):
-    param_list = [param[0] for param in self.params]
-    # for param in self.params:
-    #     param_list.append(param[0])
+    """
+    基于工作表的活跃变量分析（位集实现），迭代至不动点，支持任意嵌套的循环：
+        live_out[b] = ∪ (live_in[s] | phi_uses[s][b])，s 为 b 的后继
+        live_in[b]  = use[b] | (live_out[b] & ~def[b])
+    input_variables 为块入口活跃的变量加上由前驱基本块传入的变量：本块 phi 读取的变量，
+    或 phi 消除后在边上复制得到的 phi 结果；output_variables 为块出口活跃的变量；均不含常数与函数参数
+    """
+    symbols = self.symbols
+    # 常数与函数参数不占用寄存器，从结果中去掉
+    excluded = 0
+    for sid, kind in enumerate(symbols.kinds):
+        if kind != KIND_LOCAL and kind != KIND_GLOBAL:
+            excluded |= 1 << sid
+
+    use, define, phi_uses, phi_reads = {}, {}, {}, {}
+    for label, bb in self.basicBlocks.items():
+        use[label], define[label], phi_uses[label] = get_bb_use_def(bb)
+        phi_reads[label] = 0
+        for op in bb.ops:
+            if op.op_type == OP_PHI:
+                for sid in op.use_ids:
+                    phi_reads[label] |= 1 << sid
+        for op in bb.phis:
+            phi_reads[label] |= 1 << op.def_id
+
+    # 反向数据流按逆后序的逆序（后序）处理：工作表按后序序号出堆，后继基本块先于前驱收敛，
+    # 不可达的基本块排在最后
+    order = reversePostorder(self.cfg, '0') if '0' in self.cfg else []
+    reachable = set(order)
+    order = [label for label in self.basicBlocks if label not in reachable] + order
+    order.reverse()
+    rank = {label: idx for idx, label in enumerate(order)}
+    successors = [list(self.cfg.successors(label)) if label in self.cfg else [] for label in order]
+    predecessors = [[rank[pred] for pred in self.cfg.predecessors(label)] if label in self.cfg else [] for label in order]
+    use_bits = [use[label] for label in order]
+    keep_bits = [~define[label] for label in order]
+    edge_bits = [[(rank[succ], phi_uses[succ].get(label, 0)) for succ in successors[idx]] for idx, label in enumerate(order)]
+
+    live_in = [0] * len(order)
+    live_out = [0] * len(order)
+    worklist = list(range(len(order)))
+    queued = [True] * len(order)
+    while worklist:
+        idx = heapq.heappop(worklist)
+        queued[idx] = False
+        out_bits = 0
+        for succ, phi_bits in edge_bits[idx]:
+            out_bits |= live_in[succ] | phi_bits
+        live_out[idx] = out_bits
+        in_bits = use_bits[idx] | (out_bits & keep_bits[idx])
+        if in_bits != live_in[idx]:
+            live_in[idx] = in_bits
+            for pred in predecessors[idx]:
+                if not queued[pred]:
+                    queued[pred] = True
+                    heapq.heappush(worklist, pred)
+
+    names = symbols.names
     self.input_variables = {}
     self.output_variables = {}
-    require_variables = {}
-    visited = {}
-
-    for bb in self.basicBlocks:
-        visited[bb] = 0
-        self.input_variables[bb] = set()
-        require_variables[bb] = self.basicBlocks[bb].get_bb_operands()-self.basicBlocks[bb].get_bb_left_values()
-    bb_queue = ['0']
-    visited['0'] = 1
-    while bb_queue:
-        bb = bb_queue.pop(0)
-        self.output_variables[bb] = (self.input_variables[bb] | self.basicBlocks[bb].get_bb_left_values())-self.basicBlocks[bb].get_bb_operands()
-        for edge in self.cfg.successors(bb):
-            next_bb = edge
-            if self.cfg.successors(next_bb):
-                self.input_variables[next_bb] = self.input_variables[next_bb] | self.output_variables[bb]
-            else:
-                self.input_variables[next_bb] = require_variables[next_bb]
-            if visited[next_bb] == 0:
-                visited[next_bb] = 1
-                bb_queue.append(next_bb)
-
-    for label, variable_set in self.input_variables.items():
-        removal_list = []
-        for v in variable_set:
-            if (v in param_list) or v.isdigit():
-                removal_list.append(v)
-        for v in removal_list:
-            self.input_variables[label].remove(v)
-
-    for label, variable_set in self.output_variables.items():
-        removal_list = []
-        for v in variable_set:
-            if (v in param_list) or v.isdigit():
-                removal_list.append(v)
-        for v in removal_list:
-            self.output_variables[label].remove(v)
+    for label in self.basicBlocks:
+        idx = rank[label]
+        self.input_variables[label] = bits_to_names((live_in[idx] | phi_reads[label]) & ~excluded, names)
+        self.output_variables[label] = bits_to_names(live_out[idx] & ~excluded, names)
 
 def get_global_variables(self):
-    self.global_variable = set()
-    bb_operands_list = []
-    for bb in self.basicBlocks.values():
-        bb_operands_list.append(bb.get_bb_operands())
-    L = len(bb_operands_list)
-    for i in range(L):
-        for j in range(i+1,L):
-            self.global_variable = self.global_variable | (bb_operands_list[i]&bb_operands_list[j])
-    removal_list = []
-    for v in self.global_variable:
-        if v.isdigit():
-            removal_list.append(v)
-    for v in removal_list:
-        self.global_variable.remove(v)
-    for param in self.params:
-        if param[1] == 'non-array':
-            self.global_variable = self.global_variable - {param[0]}
-
-def get_local_variable_liveness(self):
+    """
+    被不止一个基本块读取的变量为全局变量：一次遍历所有操作，记录每个变量第一次被读取的基本块，
+    在另一个基本块中再次被读取即为全局变量。消除后的 phi 在前驱基本块的出口读取。常数与非数组参数不是全局变量
+    """
+    kinds = self.symbols.kinds
+    first_block = [-1] * len(self.symbols)
+    global_ids = set()
+    block_index = {label: idx for idx, label in enumerate(self.basicBlocks)}
+    reads = []
+    for label, bb in self.basicBlocks.items():
+        reads.extend((block_index[label], op.use_ids) for op in bb.ops)
+        for op in bb.phis:
+            reads.extend((block_index[pred], (sid,)) for sid, pred in zip(op.use_ids, op.operands[1::2]) if pred in block_index)
+    for block_idx, use_ids in reads:
+        for sid in use_ids:
+            first = first_block[sid]
+            if first < 0:
+                first_block[sid] = block_idx
+            elif first != block_idx:
+                global_ids.add(sid)
+    names = self.symbols.names
+    self.global_variable = {names[sid] for sid in global_ids if kinds[sid] != KIND_CONSTANT and kinds[sid] != KIND_PARAM}
+    self.symbols.declareGlobals(self.global_variable)
+
+def rename_value(op, old, new, symbols):
+    """把操作定义或读取的变量 old 换成 new，只替换读取值的操作数位置（标签与数组名不变）"""
+    read_positions = set(readOperands(op.op_type, range(len(op.operands))))
+    operands = [new if idx in read_positions and operand == old else operand for idx, operand in enumerate(op.operands)]
+    return Operation(new if op.value == old else op.value, op.op_type, operands, symbols)
+
+def get_phi_copy_index(self):
+    """
+    一次遍历所有操作，建立合并 phi 复制所需的索引：
+    defs[变量] = [(基本块, 操作序号)]，消除后的 phi 定义的操作序号为 None；
+    phi_reads[变量] = 被消除后的 phi 读取的次数；read_blocks[变量] = 读取它的操作所在的基本块
+    """
+    defs, phi_reads, read_blocks = {}, {}, {}
+    for label, bb in self.basicBlocks.items():
+        for op_idx, op in enumerate(bb.ops):
+            if op.value:
+                defs.setdefault(op.value, []).append((label, op_idx))
+            for v in op.uses:
+                read_blocks.setdefault(v, set()).add(label)
+        for op in bb.phis:
+            defs.setdefault(op.value, []).append((label, None))
+            for v in op.uses:
+                phi_reads[v] = phi_reads.get(v, 0) + 1
+    return defs, phi_reads, read_blocks
+
+def phi_copy_coalescable(self, phi, value, pred, resources, index, cycle_of):
+    """
+    消除后的 phi 在边 pred -> phi 所在基本块上的复制 phi.value <= value 能否合并：value 改名为 phi 的结果后，
+    pred 中定义 value 的操作直接写 phi 结果的寄存器，复制变成同一个寄存器而被省去。要求：
+    value 是只在 pred 中定义一次的局部变量，除这个 phi 外只被 pred 中的操作读取；
+    phi 结果在 pred 出口不活跃，pred 中读取它的操作都在 value 写回之前（同一周期按序号先于定义它的操作）。
+    index 为 get_phi_copy_index 的结果，cycle_of[pred] 为 pred 中操作序号到发射周期的映射
+    """
+    dest = phi.value
+    kinds = self.symbols.kinds
+    sid = self.symbols.ids.get(value)
+    if value == dest or sid is None or kinds[sid] not in (KIND_LOCAL, KIND_GLOBAL):
+        return False
+    defs, phi_reads, read_blocks = index
+    pred_bb = self.basicBlocks[pred]
+    value_defs = defs.get(value, [])
+    if len(value_defs) != 1 or value_defs[0][0] != pred or value_defs[0][1] is None:
+        return False
+    if phi_reads.get(value, 0) != 1 or read_blocks.get(value, set()) - {pred} or dest in self.output_variables[pred]:
+        return False
+
+    def_idx = value_defs[0][1]
+    issue = cycle_of[def_idx]
+    delay = resources.resultDelay(pred_bb.ops[def_idx].op_type)
+    for op_idx, op in enumerate(pred_bb.ops):
+        if dest not in op.uses:
+            continue
+        cycle = cycle_of.get(op_idx)
+        if cycle is None or op.op_type == OP_BR:
+            return False
+        # 读取的必须是写回之前的旧值：同一周期内序号更大的操作读取的是链接的新值
+        if not (cycle < issue or (cycle == issue and op_idx <= def_idx) or (delay and cycle < issue + delay)):
+            return False
+    return True
+
+def coalesce_phi_copies(self, resources=None):
+    """
+    合并消除后的 phi 的复制：满足 phi_copy_coalescable 的来源变量改名为 phi 的结果，
+    使前驱基本块直接写入 phi 结果的寄存器，状态转移时不再需要复制，也少占用一个寄存器。
+    流水化循环的 phi 由流水线自己处理，不参与合并。
+    活跃变量分析与定义/读取索引只计算一次，每次合并后就地更新：value 只在 pred 中定义和读取，
+    改名不改变任何基本块入口的活跃变量，只是 pred 出口由读取 value 变为读取 phi 结果。
+    合并结果记录在 self.coalesced_copies：[(基本块, phi 结果, 前驱基本块, 来源变量)]
+    """
+    if resources is None:
+        resources = self.resources
+    pipelined = {label for loop in getattr(self, 'pipelines', {}).values() for label in (loop.header, loop.body)}
+    self.coalesced_copies = []
+    index = get_phi_copy_index(self)
+    defs, phi_reads, read_blocks = index
+    cycles = {}
+    for bb_label, bb in self.basicBlocks.items():
+        if bb_label in pipelined:
+            continue
+        for phi_idx in range(len(bb.phis)):
+            for value, pred in zip(bb.phis[phi_idx].operands[0::2], bb.phis[phi_idx].operands[1::2]):
+                phi = bb.phis[phi_idx]
+                if pred in pipelined or pred not in self.basicBlocks:
+                    continue
+                if pred not in cycles:
+                    cycles[pred] = {op_idx: cycle for cycle, ops in enumerate(self.schedule[pred]) for op_idx, _ in ops}
+                if not phi_copy_coalescable(self, phi, value, pred, resources, index, cycles[pred]):
+                    continue
+                dest = phi.value
+                pred_bb = self.basicBlocks[pred]
+                pred_bb.ops = [rename_value(op, value, dest, self.symbols) if op.value == value or value in op.uses else op
+                               for op in pred_bb.ops]
+                bb.phis[phi_idx] = rename_value(phi, value, dest, self.symbols)
+                self.coalesced_copies.append((bb_label, dest, pred, value))
+                defs.setdefault(dest, []).extend(defs.pop(value))
+                phi_reads[dest] = phi_reads.get(dest, 0) + phi_reads.pop(value)
+                read_blocks.setdefault(dest, set()).update(read_blocks.pop(value, ()))
+                self.output_variables[pred].discard(value)
+                self.output_variables[pred].add(dest)
+
+def get_bb_live_segments(self, bb_label, bb, resources, live_at_end, excluded):
+    """
+    向量化的块内存活分析：把每个周期的读取（use）与定义（def）展开为事件数组，按（变量, 周期）排序后，
+    每次读取的变量从同一变量之前最近一次定义的下一个周期起存活到读取的周期：
+        live[c] = use[c] | (live[c+1] & ~def[c])
+    块结束时存活的变量视为在第（周期数）个周期被读取。
+
+    :return: (变量列表, 存活段的变量编号, 起始周期, 结束周期)
+    """
+    schedule = self.schedule[bb_label]
+    num_cycles = len(schedule)
+    columns = {}
+    event_cols, event_rows, event_defs = [], [], []
+
+    def column(v):
+        col = columns.get(v)
+        if col is None:
+            col = columns[v] = len(columns)
+        return col
+
+    # 流水单元和多周期单元的结果在发射后第（延迟 - 1）个周期才写回寄存器
+    delayed_left_values = {}
+    for cycle, ops in enumerate(schedule):
+        for op, _ in ops:
+            left_value = get_op_left_values(bb.ops[op])
+            if left_value and resources.resultDelay(bb.ops[op][1]):
+                delayed_left_values.setdefault(cycle + resources.resultDelay(bb.ops[op][1]), set()).add(left_value)
+
+    for cycle, ops in enumerate(schedule):
+        cycle_left_values = set()
+        # 读取本周期内更早的操作定义的变量是链接的组合结果，不算读取
+        for op, _ in sorted(ops):
+            for v in get_op_variables(bb.ops[op], bb.symbols):
+                if v not in cycle_left_values and v not in excluded:
+                    event_cols.append(column(v))
+                    event_rows.append(cycle)
+                    event_defs.append(False)
+            left_value = get_op_left_values(bb.ops[op])
+            if left_value and not resources.resultDelay(bb.ops[op][1]):
+                cycle_left_values.add(left_value)
+        for v in cycle_left_values | delayed_left_values.get(cycle, set()):
+            if v not in excluded:
+                event_cols.append(column(v))
+                event_rows.append(cycle)
+                event_defs.append(True)
+    for v in live_at_end:
+        event_cols.append(column(v))
+        event_rows.append(num_cycles)
+        event_defs.append(False)
+
+    cols = np.array(event_cols, dtype=np.int64)
+    rows = np.array(event_rows, dtype=np.int64)
+    is_def = np.array(event_defs, dtype=bool)
+    # 同一周期内读取排在定义之前：读取的是该周期开始时的值
+    order = np.lexsort((is_def, rows, cols))
+    cols, rows, is_def = cols[order], rows[order], is_def[order]
+
+    # 组内累计最大值求每个事件之前最近一次定义的周期，变量编号乘以（周期数 + 2）作为组的基数
+    stride = num_cycles + 2
+    keys = cols * stride + np.where(is_def, rows + 1, 0)
+    last_def = np.maximum.accumulate(keys) - cols * stride - 1
+    uses = ~is_def
+    return list(columns), cols[uses], last_def[uses] + 1, rows[uses]
+
+def get_local_variable_liveness(self, resources=None, verbose=False, vectorized=None):
+    """
+    块内每个周期存活的局部变量。安装了 NumPy 时使用向量化的存活段（self.live_segments），
+    否则逐周期构造集合（self.live_local_variables）；verbose 为真时打印每个基本块的结果
+    """
+    if resources is None:
+        resources = self.resources
+    if vectorized is None:
+        vectorized = np is not None
+    elif vectorized and np is None:
+        raise ImportError("vectorized liveness requires NumPy, pass vectorized=False or install numpy")
     self.live_local_variables = {}
+    self.live_segments = {}
     input_nonarray_variables = set([v for (v, t) in self.params if t == 'non-array'])
 
     for bb_label, bb in self.basicBlocks.items():
-        bb_live_local_variables = []
-        
-        cycle_live_local_variables = self.output_variables[bb_label] - self.global_variable - input_nonarray_variables
-        bb_live_local_variables.insert(0, cycle_live_local_variables)
-
-        for cycle in range(len(self.schedule[bb_label])-1, -1, -1):
-            ops = self.schedule[bb_label][cycle]
-            cycle_operands = set()
-            cycle_left_values = set()
-
-            for op, _ in ops:
-                operands = get_op_operands(bb.ops[op])
-                if operands:
-                    cycle_operands = cycle_operands | operands
-                left_value = get_op_left_values(bb.ops[op])
-                if left_value:
-                    cycle_left_values = cycle_left_values | {left_value}
-
-            if cycle_operands:
-                cycle_live_local_variables = (cycle_live_local_variables-cycle_left_values)|cycle_operands - self.global_variable - input_nonarray_variables
-            else:
-                cycle_live_local_variables = (cycle_live_local_variables-cycle_left_values) - self.global_variable - input_nonarray_variables
-
-            removal_set = set()
-
-            for v in cycle_live_local_variables:
-                if v.isdigit():
-                    removal_set.add(v)
-            if removal_set:
-                cycle_live_local_variables = cycle_live_local_variables - removal_set
-            bb_live_local_variables.insert(0,cycle_live_local_variables)
-
+        # 跳转条件由状态机在基本块最后一个周期之后读取，需要存活到基本块结束
+        branch_conditions = set()
+        for op in bb.ops:
+            if op[1] == 7:
+                branch_conditions = branch_conditions | get_op_variables(op, bb.symbols)
+        live_at_end = (self.output_variables[bb_label] | branch_conditions) - self.global_variable - input_nonarray_variables
+
+        if vectorized:
+            excluded = self.global_variable | input_nonarray_variables
+            self.live_segments[bb_label] = get_bb_live_segments(self, bb_label, bb, resources, live_at_end, excluded)
+        else:
+            self.live_local_variables[bb_label] = get_bb_live_sets(self, bb_label, bb, resources, live_at_end, input_nonarray_variables)
+        if verbose:
+            print(bb_label, ":", get_bb_live_local_variables(self, bb_label))
+
+def get_bb_live_sets(self, bb_label, bb, resources, live_at_end, input_nonarray_variables):
+    """逐周期从后往前构造每个周期存活的局部变量集合"""
+    # 流水单元和多周期单元的结果在发射后第（延迟 - 1）个周期才写回寄存器，从写回的周期开始存活
+    delayed_left_values = {}
+    for cycle, ops in enumerate(self.schedule[bb_label]):
+        for op, _ in ops:
+            op_type = bb.ops[op][1]
+            left_value = get_op_left_values(bb.ops[op])
+            if left_value and resources.resultDelay(op_type):
+                write_cycle = cycle + resources.resultDelay(op_type)
+                delayed_left_values.setdefault(write_cycle, set()).add(left_value)
+    cycle_live_local_variables = live_at_end
+    bb_live_local_variables = [cycle_live_local_variables]
+
+    for cycle in range(len(self.schedule[bb_label])-1, -1, -1):
+        ops = self.schedule[bb_label][cycle]
+        cycle_operands = set()
+        cycle_left_values = set()
+
+        # 按序号处理同一周期内的操作：读取本周期内更早的操作定义的变量是链接（chaining）的组合结果，
+        # 不需要在该周期之前存活
+        for op, _ in sorted(ops):
+            # 常数不占用寄存器，不参与存活分析
+            operands = get_op_variables(bb.ops[op], bb.symbols)
+            if operands:
+                cycle_operands = cycle_operands | (operands - cycle_left_values)
+            left_value = get_op_left_values(bb.ops[op])
+            if left_value and not resources.resultDelay(bb.ops[op][1]):
+                cycle_left_values = cycle_left_values | {left_value}
+        cycle_left_values = cycle_left_values | delayed_left_values.get(cycle, set())
+
+        if cycle_operands:
+            cycle_live_local_variables = (cycle_live_local_variables-cycle_left_values)|cycle_operands - self.global_variable - input_nonarray_variables
+        else:
+            cycle_live_local_variables = (cycle_live_local_variables-cycle_left_values) - self.global_variable - input_nonarray_variables
+        bb_live_local_variables.append(cycle_live_local_variables)
+
+    bb_live_local_variables.reverse()
+    return bb_live_local_variables
+
+def get_bb_live_local_variables(self, bb_label):
+    # 向量化路径只保存存活段，需要时再展开为每个周期的存活变量集合
+    if bb_label not in self.live_local_variables:
+        variables, cols, starts, ends = self.live_segments[bb_label]
+        bb_live_local_variables = [set() for _ in range(len(self.schedule[bb_label]) + 1)]
+        for col, start, end in zip(cols.tolist(), starts.tolist(), ends.tolist()):
+            for cycle in range(start, end + 1):
+                bb_live_local_variables[cycle].add(variables[col])
         self.live_local_variables[bb_label] = bb_live_local_variables
-        print(bb_label, ":", bb_live_local_variables)
+    return self.live_local_variables[bb_label]
 
 def get_living_period(self):
     self.living_period = {}
     for bb_label, bb in self.basicBlocks.items():
-        bb_live_local_variables = self.live_local_variables[bb_label]
         bb_live_period = {}
-        for i, cycle in enumerate(bb_live_local_variables):
-            for v in cycle:
-                if v not in bb_live_period:
-                    bb_live_period[v] = [i,i]
-                else:
-                    bb_live_period[v][1] = i
+        if bb_label in self.live_segments:
+            # 每个变量第一个和最后一个存活的周期，按开始存活的周期排序
+            variables, cols, starts, ends = self.live_segments[bb_label]
+            first = np.full(len(variables), np.iinfo(np.int64).max)
+            last = np.full(len(variables), -1)
+            np.minimum.at(first, cols, starts)
+            np.maximum.at(last, cols, ends)
+            living = np.flatnonzero(last >= 0)
+            for col in living[np.lexsort((living, first[living]))].tolist():
+                bb_live_period[variables[col]] = [int(first[col]), int(last[col])]
+        else:
+            for i, cycle in enumerate(self.live_local_variables[bb_label]):
+                for v in cycle:
+                    if v not in bb_live_period:
+                        bb_live_period[v] = [i,i]
+                    else:
+                        bb_live_period[v][1] = i
         self.living_period[bb_label]=bb_live_period
 
 def get_block_length(self):
@@ -161,32 +426,39 @@ def get_block_length(self):
     for key in self.schedule:
         self.block_length[key] = len(self.schedule[key])
 
+def left_edge_binding(bb_live_period):
+    """
+    左边沿算法（区间划分）：变量按（开始周期, 存活长度, 变量名）排序后依次放入
+    当前空闲的编号最小的寄存器，没有空闲寄存器时新开一个。
+    忙碌寄存器按释放周期放在最小堆中，空闲寄存器按编号放在另一个最小堆中，复杂度 O(n log n)；
+    结果与逐个颜色扫描未染色变量的左边沿算法相同，寄存器数等于最大同时存活的变量数
+
+    :param bb_live_period: {变量: [开始周期, 结束周期]}
+    :return: {寄存器号: [(变量, 存活周期), ...]}，每个寄存器中的变量按开始周期排列
+    """
+    ordered = sorted(bb_live_period.items(), key=lambda item: (item[1][0], item[1][1] - item[1][0], item[0]))
+    bb_coloring_result = {}
+    busy = []  # (结束周期, 寄存器号)
+    free = []  # 寄存器号
+    for v, period in ordered:
+        # 结束周期早于当前变量开始周期的寄存器可以复用
+        while busy and busy[0][0] < period[0]:
+            heapq.heappush(free, heapq.heappop(busy)[1])
+        if free:
+            color = heapq.heappop(free)
+        else:
+            color = len(bb_coloring_result)
+            bb_coloring_result[color] = []
+        bb_coloring_result[color].append((v, period))
+        heapq.heappush(busy, (period[1], color))
+    return bb_coloring_result
+
 def register_coloring(self):
     self.coloring_result = {}
 
     for bb_label, bb in self.basicBlocks.items():
-        bb_coloring_result ={}
-        # 将该块内局部变量初始化为未染色
-        uncolored = list(self.living_period[bb_label].keys())
-        uncolored.sort(key = lambda x:(self.living_period[bb_label][x][0],(self.living_period[bb_label][x][1]-self.living_period[bb_label][x][0]),x))
-
-        color = 0
-        while uncolored:
-            colored_var_list = []
-            right_edge = -1
-            for v in uncolored:
-                if self.living_period[bb_label][v][0] > right_edge:
-                    # 在该颜色的列表中加上该变量及其存活周期
-                    colored_var_list.append((v,self.living_period[bb_label][v]))
-                    # 更新右边沿
-                    right_edge = self.living_period[bb_label][v][1]
-            bb_coloring_result[color] = colored_var_list
-            color += 1
-            for v,_ in colored_var_list:
-                # 更新染色状态
-                uncolored.remove(v)
-        self.coloring_result[bb_label] = bb_coloring_result
-        #print(bb_label,":",bb_coloring_result)
+        self.coloring_result[bb_label] = left_edge_binding(self.living_period[bb_label])
+        #print(bb_label,":",self.coloring_result[bb_label])
 
     min_register_required = 0
     for bb_label in self.cfg:
@@ -400,15 +672,16 @@ def merge_registers(self):
         if not continueMerge:
             break
     
-    # Remove empty registers
+    # Remove registers that are empty in every basic block
+    # (a register number must keep the same meaning in all blocks, since values flow between them)
+    used_regs = sorted({reg for bb_coloring in self.merged_coloring_result.values() for reg, vars in bb_coloring.items() if vars})
+    renumber = {old_reg: new_reg for new_reg, old_reg in enumerate(used_regs)}
     for bb_label in self.merged_coloring_result:
-        # Create new dict without empty registers
-        non_empty = {reg: vars for reg, vars in self.merged_coloring_result[bb_label].items() if vars}
-        
         # Reassign register numbers sequentially
         new_coloring = {}
-        for new_reg, (old_reg, vars) in enumerate(sorted(non_empty.items())):
-            new_coloring[new_reg] = vars
+        for old_reg, vars in sorted(self.merged_coloring_result[bb_label].items()):
+            if old_reg in renumber:
+                new_coloring[renumber[old_reg]] = vars
             
         self.merged_coloring_result[bb_label] = new_coloring
 
@@ -419,6 +692,128 @@ def merge_registers(self):
             self.merged_coloring_result[bb_label][reg] = []
                 # 将该变量的寄存器合并到目标寄存器
 
+def get_interference_graph(self, variables):
+    """
+    整个函数的局部变量干涉图：两个变量在某个基本块中的存活周期重叠则相互干涉。
+    每个基本块按开始周期扫描存活区间，用按结束周期排序的最小堆维护当前存活的变量
+
+    :param variables: {变量: 编号}
+    :return: 邻接表，adjacency[编号] 为干涉变量编号的集合
+    """
+    adjacency = [set() for _ in variables]
+    for bb_label in self.basicBlocks:
+        active = []  # (结束周期, 变量编号)
+        for v, period in sorted(self.living_period[bb_label].items(), key=lambda item: item[1][0]):
+            while active and active[0][0] < period[0]:
+                heapq.heappop(active)
+            node = variables[v]
+            for _, other in active:
+                adjacency[node].add(other)
+                adjacency[other].add(node)
+            heapq.heappush(active, (period[1], node))
+    return adjacency
+
+def maximum_cardinality_search(adjacency):
+    """
+    最大势搜索（MCS）：每次访问已访问邻居最多的顶点。弦图的访问顺序是完美消除序列的逆序，
+    按此顺序贪心染色所需颜色数等于最大团的大小
+
+    :return: (访问顺序, 每个顶点访问时已访问邻居的个数)
+    """
+    num_nodes = len(adjacency)
+    weight = [0] * num_nodes
+    visited = [False] * num_nodes
+    buckets = [list(range(num_nodes - 1, -1, -1))]  # 按权重分桶，桶内后进先出，过期的项访问时跳过
+    order = []
+    top = 0
+    while len(order) < num_nodes:
+        while True:
+            node = buckets[top].pop() if buckets[top] else None
+            if node is None:
+                top -= 1
+            elif not visited[node] and weight[node] == top:
+                break
+        visited[node] = True
+        order.append(node)
+        for other in adjacency[node]:
+            if not visited[other]:
+                weight[other] += 1
+                if weight[other] == len(buckets):
+                    buckets.append([])
+                buckets[weight[other]].append(other)
+                top = max(top, weight[other])
+    return order, weight
+
+def is_chordal_order(adjacency, order):
+    # 访问顺序的逆序是完美消除序列（即图是弦图）：每个顶点先访问的邻居构成团，
+    # 只需检查其中除最后访问的一个 p 外，其余都与 p 相邻
+    position = {node: idx for idx, node in enumerate(order)}
+    for node in order:
+        earlier = [other for other in adjacency[node] if position[other] < position[node]]
+        if len(earlier) > 1:
+            parent = max(earlier, key=position.__getitem__)
+            if any(other != parent and other not in adjacency[parent] for other in earlier):
+                return False
+    return True
+
+def chordal_register_allocation(self):
+    """
+    整个函数的局部变量一起分配寄存器（可选模式，代替 register_coloring + merge_registers）。
+    SSA 形式下干涉图是弦图：按最大势搜索的顺序贪心染色即为最优，寄存器数等于同时存活的变量数的最大值。
+    染色时优先使用与 phi 相连（phi 的结果与其读取的变量）的、已染色变量的颜色，使 phi 的赋值变成同一个寄存器，
+    只在该颜色空闲时采用，不增加寄存器数。
+    同一个变量在所有基本块中使用同一个寄存器，结果的格式与 merged_coloring_result 相同
+    """
+    variables = {}
+    for bb_label in self.basicBlocks:
+        for v in self.living_period[bb_label]:
+            variables.setdefault(v, len(variables))
+    names = list(variables)
+    adjacency = get_interference_graph(self, variables)
+
+    # phi 的结果与读取的局部变量互为合并候选
+    partners = [[] for _ in names]
+    for bb in self.basicBlocks.values():
+        for op in bb.phis + bb.ops:
+            if op.op_type == OP_PHI and op.value in variables:
+                for v in op.uses:
+                    if v in variables and v != op.value:
+                        partners[variables[op.value]].append(variables[v])
+                        partners[variables[v]].append(variables[op.value])
+
+    order, _ = maximum_cardinality_search(adjacency)
+    self.register_graph_chordal = is_chordal_order(adjacency, order)
+    color = [-1] * len(names)
+    for node in order:
+        used = {color[other] for other in adjacency[node]}
+        preferred = [color[other] for other in partners[node] if color[other] >= 0 and color[other] not in used]
+        if preferred:
+            color[node] = preferred[0]
+        else:
+            color[node] = 0
+            while color[node] in used:
+                color[node] += 1
+
+    num_registers = max(color, default=-1) + 1
+    self.merged_coloring_result = {}
+    for bb_label in self.basicBlocks:
+        bb_coloring = {reg: [] for reg in range(num_registers)}
+        for v, period in self.living_period[bb_label].items():
+            bb_coloring[color[variables[v]]].append((v, period))
+        for var_list in bb_coloring.values():
+            var_list.sort(key=lambda item: item[1][0])
+        self.merged_coloring_result[bb_label] = bb_coloring
+    self.coloring_result = self.merged_coloring_result
+
+def left_edge_register_allocation(self):
+    register_coloring(self)
+    merge_registers(self)
+
+REGISTER_ALLOCATORS = {
+    'left-edge': left_edge_register_allocation,
+    'chordal': chordal_register_allocation,
+}
+
 def printInputVariables(self, file=None):
     """
         Print input variables information.
@@ -452,6 +847,15 @@ def printOutputVariables(self, file=None):
         print(file=file)
     print(35 * "-", file=file)
 
+def printCoalescedCopies(self, file=None):
+    """
+        Print the phi copies coalesced into the register of the phi result.
+    """
+    print("Coalesced Phi Copies:", file=file)
+    for bb_label, dest, pred, value in self.coalesced_copies:
+        print(f"  {pred} -> {bb_label}: {value} renamed to {dest}", file=file)
+    print(35 * "-", file=file)
+
 def printGlobalVariables(self, file=None):
     """
         Print global variables information.
@@ -470,7 +874,8 @@ def printLocalVariablesLivenessCycle(self, file=None):
     """
     print("Getting Local Variable Liveness:", file=file)
     # print(live_local_variables)
-    for bb_label, bb_live_local_variables in self.live_local_variables.items():
+    for bb_label in self.basicBlocks:
+        bb_live_local_variables = get_bb_live_local_variables(self, bb_label)
         print(f"Basic block {bb_label}: ", file=file)
         # print(bb_live_local_variables, file=file)
         for cycle, variable in enumerate(bb_live_local_variables):
@@ -531,13 +936,13 @@ def printRegisterMerging(self, file=None):
     
     print(35 * "-", file=file)
 
-def registerAllocation(cdfg_obj):
+def registerAllocation(cdfg_obj, resources=None, verbose=False, allocator='left-edge'):
     get_input_output_variables(cdfg_obj)
+    coalesce_phi_copies(cdfg_obj, resources)
     get_global_variables(cdfg_obj)
-    get_local_variable_liveness(cdfg_obj)
+    get_local_variable_liveness(cdfg_obj, resources, verbose)
     get_living_period(cdfg_obj)
-    register_coloring(cdfg_obj)
-    merge_registers(cdfg_obj)
+    REGISTER_ALLOCATORS[allocator](cdfg_obj)
 
 def addRegisterAllocation(cdfg_obj, basic_block_obj):
     setattr(basic_block_obj, 'get_bb_operands', {})
@@ -546,6 +951,8 @@ def addRegisterAllocation(cdfg_obj, basic_block_obj):
     setattr(basic_block_obj, 'get_bb_left_values', get_bb_left_values)
     setattr(cdfg_obj, 'get_input_output_variables', {})
     setattr(cdfg_obj, 'get_input_output_variables', get_input_output_variables)
+    setattr(cdfg_obj, 'coalesce_phi_copies', {})
+    setattr(cdfg_obj, 'coalesce_phi_copies', coalesce_phi_copies)
     setattr(cdfg_obj, 'get_global_variables', {})
     setattr(cdfg_obj, 'get_global_variables', get_global_variables)
     setattr(cdfg_obj, 'get_local_variable_liveness', {})
@@ -563,6 +970,8 @@ def registerAllocatorPrinter(self, file=None):
     print("===== Initial Register Allocation =====", file=file)
     printInputVariables(self, file)
     printOutputVariables(self, file)
+    if any(bb.phis for bb in self.basicBlocks.values()):
+        printCoalescedCopies(self, file)
     printGlobalVariables(self, file)
     printLocalVariablesLivenessCycle(self, file)
     printLocalVariablesLivenessVariable(self, file)
@@ -572,4 +981,6 @@ def registerAllocatorPrinter(self, file=None):
     print(f"Total registers needed: {len(self.merged_coloring_result['0']) + len(self.global_variable)}", file=file)
     print(f"Global registers needed: {len(self.global_variable)}", file=file)
     print(f"Local registers needed: {len(self.merged_coloring_result['0'])}", file=file)
+    if getattr(self, 'register_graph_chordal', None) is not None:
+        print(f"Local interference graph is chordal: {self.register_graph_chordal}", file=file)
     print("=====================================\n", file=file)
\ No newline at end of file
@@ -69,4 +69,86 @@ DELAY = [
     1, # OP_EQ
     1, # OP_PHI
     1, # OP_RET
-]
\ No newline at end of file
+]
+
+# 定义启动间隔：同一个计算单元两次发射操作之间至少间隔的周期数
+# 等于 DELAY 表示非流水单元，执行期间一直被占用；小于 DELAY 表示流水单元，可在前一个操作完成前接收新操作
+INITIATION_INTERVAL = [
+    1, # OP_ASSIGN
+    1, # OP_ADD
+    1, # OP_SUB
+    1, # OP_MUL
+    10, # OP_DIV
+    1, # OP_LOAD
+    2, # OP_STORE
+    1, # OP_BR
+    1, # OP_LT
+    1, # OP_GT
+    1, # OP_LE
+    1, # OP_GE
+    1, # OP_EQ
+    1, # OP_PHI
+    1, # OP_RET
+]
+
+# 定义每个计算单元的面积（以 32 位加法器的 LUT 数为参照的估计值）
+AREA = [
+    0, # OP_ASSIGN
+    32, # OP_ADD
+    32, # OP_SUB
+    600, # OP_MUL
+    1200, # OP_DIV
+    16, # OP_LOAD
+    16, # OP_STORE
+    0, # OP_BR
+    16, # OP_LT
+    16, # OP_GT
+    16, # OP_LE
+    16, # OP_GE
+    16, # OP_EQ
+    32, # OP_PHI
+    0, # OP_RET
+]
+
+# 定义组合逻辑延迟（ns），用于时序驱动的操作链接（chaining）
+COMB_DELAY_NS = [
+    0.5, # OP_ASSIGN
+    2.5, # OP_ADD
+    2.5, # OP_SUB
+    8.0, # OP_MUL
+    20.0, # OP_DIV
+    3.0, # OP_LOAD
+    3.0, # OP_STORE
+    0.5, # OP_BR
+    2.0, # OP_LT
+    2.0, # OP_GT
+    2.0, # OP_LE
+    2.0, # OP_GE
+    2.0, # OP_EQ
+    0.5, # OP_PHI
+    0.5, # OP_RET
+]
+
+# 默认目标时钟周期（ns）
+CLOCK_PERIOD_NS = 10.0
+
+# 可以与前驱在同一周期内级联的单周期组合操作；phi 链接时是一个按 last_state 选择的多路选择器，
+# 跳转只读取条件，条件寄存器由状态机在下一周期使用
+CHAINABLE_OPS = {OP_ASSIGN, OP_ADD, OP_SUB, OP_LT, OP_GT, OP_LE, OP_GE, OP_EQ, OP_PHI, OP_BR}
+
+# 绑定到共享功能单元实例的操作：同类型的操作经由操作数端口前的多路选择器复用同一个单元
+SHAREABLE_OPS = {OP_ADD, OP_SUB, OP_MUL, OP_DIV, OP_LT, OP_GT, OP_LE, OP_GE, OP_EQ}
+
+# 延迟大于 1 时按周期分步实现的运算：乘法每个周期移位相加若干位，除法每个周期做若干步基 2 恢复余数除法，
+# 分步的总周期数与延迟一致；其他延迟大于 1 的单元保持组合逻辑，由多周期路径约束放宽时序
+STEPPED_OPS = {OP_MUL, OP_DIV}
+
+# 访问数组存储器的操作：每个数组是一个独立的存储器，读端口（取数）与写端口（存数）按数组分别计数，
+# 访问不同数组的操作互不占用端口
+MEMORY_OPS = {OP_LOAD, OP_STORE}
+
+# 可交换操作数的操作，绑定时可以交换两个操作数以减少多路选择器的输入
+COMMUTATIVE_OPS = {OP_ADD, OP_MUL, OP_EQ}
+
+# 功能单元操作数端口上多路选择器每个输入的面积估计（32 位，与 AREA 同一参照）
+MUX_INPUT_AREA = 8
@@ -0,0 +1,224 @@
+import os
+import json
+from resourceData import *
+
+class ResourceLibrary:
+    """
+    Functional-unit library of one synthesis run.
+
+    For every op type (indexed like the tables in resourceData) it holds the number of
+    units, the latency in cycles, the initiation interval, the area of one unit and the
+    combinational delay in ns, plus the target clock period. Each HLS object owns its own
+    library, so differently constrained runs can share one process.
+
+    Every array is a separate memory: the count of OP_LOAD / OP_STORE is the number of read /
+    write ports of each array, and memory_ports overrides it for single arrays.
+    """
+
+    def __init__(self, count=None, latency=None, initiation_interval=None, area=None, comb_delay=None, clock_period=CLOCK_PERIOD_NS,
+                 memory_ports=None):
+        """
+        Args:
+            count, latency, initiation_interval, area, comb_delay: per-op-type lists,
+                defaulting to RESOURCE, DELAY, INITIATION_INTERVAL, AREA and COMB_DELAY_NS
+            clock_period: target clock period in ns
+            memory_ports: {array: {OP_LOAD: read ports, OP_STORE: write ports}}, either may be left out
+        """
+        self.count = list(RESOURCE if count is None else count)
+        self.latency = list(DELAY if latency is None else latency)
+        self.initiation_interval = list(INITIATION_INTERVAL if initiation_interval is None else initiation_interval)
+        self.area = list(AREA if area is None else area)
+        self.comb_delay = list(COMB_DELAY_NS if comb_delay is None else comb_delay)
+        self.setClockPeriod(clock_period)
+        self.memory_ports = {}
+        for op_type in OP_TYPE_MAP:
+            self.validate(op_type)
+        for array, ports in (memory_ports or {}).items():
+            self.setMemoryPorts(array, read_ports=ports.get(OP_LOAD), write_ports=ports.get(OP_STORE))
+
+    def setUnit(self, op_type, count=None, latency=None, initiation_interval=None, area=None, comb_delay=None):
+        """
+        Change the unit of one op type; op_type is a number or a name such as 'OP_MUL' or 'mul'.
+        Setting only the latency keeps a blocking unit blocking.
+        """
+        op_type = opTypeFromName(op_type)
+        if latency is not None and initiation_interval is None and not self.isPipelined(op_type):
+            initiation_interval = latency
+        fields = ((self.count, count), (self.latency, latency), (self.initiation_interval, initiation_interval),
+                  (self.area, area), (self.comb_delay, comb_delay))
+        # Check the new values before assigning them, so a rejected call leaves the unit unchanged
+        checkUnit(OP_TYPE_MAP[op_type], *(table[op_type] if value is None else value for table, value in fields))
+        for table, value in fields:
+            if value is not None:
+                table[op_type] = value
+        return self
+
+    def setClockPeriod(self, clock_period):
+        """Change the target clock period in ns"""
+        if not isNumber(clock_period) or clock_period <= 0:
+            raise ValueError(f"clock period must be a positive number of ns, got {clock_period!r}")
+        self.clock_period = clock_period
+        return self
+
+    def setMemoryPorts(self, array, read_ports=None, write_ports=None):
+        """Change the number of read and/or write ports of one array"""
+        updates = {op_type: num for op_type, num in ((OP_LOAD, read_ports), (OP_STORE, write_ports)) if num is not None}
+        for op_type, num in updates.items():
+            if not isCount(num):
+                raise ValueError(f"{array}: at least one {'read' if op_type == OP_LOAD else 'write'} port is required, got {num!r}")
+        self.memory_ports.setdefault(array, {}).update(updates)
+        return self
+
+    def resourceKey(self, op):
+        """
+        Resource class an operation competes for: its op type, or (op type, array) for loads and
+        stores, which only compete for the ports of their own array
+        """
+        if op[1] in MEMORY_OPS:
+            return (op[1], op[2])
+        return op[1]
+
+    def unitCount(self, key):
+        """Number of units (or ports of the array) of a resource class given by resourceKey"""
+        if isinstance(key, tuple):
+            op_type, array = key
+            return self.memory_ports.get(array, {}).get(op_type, self.count[op_type])
+        return self.count[key]
+
+    def validate(self, op_type):
+        checkUnit(OP_TYPE_MAP[op_type], self.count[op_type], self.latency[op_type], self.initiation_interval[op_type],
+                  self.area[op_type], self.comb_delay[op_type])
+
+    def isPipelined(self, op_type):
+        """Whether the unit accepts a new operation before the previous one finishes"""
+        return self.initiation_interval[op_type] < self.latency[op_type]
+
+    def resultDelay(self, op_type):
+        """
+        Cycles after issue at which the generated FSM writes the result register: pipelined units
+        and multi-cycle functional units write back after latency - 1 cycles, other ops at issue
+        """
+        if self.isPipelined(op_type) or (op_type in SHAREABLE_OPS and self.latency[op_type] > 1):
+            return self.latency[op_type] - 1
+        return 0
+
+    def isMultiCycleUnit(self, op_type):
+        """
+        Whether the generated FSM reads the result of the op from its unit latency - 1 cycles after issue,
+        also inside pipelined loops: stepped multipliers and dividers, and non-pipelined shared units
+        """
+        return (op_type in SHAREABLE_OPS and self.latency[op_type] > 1
+                and (op_type in STEPPED_OPS or not self.isPipelined(op_type)))
+
+    def isChainable(self, op_type):
+        """Whether the operation is single-cycle combinational logic that can be chained"""
+        return op_type in CHAINABLE_OPS and self.latency[op_type] == 1
+
+    def unitArea(self, op_types=None):
+        """Area of the allocated units, for all op types or only the given ones"""
+        if op_types is None:
+            op_types = OP_TYPE_MAP
+        return sum(self.count[op_type] * self.area[op_type] for op_type in op_types)
+
+    def copy(self):
+        return ResourceLibrary(self.count, self.latency, self.initiation_interval, self.area, self.comb_delay, self.clock_period,
+                               self.memory_ports)
+
+    def toDict(self):
+        """Configuration dictionary in the format read by fromDict"""
+        units = {}
+        for op_type, name in OP_TYPE_MAP.items():
+            units[name] = {
+                'count': self.count[op_type],
+                'latency': self.latency[op_type],
+                'ii': self.initiation_interval[op_type],
+                'area': self.area[op_type],
+                'delay_ns': self.comb_delay[op_type],
+            }
+        config = {'clock_period': self.clock_period, 'units': units}
+        if self.memory_ports:
+            config['memories'] = {array: {MEMORY_PORT_FIELDS[op_type]: num for op_type, num in ports.items()}
+                                  for array, ports in self.memory_ports.items()}
+        return config
+
+    @classmethod
+    def fromDict(cls, config):
+        """
+        Build a library from a configuration dictionary; op types that are not listed keep the defaults:
+            {"clock_period": 10.0,
+             "units": {"OP_MUL": {"count": 2, "latency": 3, "ii": 1, "area": 600, "delay_ns": 8.0}},
+             "memories": {"a": {"read_ports": 2, "write_ports": 1}}}
+        """
+        if not isinstance(config, dict):
+            raise ValueError("the configuration must be a table of fields")
+        unknown = set(config) - {'clock_period', 'units', 'memories'}
+        if unknown:
+            raise ValueError(f"unknown configuration fields {sorted(unknown)}")
+        library = cls(clock_period=config.get('clock_period', CLOCK_PERIOD_NS))
+        for section in ('units', 'memories'):
+            if not isinstance(config.get(section, {}), dict):
+                raise ValueError(f"{section} must be a table keyed by {'op type' if section == 'units' else 'array'}")
+        for name, unit in config.get('units', {}).items():
+            if not isinstance(unit, dict):
+                raise ValueError(f"{name}: the unit must be a table of fields")
+            unknown = set(unit) - {'count', 'latency', 'ii', 'area', 'delay_ns'}
+            if unknown:
+                raise ValueError(f"{name}: unknown unit fields {sorted(unknown)}")
+            library.setUnit(name, count=unit.get('count'), latency=unit.get('latency'),
+                            initiation_interval=unit.get('ii'), area=unit.get('area'), comb_delay=unit.get('delay_ns'))
+        for array, ports in config.get('memories', {}).items():
+            if not isinstance(ports, dict):
+                raise ValueError(f"{array}: the memory must be a table of fields")
+            unknown = set(ports) - set(MEMORY_PORT_FIELDS.values())
+            if unknown:
+                raise ValueError(f"{array}: unknown memory fields {sorted(unknown)}")
+            library.setMemoryPorts(array, read_ports=ports.get('read_ports'), write_ports=ports.get('write_ports'))
+        return library
+
+    @classmethod
+    def fromFile(cls, file_path):
+        """Load a library from a .json or .toml file"""
+        extension = os.path.splitext(file_path)[1].lower()
+        if extension == '.toml':
+            import tomllib
+            with open(file_path, 'rb') as f:
+                return cls.fromDict(tomllib.load(f))
+        with open(file_path, 'r') as f:
+            return cls.fromDict(json.load(f))
+
+# Fields of the per-array port counts in a configuration dictionary
+MEMORY_PORT_FIELDS = {OP_LOAD: 'read_ports', OP_STORE: 'write_ports'}
+
+def isCount(value):
+    """Whether a count, latency or II is a whole number of at least one (bool is not accepted)"""
+    return isinstance(value, int) and not isinstance(value, bool) and value >= 1
+
+def isNumber(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def checkUnit(name, count, latency, initiation_interval, area, comb_delay):
+    """Raise ValueError if the fields of a unit are not a valid unit"""
+    if not isCount(count):
+        raise ValueError(f"{name}: at least one unit is required, got {count!r}")
+    if not isCount(latency):
+        raise ValueError(f"{name}: latency must be a whole number of at least one cycle, got {latency!r}")
+    if not isCount(initiation_interval) or initiation_interval > latency:
+        raise ValueError(f"{name}: initiation interval must be a whole number between 1 and the latency, got {initiation_interval!r}")
+    if not isNumber(area) or area < 0:
+        raise ValueError(f"{name}: area must be a non-negative number, got {area!r}")
+    if not isNumber(comb_delay) or comb_delay < 0:
+        raise ValueError(f"{name}: combinational delay must be a non-negative number of ns, got {comb_delay!r}")
+
+def opTypeFromName(name):
+    """Accept an op type number or a name such as 'OP_MUL', 'MUL' or 'mul'"""
+    if isinstance(name, int):
+        if name not in OP_TYPE_MAP:
+            raise ValueError(f"unknown op type {name}")
+        return name
+    key = name.upper()
+    if not key.startswith('OP_'):
+        key = 'OP_' + key
+    for op_type, op_name in OP_TYPE_MAP.items():
+        if op_name == key:
+            return op_type
+    raise ValueError(f"unknown op type {name}")
@@ -1,95 +1,242 @@
+import heapq
 from resourceData import *
+from resourceLibrary import ResourceLibrary
 
-def initializeSchedulingResources(bb):
-    """初始化调度所需的资源和数据结构"""
-    # 计算操作入度
-    in_degree = dict(bb.dfg.in_degree())
-    
-    # 确保所有操作都有入度值（包括孤立节点）
-    # for i in range(len(bb.ops)):
-    #     if i not in in_degree:
-    #         in_degree[i] = 0
-    in_degree = {i: in_degree.get(i, 0) for i in range(len(bb.ops))}
-    
-    # 初始化跟踪变量
-    # time remain for certain resource on certain operation
-    time_remain = [0] * len(bb.ops)
-    # show certain operation is occupying device or not
-    device_occupied = [-1] * len(bb.ops)
-    # show all the occupation situation
-    # 0 means not occupied; 1 means occupied
-    occupation = [[0] * RESOURCE[i] for i in range(len(RESOURCE))]
-    
-    return in_degree, time_remain, device_occupied, occupation
+def buildDependencyIndex(bb):
+    """将DFG整理为入度数组与后继列表，调度过程中不再查询图结构"""
+    num_ops = len(bb.ops)
+    in_degree = [0] * num_ops
+    successors = [[] for _ in range(num_ops)]
+    for op_idx in bb.dfg:
+        in_degree[op_idx] = bb.dfg.in_degree(op_idx)
+        successors[op_idx] = list(bb.dfg.successors(op_idx))
+    return in_degree, successors
 
-def processRunningOperations(bb, time_remain, device_occupied, occupation, in_degree, unfinished):
-    """处理当前正在执行的操作"""
-    for i in range(len(bb.ops)):
-        if time_remain[i] <= 0:
-            continue
-            
-        # decrease the time remain
-        time_remain[i] -= 1
-        
-        # 如果操作执行完毕
-        if time_remain[i] == 0:
-            # 释放计算资源
-            op_type = bb.ops[i][1]
-            occupation[op_type][device_occupied[i]] = 0
-            device_occupied[i] = -1
-            
-            # 从未完成列表中移除
-            unfinished.remove(i) if i in unfinished else None
+def fifoPriority(bb):
+    """按就绪先后服务就绪队列，同一周期就绪的操作按序号排列（与周期级模拟的顺序一致）"""
+    return lambda op_idx, ready_time: (ready_time, op_idx)
+
+def criticalPathPriority(bb, resources=None):
+    """
+    按到汇点的最长路径（以延迟周期计）排序就绪操作，关键路径上的操作优先；
+    最长路径相同时，机动性（ALAP - ASAP）小的优先，再按操作序号。
+    phi 操作始终排在最前并保持程序顺序：phi 可以读取同一基本块中的另一个 phi，DFG 中没有边约束它们的先后，
+    与 FIFO 调度一样按序号发射才能保证先读取旧值再覆盖。
+    """
+    if resources is None:
+        resources = ResourceLibrary()
+    num_ops = len(bb.ops)
+    in_degree, successors = buildDependencyIndex(bb)
+    delay = [resources.latency[op[1]] for op in bb.ops]
+
+    # DFG 的边总是从序号小的操作指向序号大的操作，序号顺序即为拓扑序
+    asap = [0] * num_ops
+    for op_idx in range(num_ops):
+        for dst in successors[op_idx]:
+            asap[dst] = max(asap[dst], asap[op_idx] + delay[op_idx])
+    longest_path = [0] * num_ops
+    for op_idx in range(num_ops - 1, -1, -1):
+        longest_path[op_idx] = delay[op_idx] + max((longest_path[dst] for dst in successors[op_idx]), default=0)
+    critical_length = max(longest_path, default=0)
+
+    is_phi = [op[1] == OP_PHI for op in bb.ops]
+
+    def priority(op_idx, ready_time):
+        if is_phi[op_idx]:
+            return (0, 0, 0, op_idx)
+        mobility = critical_length - longest_path[op_idx] - asap[op_idx]
+        return (1, -longest_path[op_idx], mobility, op_idx)
+    return priority
+
+def listSchedule(bb, priority=None, resources=None):
+    """
+    事件驱动的资源约束列表调度。
+    每种资源（操作类型；取数和存数为 (操作类型, 数组)，只占用所访问数组的端口，见 ResourceLibrary.resourceKey）
+    维护一个就绪堆和一个空闲设备堆，正在执行的操作放入以完成时间为键的事件堆，
+    设备在启动间隔后重新空闲，流水单元因此可以在前一个操作完成前接收新操作；
+    时间直接跳到下一个事件，空闲周期不再逐周期模拟。复杂度约为 O(E log V)。
+    priority: priority(op_idx, ready_time) 返回排序键，键越小越先调度；默认为 FIFO。
+    resources: 资源库（单元数量、延迟、启动间隔），默认为 resourceData 中的配置。
+    返回：该基本块的调度结果 [[(op_idx, device_idx), ...], ...]
+    """
+    if priority is None:
+        priority = fifoPriority(bb)
+    if resources is None:
+        resources = ResourceLibrary()
+    in_degree, successors = buildDependencyIndex(bb)
+
+    # 每种资源的就绪堆 (key, op_idx) 与空闲设备堆
+    ready = {}
+    free_devices = {}
+    # 完成事件堆 (完成时间, op_idx)：唤醒后继
+    events = []
+    # 释放事件堆 (释放时间, 资源序号, device_idx)：经过启动间隔后设备可以接收新操作；
+    # 资源可能是元组，堆中用序号代替
+    releases = []
+    resource_keys = []
+    keys = {}
 
-            # 降低依赖该操作的后继操作的入度
-            for _, dst in bb.dfg.out_edges(i):
+    def markReady(op_idx, ready_time):
+        resource = resources.resourceKey(bb.ops[op_idx])
+        keys[op_idx] = priority(op_idx, ready_time)
+        if resource not in ready:
+            ready[resource] = []
+            free_devices[resource] = list(range(resources.unitCount(resource)))
+            resource_keys.append(resource)
+        heapq.heappush(ready[resource], (keys[op_idx], op_idx))
+
+    for op_idx in range(len(bb.ops)):
+        if in_degree[op_idx] == 0:
+            markReady(op_idx, 0)
+
+    bb_schedule = []
+    finish_time = 0
+    time = 0
+    while True:
+        # 释放到达启动间隔的设备
+        while releases and releases[0][0] == time:
+            _, resource_idx, device_idx = heapq.heappop(releases)
+            heapq.heappush(free_devices[resource_keys[resource_idx]], device_idx)
+        # 唤醒在当前时刻完成的操作的后继
+        while events and events[0][0] == time:
+            _, op_idx = heapq.heappop(events)
+            for dst in successors[op_idx]:
                 in_degree[dst] -= 1
+                if in_degree[dst] == 0:
+                    markReady(dst, time)
 
-def identifyReadyOperations(bb, in_degree, sent):
-    """找出当前周期可以调度的操作"""
-    ready = []
-    for i in range(len(bb.ops)):
-        if i not in sent and in_degree[i] == 0:
-            ready.append(i)
-            sent.append(i)
-    return ready
-
-def scheduleReadyOperations(bb, ready, time_remain, device_occupied, occupation):
-    """尝试调度就绪队列中的操作"""
-    cycle_schedule = []
-    removal_list = []
-    
-    for op_idx in ready:
-        op_type = bb.ops[op_idx][1]
-        
-        # 查找空闲资源
-        for pos in range(RESOURCE[op_type]):
-            if occupation[op_type][pos] == 0:
-                # 分配资源
-                cycle_schedule.append((op_idx, pos))
-                occupation[op_type][pos] = 1
-                device_occupied[op_idx] = pos
-                time_remain[op_idx] = DELAY[op_type]
-                removal_list.append(op_idx)
-                break
-    
-    # 从就绪队列中移除已调度的操作
-    for op_idx in removal_list:
-        ready.remove(op_idx)
-        
-    return cycle_schedule
+        # 按优先级为每种资源分配空闲设备
+        cycle_schedule = []
+        for resource_idx, resource in enumerate(resource_keys):
+            ready_heap = ready[resource]
+            devices = free_devices[resource]
+            while ready_heap and devices:
+                _, op_idx = heapq.heappop(ready_heap)
+                op_type = bb.ops[op_idx][1]
+                device_idx = heapq.heappop(devices)
+                delay = resources.latency[op_type]
+                heapq.heappush(events, (time + delay, op_idx))
+                heapq.heappush(releases, (time + resources.initiation_interval[op_type], resource_idx, device_idx))
+                finish_time = max(finish_time, time + delay)
+                cycle_schedule.append((op_idx, device_idx))
+        cycle_schedule.sort(key=lambda item: keys[item[0]])
 
-def handleDeadlock(bb, unfinished, ready, in_degree, sent):
-    """处理可能的死锁情况"""
-    if not unfinished or ready:
-        return False
-        
-    # 强制处理一个操作
-    force_op = unfinished[0]
-    in_degree[force_op] = 0
-    ready.append(force_op)
-    sent.append(force_op)
-    return True
+        # 记录当前周期，并补齐两次事件之间的空闲周期
+        while len(bb_schedule) < time:
+            bb_schedule.append([])
+        bb_schedule.append(cycle_schedule)
+
+        if not events:
+            # 没有正在执行的操作：要么全部完成，要么剩余操作没有可用设备
+            break
+        time = min(events[0][0], releases[0][0]) if releases else events[0][0]
+
+    # 调度长度等于最后一个操作的完成时间
+    del bb_schedule[finish_time:]
+    while len(bb_schedule) < finish_time:
+        bb_schedule.append([])
+    return bb_schedule
+
+def chainedListSchedule(bb, priority=None, resources=None):
+    """
+    时序驱动的列表调度：单周期组合操作（见 ResourceLibrary.isChainable）可以在前驱完成的同一周期内链接执行，
+    只要链上累计的组合延迟不超过资源库的时钟周期 clock_period；
+    多周期操作和流水单元只在周期开始时发射，其结果仍在延迟周期后可用。
+    同一周期内链接的操作各自占用一个设备，资源约束与 listSchedule 相同。
+    返回：该基本块的调度结果 [[(op_idx, device_idx), ...], ...]
+    """
+    if priority is None:
+        priority = fifoPriority(bb)
+    if resources is None:
+        resources = ResourceLibrary()
+    clock_period = resources.clock_period
+    in_degree, successors = buildDependencyIndex(bb)
+    num_ops = len(bb.ops)
+    chainable = [resources.isChainable(op[1]) for op in bb.ops]
+
+    # 每个操作最早可以开始的 (周期, 该周期内输入到达的时间 ns)
+    earliest = [(0, 0.0)] * num_ops
+    # 等待到达最早周期的操作 (周期, op_idx)
+    pending = []
+    ready = {}
+    free_devices = {}
+    releases = []
+    resource_keys = []
+    keys = {}
+
+    for op_idx in range(num_ops):
+        if in_degree[op_idx] == 0:
+            heapq.heappush(pending, (0, op_idx))
+
+    bb_schedule = []
+    finish_time = 0
+    time = 0
+    while True:
+        while releases and releases[0][0] <= time:
+            _, resource_idx, device_idx = heapq.heappop(releases)
+            heapq.heappush(free_devices[resource_keys[resource_idx]], device_idx)
+
+        cycle_schedule = []
+        progress = True
+        while progress:
+            progress = False
+            while pending and pending[0][0] <= time:
+                _, op_idx = heapq.heappop(pending)
+                resource = resources.resourceKey(bb.ops[op_idx])
+                keys[op_idx] = priority(op_idx, earliest[op_idx][0])
+                if resource not in ready:
+                    ready[resource] = []
+                    free_devices[resource] = list(range(resources.unitCount(resource)))
+                    resource_keys.append(resource)
+                heapq.heappush(ready[resource], (keys[op_idx], op_idx))
+
+            for resource_idx, resource in enumerate(resource_keys):
+                ready_heap = ready[resource]
+                devices = free_devices[resource]
+                while ready_heap and devices:
+                    _, op_idx = heapq.heappop(ready_heap)
+                    op_type = bb.ops[op_idx][1]
+                    arrival = earliest[op_idx][1] if earliest[op_idx][0] == time else 0.0
+                    end = arrival + resources.comb_delay[op_type]
+                    if arrival > 0 and (not chainable[op_idx] or end > clock_period):
+                        # 本周期剩余的时间不够，推迟到下一个周期开始
+                        earliest[op_idx] = (time + 1, 0.0)
+                        heapq.heappush(pending, (time + 1, op_idx))
+                        continue
+                    device_idx = heapq.heappop(devices)
+                    heapq.heappush(releases, (time + resources.initiation_interval[op_type], resource_idx, device_idx))
+                    finish_time = max(finish_time, time + resources.latency[op_type])
+                    cycle_schedule.append((op_idx, device_idx))
+                    for dst in successors[op_idx]:
+                        if chainable[op_idx] and chainable[dst]:
+                            available = (time, end)
+                        else:
+                            available = (time + resources.latency[op_type], 0.0)
+                        earliest[dst] = max(earliest[dst], available)
+                        in_degree[dst] -= 1
+                        if in_degree[dst] == 0:
+                            heapq.heappush(pending, (earliest[dst][0], dst))
+                            progress = True
+        cycle_schedule.sort(key=lambda item: keys[item[0]])
+
+        while len(bb_schedule) < time:
+            bb_schedule.append([])
+        bb_schedule.append(cycle_schedule)
+
+        # 下一个事件：等待中的操作到达最早周期，或者有设备被释放
+        next_times = []
+        if pending:
+            next_times.append(pending[0][0])
+        if releases and any(ready.values()):
+            next_times.append(releases[0][0])
+        if not next_times:
+            break
+        time = min(next_times)
+
+    del bb_schedule[finish_time:]
+    while len(bb_schedule) < finish_time:
+        bb_schedule.append([])
+    return bb_schedule
 
 def ensureBranchOrder(bb, bb_schedule):
     """确保跳转指令在所有其他操作完成后执行"""
@@ -137,53 +284,42 @@ def ensureBranchOrder(bb, bb_schedule):
 
 def scheduleASAP(self):
     """
-    使用ASAP算法对CDFG进行调度，采用周期级模拟。
+    使用ASAP算法对CDFG进行调度，采用事件驱动的列表调度。
     返回：调度结果字典 {bb_label: [[(op_idx, device_idx), ...], ...]}
     """
     self.schedule = {}
-    
+
     # 处理每个基本块
     for bbLabel, bb in self.basicBlocks.items():
-        # 初始化基本块的调度结果
-        bb_schedule = []
-        # print(f"\nbasic block label: {bbLabel}\n")
-        # 初始化调度所需的各种数据结构
-        in_degree, time_remain, device_occupied, occupation = initializeSchedulingResources(bb)
-        
-        # 初始化跟踪变量
-        unfinished = list(range(len(bb.ops)))
-        sent = []
-        ready = []
-        
-        # 调度循环
-        while unfinished:
-            # 处理正在执行的操作
-            processRunningOperations(bb, time_remain, device_occupied, occupation, in_degree, unfinished)
-            
-            # 查找可以调度的新操作
-            ready.extend(identifyReadyOperations(bb, in_degree, sent))
-            
-            # 调度就绪操作
-            cycle_schedule = scheduleReadyOperations(bb, ready, time_remain, device_occupied, occupation)
-            
-            # 记录当前周期的调度结果
-            bb_schedule.append(cycle_schedule)
-            
-            # 检测并处理死锁
-            if not cycle_schedule and not any(time_remain):
-                if handleDeadlock(bb, unfinished, ready, in_degree, sent):
-                    continue
-                break
-            
-            # print(f"unfinished: {unfinished}")
-            # print(f"sent: {sent}")
-            # print(f"ready: {ready}")
-
         # 处理分支指令的特殊要求
         # ensureBranchOrder(bb, bb_schedule)
-        bb_schedule.pop()
         # 保存基本块的调度结果
-        self.schedule[bbLabel] = bb_schedule
+        self.schedule[bbLabel] = listSchedule(bb, resources=self.resources)
+
+def scheduleCriticalPath(self):
+    """
+    资源约束的列表调度，就绪操作按关键路径优先级服务（见 criticalPathPriority）。
+    返回：调度结果字典 {bb_label: [[(op_idx, device_idx), ...], ...]}
+    """
+    self.schedule = {}
+    for bbLabel, bb in self.basicBlocks.items():
+        self.schedule[bbLabel] = listSchedule(bb, criticalPathPriority(bb, self.resources), self.resources)
+
+def scheduleChaining(self):
+    """
+    时序驱动的调度：在资源库的目标时钟周期内链接相互依赖的组合操作（见 chainedListSchedule）。
+    返回：调度结果字典 {bb_label: [[(op_idx, device_idx), ...], ...]}
+    """
+    self.schedule = {}
+    for bbLabel, bb in self.basicBlocks.items():
+        self.schedule[bbLabel] = chainedListSchedule(bb, resources=self.resources)
+
+# 可在 main.py 中通过 --scheduler 选择的调度模式
+SCHEDULING_MODES = {
+    'asap': scheduleASAP,
+    'critical-path': scheduleCriticalPath,
+    'chaining': scheduleChaining,
+}
 
 # def schedulePrinter(hls, file=None):
 #     """打印调度结果"""
@@ -222,4 +358,6 @@ def getOperationName(op_type):
 def addScheduler(classObj):
     """将调度功能添加到CDFG类"""
     setattr(classObj, 'schedule', {})
-    setattr(classObj, 'scheduleASAP', scheduleASAP)
\ No newline at end of file
+    setattr(classObj, 'scheduleASAP', scheduleASAP)
+    setattr(classObj, 'scheduleCriticalPath', scheduleCriticalPath)
+    setattr(classObj, 'scheduleChaining', scheduleChaining)
\ No newline at end of file
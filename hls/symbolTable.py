@@ -0,0 +1,141 @@
+from resourceData import OP_PHI, OP_LOAD, OP_STORE, OP_BR
+
+# Kinds of the names appearing in a function
+KIND_CONSTANT = 0   # integer literal
+KIND_LOCAL = 1      # value defined and used by the operations
+KIND_PARAM = 2      # non-array function parameter
+KIND_ARRAY = 3      # array function parameter
+KIND_GLOBAL = 4     # value used by more than one basic block, see get_global_variables
+
+KIND_NAMES = {
+    KIND_CONSTANT: 'constant',
+    KIND_LOCAL: 'local',
+    KIND_PARAM: 'param',
+    KIND_ARRAY: 'array',
+    KIND_GLOBAL: 'global',
+}
+
+class SymbolTable:
+    """
+    Interns the names of a function (values, constants, parameters, labels) to dense
+    integer IDs and records the kind of every value.
+
+    Every name is stored once, so the operations share their operand strings, and
+    the passes test the kind of a value with a list lookup instead of parsing it.
+    """
+    __slots__ = ('names', 'ids', 'kinds')
+
+    def __init__(self):
+        self.names = []          # ID -> name
+        self.ids = {}            # name -> ID
+        self.kinds = bytearray() # ID -> kind
+
+    def intern(self, name):
+        """ID of a name, allocated on first use; integer literals are constants, other names locals"""
+        sid = self.ids.get(name)
+        if sid is None:
+            sid = len(self.names)
+            self.ids[name] = sid
+            self.names.append(name)
+            self.kinds.append(KIND_CONSTANT if name.isdigit() else KIND_LOCAL)
+        return sid
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.ids
+
+    def name(self, sid):
+        return self.names[sid]
+
+    def kind(self, name):
+        sid = self.ids.get(name)
+        if sid is None:
+            return KIND_CONSTANT if name.isdigit() else KIND_LOCAL
+        return self.kinds[sid]
+
+    def setKind(self, name, kind):
+        self.kinds[self.intern(name)] = kind
+
+    def isConstant(self, name):
+        return self.kind(name) == KIND_CONSTANT
+
+    def declareParams(self, params):
+        """Record the kinds of the function parameters, given as (name, 'array' / 'non-array')"""
+        for name, param_type in params:
+            self.setKind(name, KIND_ARRAY if param_type == 'array' else KIND_PARAM)
+
+    def declareGlobals(self, names):
+        """Mark values shared between basic blocks as global; the other locals go back to local"""
+        for sid, kind in enumerate(self.kinds):
+            if kind == KIND_GLOBAL:
+                self.kinds[sid] = KIND_LOCAL
+        for name in names:
+            self.setKind(name, KIND_GLOBAL)
+
+def readOperands(op_type, operands):
+    """The operands read as values; the others hold labels or array names"""
+    if op_type == OP_PHI:
+        return operands[0::2]
+    if op_type == OP_LOAD or op_type == OP_STORE:
+        return operands[1:]
+    if op_type == OP_BR:
+        # Only a conditional branch reads a value, its condition
+        return operands[:1] if len(operands) > 1 else ()
+    return operands
+
+class Operation:
+    """
+    One IR operation: the left value (empty for store, branch and return), the op type and
+    the operands, with the interned IDs and the read values (`uses`, in operand order)
+    split out once at creation.
+
+    Reads behave like the list [value, op_type, operand, ...] the passes were written
+    against, so `op[0]`, `op[1]` and `op[2:]` keep working.
+    """
+    __slots__ = ('value', 'op_type', 'operands', 'def_id', 'operand_ids', 'uses', 'use_ids')
+
+    def __init__(self, value, op_type, operands, symbols):
+        ids, names = symbols.ids, symbols.names
+        try:
+            self.def_id = ids[value]
+            self.operand_ids = tuple([ids[operand] for operand in operands])
+        except KeyError:
+            self.def_id = symbols.intern(value)
+            self.operand_ids = tuple([symbols.intern(operand) for operand in operands])
+        self.value = names[self.def_id]
+        self.op_type = op_type
+        self.operands = tuple(map(names.__getitem__, self.operand_ids))
+        self.use_ids = readOperands(op_type, self.operand_ids)
+        self.uses = readOperands(op_type, self.operands)
+
+    def __getitem__(self, idx):
+        if idx == 0:
+            return self.value
+        if idx == 1:
+            return self.op_type
+        if isinstance(idx, int) and idx > 1:
+            return self.operands[idx - 2]
+        return self.asList()[idx]
+
+    def __len__(self):
+        return len(self.operands) + 2
+
+    def __iter__(self):
+        yield self.value
+        yield self.op_type
+        yield from self.operands
+
+    def __eq__(self, other):
+        if isinstance(other, (Operation, list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def asList(self):
+        return [self.value, self.op_type, *self.operands]
+
+    def __repr__(self):
+        return repr(self.asList())
@@ -1,11 +1,41 @@
 import sys
 import os
 import time
+import argparse
 sys.path.append(os.path.join(os.path.dirname(__file__), 'hls'))
-from hls.scheduler import addScheduler, schedulePrinter
+from hls.scheduler import addScheduler, schedulePrinter, SCHEDULING_MODES
 from hls.cdfgGenerator import HLS, BasicBlock, cdfgPrinter
-from hls.registerAllocator import addRegisterAllocation, registerAllocatorPrinter
-from hls.genFSM import VerilogSyntax, VerilogGenerator, verilogPrinter
+from hls.resourceLibrary import ResourceLibrary
+from hls.moduloScheduler import addModuloScheduler, moduloSchedulePrinter
+from hls.registerAllocator import addRegisterAllocation, registerAllocatorPrinter, REGISTER_ALLOCATORS
+from hls.genFSM import VerilogSyntax, VerilogGenerator, verilogEmitter, functionalUnitPrinter, constraintPrinter, FSM_ENCODINGS, ONE_HOT_MAX_STATES, FSM_STYLES
+
+def parseArguments():
+    """
+    Parse command line arguments: the parse result file, an optional output path and the synthesis options.
+    """
+    parser = argparse.ArgumentParser(description="LLVM IR based high-level synthesis")
+    parser.add_argument("inputFile", nargs="?", help="LLVM IR file (.ll) or parse result file generated by parser/hls")
+    parser.add_argument("outputPath", nargs="?", help="output directory, defaults to output/ for a .ll file and to the parent directory of a parse result")
+    parser.add_argument("--scheduler", choices=list(SCHEDULING_MODES), default="asap",
+                        help="operation scheduling mode: FIFO list scheduling (asap), critical-path priority list scheduling, or timing-driven chaining of combinational operations")
+    parser.add_argument("--resources", metavar="FILE",
+                        help="resource library (.json or .toml) with the count, latency, II and area of each unit")
+    parser.add_argument("--clock-period", type=float,
+                        help="target clock period in ns used by the chaining scheduler, overrides the resource library")
+    parser.add_argument("--eliminate-phis", action="store_true",
+                        help="lower phis into register copies on the incoming CFG edges and coalesce them in the register allocator")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="modulo schedule single-block loops and overlap their iterations in the generated FSM")
+    parser.add_argument("--register-allocator", choices=list(REGISTER_ALLOCATORS), default="left-edge",
+                        help="local register allocation: left-edge binding per block followed by register merging, or whole-function chordal coloring with phi coalescing")
+    parser.add_argument("--fsm-encoding", choices=list(FSM_ENCODINGS), default="auto",
+                        help=f"state encoding of the FSM; auto uses one-hot up to {ONE_HOT_MAX_STATES} states and binary above")
+    parser.add_argument("--fsm-style", choices=list(FSM_STYLES), default="wide",
+                        help="FSM structure: one state per basic block with a 32-bit cycle counter (wide) or a counter sized to the longest block (narrow), or one state per scheduled cycle without a counter (flat)")
+    parser.add_argument("--verbose", action="store_true",
+                        help="print the per-cycle liveness of every basic block during register allocation")
+    return parser.parse_args()
 
 def main():
     """
@@ -13,25 +43,28 @@ def main():
     and allocate registers with register merging optimization.
     """
     start = time.time()
+    args = parseArguments()
     defaultPath = "dotprod_parseResult.txt"
-    if len(sys.argv) > 3:
-        print("Too many arguments, please specify only the input file and optional output path.")
-        sys.exit(1)
-    elif len(sys.argv) > 1:
-        inputFile = sys.argv[1]
-        if len(sys.argv) == 3:
-            outputPath = sys.argv[2]
+    if args.inputFile:
+        inputFile = args.inputFile
+        if args.outputPath:
+            outputPath = args.outputPath
             print(f"Output path specified: {outputPath}")
+        elif inputFile.endswith('.ll'):
+            outputPath = 'output'
         else: 
-            outputPath = os.path.dirname(os.path.dirname(os.path.abspath(sys.argv[1])))
+            outputPath = os.path.dirname(os.path.dirname(os.path.abspath(inputFile)))
     else:
         print("File path unspecified, using default path: sampleOutput/parseResult/" + defaultPath)
         outputPath = 'sampleOutput'
         inputFile = os.path.join(os.path.dirname(__file__), outputPath, 'parseResult', defaultPath)
     try:
-        name = inputFile[inputFile.rindex('/')+1:inputFile.rindex('_')]
-    except Exception as e:
-        print(f"Input file name must be a parse result file")
+        if inputFile.endswith('.ll'):
+            name = os.path.basename(inputFile)[:-len('.ll')]
+        else:
+            name = inputFile[inputFile.rindex('/')+1:inputFile.rindex('_')]
+    except ValueError:
+        print("Input file must be an LLVM IR (.ll) file or a parse result file")
         sys.exit(1)
     
     # Create output directories if they don't exist
@@ -41,31 +74,55 @@ def main():
     verilogFile = os.path.join(os.path.dirname(__file__), outputPath, 'verilog_code', name + '.v')
 
     # Create HLS object and parse LLVM IR
-    hls = HLS()
+    try:
+        resources = ResourceLibrary.fromFile(args.resources) if args.resources else ResourceLibrary()
+        if args.clock_period is not None:
+            resources.setClockPeriod(args.clock_period)
+    except (OSError, ValueError) as e:
+        print(f"Invalid resource configuration: {e}")
+        sys.exit(1)
+    hls = HLS(resources)
     addScheduler(HLS)
+    addModuloScheduler(HLS)
     addRegisterAllocation(HLS, BasicBlock)
 
-    hls.llvmParser(inputFile)
+    try:
+        hls.llvmParser(inputFile)
+    except (OSError, ValueError) as e:
+        print(f"Invalid input file {inputFile}: {e}")
+        sys.exit(1)
     hls.generateCFG()
     hls.generateDFGs()
-    hls.scheduleASAP()
-    hls.registerAllocation()
+    if args.eliminate_phis:
+        hls.eliminatePhis()
+    SCHEDULING_MODES[args.scheduler](hls)
+    if args.pipeline:
+        hls.pipelineLoops()
+    hls.registerAllocation(verbose=args.verbose, allocator=args.register_allocator)
     # print(f"schedule results: {hls.schedule}")
     # print(f"========================================")
     # print(f"register allocation after merging: {hls.merged_coloring_result}")
 
     verilog_syntax = VerilogSyntax()
-    verilog_generator = VerilogGenerator(hls, verilog_syntax)
-    verilog_generator.gen_all_code()
+    verilog_generator = VerilogGenerator(hls, verilog_syntax, fsm_encoding=args.fsm_encoding, fsm_style=args.fsm_style)
+    # Register index, unit binding and branch conditions; the code itself is streamed to the file below
+    verilog_generator.prepare()
 
     # Print both original and optimized results
     with open(outputFile, 'w') as f:
         cdfgPrinter(hls, f)
         schedulePrinter(hls, f)
+        if args.pipeline:
+            moduloSchedulePrinter(hls, f)
         registerAllocatorPrinter(hls, f)
+        functionalUnitPrinter(verilog_generator, f)
 
     with open(verilogFile, 'w') as vf:
-        verilogPrinter(verilog_generator, vf)
+        verilogEmitter(verilog_generator, vf)
+    if verilog_generator.content_constraints:
+        # Multicycle path constraints of the functional units left combinational
+        with open(os.path.splitext(verilogFile)[0] + '.sdc', 'w') as cf:
+            constraintPrinter(verilog_generator, cf)
     end = time.time()
     print(f"Total time taken: {end - start:.10f} seconds")
 
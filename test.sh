@@ -2,7 +2,7 @@
 
 # Define constants
 OUTPUT_DIR="testOutput"
-EXAMPLES=("dotprod" "gcd" "sum")
+EXAMPLES=("dotprod" "gcd" "gcdModulo" "sum")
 
 # Create output directory if it doesn't exist
 mkdir -p "${OUTPUT_DIR}"
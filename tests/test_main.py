@@ -0,0 +1,62 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# A function using an instruction the .ll frontend does not support
+NEG_SOURCE = ("define int neg(int a)\n"
+              "start:\n"
+              "    x = fneg float a;\n"
+              "    return x;\n")
+
+
+def run(script, *args, cwd):
+    return subprocess.run([sys.executable, os.path.join(ROOT, script), *args],
+                          cwd=cwd, capture_output=True, text=True)
+
+
+def test_unsupported_instruction_exits_cleanly(tmp_path):
+    source = tmp_path / "neg.ll"
+    source.write_text(NEG_SOURCE)
+    result = run("main.py", str(source), str(tmp_path / "out"), cwd=tmp_path)
+    assert result.returncode == 1
+    assert f"Invalid input file {source}: line 3: unsupported expression" in result.stdout
+    assert "Traceback" not in result.stderr
+
+
+def test_unreadable_input_exits_cleanly(tmp_path):
+    source = tmp_path / "dir.ll"
+    source.mkdir()
+    result = run("main.py", str(source), str(tmp_path / "out"), cwd=tmp_path)
+    assert result.returncode == 1
+    assert f"Invalid input file {source}:" in result.stdout
+    assert "Traceback" not in result.stderr
+
+
+def test_dse_invalid_input_exits_cleanly(tmp_path):
+    unsupported = tmp_path / "neg.ll"
+    unsupported.write_text(NEG_SOURCE)
+    for source, units in ((unsupported, []), (tmp_path / "nope.ll", ["--units", "add=1"])):
+        result = run("dse.py", str(source), str(tmp_path / "out"), *units, cwd=tmp_path)
+        assert result.returncode == 1
+        assert f"Invalid input file {source}:" in result.stdout
+        assert "Traceback" not in result.stderr
+
+
+def test_missing_input_exits_cleanly(tmp_path):
+    source = tmp_path / "nope.ll"
+    result = run("main.py", str(source), str(tmp_path / "out"), cwd=tmp_path)
+    assert result.returncode == 1
+    assert f"Invalid input file {source}:" in result.stdout
+    assert "Traceback" not in result.stderr
+
+
+def test_dse_rejects_non_positive_jobs_and_trip_count(tmp_path):
+    source = os.path.join(ROOT, "example", "gcd.ll")
+    for option in ("--jobs", "--trip-count"):
+        for value in ("0", "-5"):
+            result = run("dse.py", source, str(tmp_path / "out"), option, value, cwd=tmp_path)
+            assert result.returncode == 2
+            assert f"argument {option}: '{value}' must be positive" in result.stderr
+            assert "Traceback" not in result.stderr
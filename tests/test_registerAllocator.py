@@ -0,0 +1,33 @@
+import glob
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, 'hls'))
+from hls.cdfgGenerator import HLS, BasicBlock
+from hls.resourceLibrary import ResourceLibrary
+from hls.scheduler import addScheduler, SCHEDULING_MODES
+from hls.registerAllocator import addRegisterAllocation, get_input_output_variables
+
+EXAMPLES = sorted(glob.glob(os.path.join(ROOT, 'example', '*.ll')))
+
+
+@pytest.mark.parametrize('source', EXAMPLES, ids=os.path.basename)
+def test_coalescing_keeps_liveness_up_to_date(source):
+    hls = HLS(ResourceLibrary())
+    addScheduler(HLS)
+    addRegisterAllocation(HLS, BasicBlock)
+    hls.llvmParser(source)
+    hls.generateCFG()
+    hls.generateDFGs()
+    hls.eliminatePhis()
+    SCHEDULING_MODES['asap'](hls)
+    hls.get_input_output_variables()
+    hls.coalesce_phi_copies()
+    assert hls.coalesced_copies
+    updated = (hls.input_variables, hls.output_variables)
+    get_input_output_variables(hls)
+    assert updated == (hls.input_variables, hls.output_variables)
@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'hls'))
+from resourceData import OP_LOAD, OP_STORE
+from resourceLibrary import ResourceLibrary
+
+
+def test_unknown_configuration_fields_are_rejected():
+    with pytest.raises(ValueError, match=r"unknown configuration fields \['memory'\]"):
+        ResourceLibrary.fromDict({'memory': {'a': {'read_ports': 2}}})
+
+
+def test_memories_section_sets_array_ports():
+    library = ResourceLibrary.fromDict({'memories': {'a': {'read_ports': 2, 'write_ports': 3}}})
+    assert library.unitCount((OP_LOAD, 'a')) == 2
+    assert library.unitCount((OP_STORE, 'a')) == 3
+    assert ResourceLibrary.fromDict(library.toDict()).memory_ports == library.memory_ports